@@ -5,8 +5,6 @@ from zoneinfo import ZoneInfo
 from collections import defaultdict
 import random
 from streamlit import column_config
-import httpx
-import random
 from streamlit_option_menu import option_menu
 
 from config import *
@@ -21,8 +19,9 @@ from modules.ui_helpers import (
 from modules.auth import do_login_stage1, do_login_stage2
 from modules.email_service import (
     enviar_codigo_email,
-    send_director_request,
-    enviar_resumo_email,
+    send_director_digest,
+    agrupar_solicitacoes_diretor,
+    enfileirar_resumo_email,
     _build_email_html,
     send_approval_result,
     send_declaration_email
@@ -32,16 +31,27 @@ from modules.formatters import (
     formatar_percentual_para_planilha,
     formatar_para_exibir
 )
-from modules.admin_dashboard import display_admin_dashboard
-from modules.analytics import display_analytics
-from modules.comissoes import display_comissoes, _carregar_comissoes_filial
+# páginas (altair/plotly) são importadas no primeiro uso, dentro de _main()
+from modules.tracing import medir, exibir_painel_performance
+from modules.resiliencia import SupabaseIndisponivel, desatualizado_desde
+from modules.esquema import para_editor
+from modules.perfil import (
+    iniciar as iniciar_perfil,
+    finalizar as finalizar_perfil,
+    marcar as marcar_etapa,
+    exibir_controle_perfil,
+)
 from modules.db import (
   carregar_filial,
   carregar_assessores,
   carregar_alteracoes,
+  COLS_ALTERACOES,
+  SEM_PESSOAIS_FILIAL,
+  SEM_PESSOAIS_ASSESSORES,
   inserir_alteracao_log,
   sobrescrever_assessores,
   atualizar_alteracao_log,
+  aplicar_percentuais,
   carregar_sugestoes,
   adicionar_sugestao,
   usuario_votou_mes,
@@ -63,19 +73,31 @@ gif_urls = [
     "https://i.gifer.com/6ov.gif",
 ]
 
+# uma entrada de cache por projeção (as telas daqui não exibem CPF/e-mails da filial)
 @st.cache_data(show_spinner=False)
-def get_filiais():
-    return carregar_filial()
+def get_filiais(sem: tuple[str, ...] = SEM_PESSOAIS_FILIAL):
+    return carregar_filial(sem=sem)
 
 @st.cache_data(show_spinner=False)
-def get_assessores():
-    return carregar_assessores()
+def get_assessores(sem: tuple[str, ...] = SEM_PESSOAIS_ASSESSORES):
+    return carregar_assessores(sem=sem)
 
 @st.cache_data(show_spinner=False)
-def get_log():
-    return carregar_alteracoes()
+def get_log(colunas: tuple[str, ...] = tuple(COLS_ALTERACOES)):
+    return carregar_alteracoes(list(colunas))
 
 def main():
+    # perfil por execução (opt-in do Admin): etapas marcadas ao longo de _main()
+    perfil = iniciar_perfil()
+    try:
+        _main()
+    except BaseException:
+        # st.rerun()/st.stop() também chegam aqui: guarda sem desenhar
+        finalizar_perfil(perfil, exibir=False)
+        raise
+    finalizar_perfil(perfil)
+
+def _main():
     # — Tema e CSS global e sidebar —
     apply_theme()
     adicionar_logo_sidebar()
@@ -103,6 +125,7 @@ def main():
         return
 
     # 1) tente carregar tudo do banco…
+    marcar_etapa("carga")
     try:
         df_filial     = get_filiais()
         df_assessores = get_assessores()
@@ -110,17 +133,28 @@ def main():
 
         # 🔥 Pré‑aquece o cache de comissões (1ª visita fica instantânea)
         try:
+            from modules.comissoes import _carregar_comissoes_filial
             _ = _carregar_comissoes_filial()
         except Exception:
             pass  # não quebra o app se falhar aqui
-    except httpx.RemoteProtocolError:
-        # 2) mostre erro amigável e pare o app sem stack-trace
-        st.error(
-            "Tivemos um erro inesperado na conexão. "
-            "Por favor, reinicie o aplicativo."
-        )
+    except SupabaseIndisponivel:
+        # 2) já houve reconexão e repetições (supabase_http/resiliencia) e não há
+        #    snapshot anterior para mostrar — deixa tentar de novo sem reiniciar
+        st.error("Não foi possível falar com o banco de dados agora.")
+        if st.button("Tentar novamente"):
+            st.rerun()
         st.stop()
 
+    # snapshot antigo servido no lugar do banco: avisa e não deixa no cache,
+    # para o próximo rerun já tentar buscar os dados atuais
+    desde = [d for d in map(desatualizado_desde, (df_filial, df_assessores, df_log)) if d]
+    if desde:
+        hora = datetime.fromtimestamp(min(desde), ZoneInfo("America/Sao_Paulo")).strftime("%H:%M")
+        st.warning(f"O banco de dados não respondeu; exibindo os dados carregados às {hora}.")
+        get_filiais.clear()
+        get_assessores.clear()
+        get_log.clear()
+
     # — Define colunas fixas e percentuais —
     cols_fixos = ["SIGLA", "CPF", "NOME", "EMAIL", "FILIAL", "FUNCAO", "LAST_UPDATE"]
     col_perc = [
@@ -132,6 +166,7 @@ def main():
     ]
 
     # ── Filiais do usuário (Diretor, RM ou Líder) ──
+    marcar_etapa("hierarquia")
     nome_usuario = st.session_state.dados_lider["LIDER"]
     role  = st.session_state.role
     level = st.session_state.get("level", 5)  # default mais restrito
@@ -174,6 +209,7 @@ def main():
     filiais_do_lider.sort()
 
     # — Define lista de páginas e estado padrão —
+    marcar_etapa("sidebar")
     pages = [
         "Gestão de Percentuais",
         "Validação",
@@ -259,6 +295,12 @@ def main():
 
         # espaço e botão de logout (se já estiver logado)
         st.markdown("<br><br><br>", unsafe_allow_html=True)
+
+        # 🔧 painel de performance e perfil por execução (só Admin)
+        if level == 1:
+            exibir_painel_performance()
+            exibir_controle_perfil()
+
         if st.session_state.get("user_name"):
             if st.button("Logout"):
                 st.session_state.clear()
@@ -270,7 +312,7 @@ def main():
             st.rerun()
 
     pagina = st.session_state.pagina
-
+    marcar_etapa("cabeçalho/filial")
 
     # — Título dinâmico no topo da área principal —
     page_icons = {
@@ -353,6 +395,7 @@ def main():
     else:
         selected_filial = None
 
+    marcar_etapa(f"página: {pagina}")
 
     if pagina == "Gestão de Percentuais":
 
@@ -639,109 +682,112 @@ def main():
                         if not diretor_nome or not diretor_email:
                             st.warning("Não foi possível identificar o Diretor/e-mail da filial. As solicitações não foram enviadas para validação por e-mail.")
                         else:
-                            for alt in solicitacoes:
-                                send_director_request(
-                                    diretor_email, nome_usuario, selected_filial,
-                                    alt["NOME"], alt["PRODUTO"], alt["PERCENTUAL ANTES"], alt["PERCENTUAL DEPOIS"],
-                                    "https://smartc.streamlit.app/"
+                            # um único e-mail por (diretor, filial, lote de gravação)
+                            lote = [
+                                {
+                                    **alt,
+                                    "DIRETOR_EMAIL": diretor_email,
+                                    "FILIAL": selected_filial,
+                                    "LOTE": st.session_state.pending_agora_raw,
+                                }
+                                for alt in solicitacoes
+                            ]
+                            for (email_dir, filial_dir, _), itens in agrupar_solicitacoes_diretor(lote).items():
+                                send_director_digest(
+                                    email_dir, nome_usuario, filial_dir, itens,
+                                    "https://smartc.streamlit.app/",
+                                    st.session_state.pending_agora_display
                                 )
                             st.info("As alterações foram encaminhadas ao Diretor para validação.")
 
                     # 5) aplica imediatamente o que não requer aprovação
+                    falhas, nao_encontrados = [], []
                     if aplicacoes_rapidas:
-                        # 5a) atualiza no Supabase
-                        for alt in aplicacoes_rapidas:
-                            produto_col     = alt["PRODUTO"]
-                            percent_decimal = parse_valor_percentual(alt["PERCENTUAL DEPOIS"])
-                            novo_val_int    = int(round(percent_decimal * 100))
-
-                            # encontra ID do assessor
-                            try:
-                                resp = (
-                                    supabase
-                                    .table("assessores")
-                                    .select("ID")
-                                    .eq("NOME", str(alt["NOME"] or "").strip())
-                                    .eq("FILIAL", selected_filial_up)
-                                    .single()
-                                    .execute()
-                                )
-                                assessor_id = resp.data["ID"]
-                            except Exception as e:
-                                st.error(f"Erro ao buscar assessor {alt['NOME']}: {e}")
-                                continue
-
-                            # atualiza o percentual
-                            try:
-                                supabase.table("assessores") \
-                                    .update({ produto_col: novo_val_int }) \
-                                    .eq("ID", assessor_id) \
-                                    .execute()
-                            except Exception as e:
-                                st.error(f"Falha ao atualizar {alt['NOME']} ({produto_col}): {e}")
-                                continue
-
-                        # 5b) envia resumo por e-mail ao Líder
-                        subj_l = f"Resumo de alterações em {selected_filial}"
-                        lista_html = "".join(
-                            f"<li>{x['NOME']}: {x['PRODUTO']} de {x['PERCENTUAL ANTES']}% → {x['PERCENTUAL DEPOIS']}%</li>"
-                            for x in aplicacoes_rapidas
-                        )
-                        conteudo_html_l = f"""
-                        <p>Olá {nome_usuario},</p>
-                        <p>Foram aplicadas as seguintes alterações em <strong>{selected_filial}</strong>
-                        no dia <strong>{st.session_state.pending_agora_display}</strong>:</p>
-                        <ul>
-                        {lista_html}
-                        </ul>
-                        """
-                        html_l = _build_email_html(subj_l, conteudo_html_l)
-                        enviar_resumo_email(
-                            [st.session_state.dados_lider["EMAIL_LIDER"]],
-                            subj_l,
-                            html_l,
-                            content_type="HTML"
-                        )
-
-                        # 5c) envia resumo para cada Assessor
-                        agrup = defaultdict(list)
-                        for x in aplicacoes_rapidas:
-                            agrup[x["NOME"]].append(x)
+                        # 5a) atualiza no Supabase (com repetição; o que falhar não entra nos resumos)
+                        falhas, nao_encontrados = aplicar_percentuais(selected_filial_up, [
+                            (alt["NOME"], alt["PRODUTO"],
+                             int(round(parse_valor_percentual(alt["PERCENTUAL DEPOIS"]) * 100)))
+                            for alt in aplicacoes_rapidas
+                        ])
+                        for nome_f, produto_f in nao_encontrados:
+                            st.error(f"Erro ao buscar assessor {nome_f}: não encontrado na filial.")
+                        for nome_f, produto_f, erro in falhas:
+                            st.error(f"Falha ao atualizar {nome_f} ({produto_f}): {erro}")
+                        nao_gravados = {(str(n).strip(), p) for n, p, *_ in [*falhas, *nao_encontrados]}
+                        aplicacoes_rapidas = [
+                            a for a in aplicacoes_rapidas
+                            if (str(a["NOME"] or "").strip(), a["PRODUTO"]) not in nao_gravados
+                        ]
 
-                        for nome_a, alts in agrup.items():
-                            filtro = (
-                                (df_assessores["NOME"].astype(str).str.strip().str.upper() == str(nome_a or "").strip().upper())
-                                & (df_assessores["FILIAL"].astype(str).str.strip().str.upper() == selected_filial_up)
-                            )
-                            df_sel = df_assessores.loc[filtro]
-                            if df_sel.empty:
-                                continue
-                            email_a = df_sel["EMAIL"].iloc[0]
-
-                            subj_a = f"Resumo de alterações em {selected_filial}"
-                            lista_html_a = "".join(
-                                f"<li>{y['PRODUTO']}: {y['PERCENTUAL ANTES']}% → {y['PERCENTUAL DEPOIS']}%</li>"
-                                for y in alts
+                        if aplicacoes_rapidas:
+                            # 5b) envia resumo por e-mail ao Líder
+                            subj_l = f"Resumo de alterações em {selected_filial}"
+                            lista_html = "".join(
+                                f"<li>{x['NOME']}: {x['PRODUTO']} de {x['PERCENTUAL ANTES']}% → {x['PERCENTUAL DEPOIS']}%</li>"
+                                for x in aplicacoes_rapidas
                             )
-                            conteudo_html_a = f"""
-                            <p>Olá {nome_a},</p>
-                            <p>O líder <strong>{nome_usuario}</strong> realizou as seguintes alterações em
-                            <strong>{selected_filial}</strong> no dia <strong>{st.session_state.pending_agora_display}</strong>:</p>
+                            conteudo_html_l = f"""
+                            <p>Olá {nome_usuario},</p>
+                            <p>Foram aplicadas as seguintes alterações em <strong>{selected_filial}</strong>
+                            no dia <strong>{st.session_state.pending_agora_display}</strong>:</p>
                             <ul>
-                            {lista_html_a}
+                            {lista_html}
                             </ul>
                             """
-                            html_a = _build_email_html(subj_a, conteudo_html_a)
-                            enviar_resumo_email(
-                                [email_a],
-                                subj_a,
-                                html_a,
+                            html_l = _build_email_html(subj_l, conteudo_html_l)
+                            enfileirar_resumo_email(
+                                [st.session_state.dados_lider["EMAIL_LIDER"]],
+                                subj_l,
+                                html_l,
                                 content_type="HTML"
                             )
 
-                    st.success(
-                        f"Alterações registradas com sucesso em {st.session_state.pending_agora_display}!"
-                    )
+                            # 5c) envia resumo para cada Assessor
+                            agrup = defaultdict(list)
+                            for x in aplicacoes_rapidas:
+                                agrup[x["NOME"]].append(x)
+
+                            for nome_a, alts in agrup.items():
+                                filtro = (
+                                    (df_assessores["NOME"].astype(str).str.strip().str.upper() == str(nome_a or "").strip().upper())
+                                    & (df_assessores["FILIAL"].astype(str).str.strip().str.upper() == selected_filial_up)
+                                )
+                                df_sel = df_assessores.loc[filtro]
+                                if df_sel.empty:
+                                    continue
+                                email_a = df_sel["EMAIL"].iloc[0]
+
+                                subj_a = f"Resumo de alterações em {selected_filial}"
+                                lista_html_a = "".join(
+                                    f"<li>{y['PRODUTO']}: {y['PERCENTUAL ANTES']}% → {y['PERCENTUAL DEPOIS']}%</li>"
+                                    for y in alts
+                                )
+                                conteudo_html_a = f"""
+                                <p>Olá {nome_a},</p>
+                                <p>O líder <strong>{nome_usuario}</strong> realizou as seguintes alterações em
+                                <strong>{selected_filial}</strong> no dia <strong>{st.session_state.pending_agora_display}</strong>:</p>
+                                <ul>
+                                {lista_html_a}
+                                </ul>
+                                """
+                                html_a = _build_email_html(subj_a, conteudo_html_a)
+                                enfileirar_resumo_email(
+                                    [email_a],
+                                    subj_a,
+                                    html_a,
+                                    content_type="HTML"
+                                )
+
+                    if falhas or nao_encontrados:
+                        # só diz "sucesso" depois de conferir que todas as gravações passaram
+                        st.warning(
+                            f"Alterações registradas em {st.session_state.pending_agora_display}, mas "
+                            f"{len(falhas) + len(nao_encontrados)} não foram aplicadas (veja acima)."
+                        )
+                    else:
+                        st.success(
+                            f"Alterações registradas com sucesso em {st.session_state.pending_agora_display}!"
+                        )
                     st.subheader("Resumo das alterações:")
                     st.dataframe(pd.DataFrame(st.session_state.pending_alteracoes))
 
@@ -770,7 +816,9 @@ def main():
             .select("data_de_credito,cliente,nome,duracao_com,comissao_bruto,produto,seguradora")
             .eq("nome_filial_equipe", sel_filial_up)
         )
-        result = query.execute()
+        with medir("recebiveis_futuros", "select") as m:
+            result = query.execute()
+            m.resposta(result)
         df = pd.DataFrame(result.data or [])
 
         if df.empty:
@@ -886,6 +934,7 @@ def main():
 
     elif pagina == "Comissões":
         # Usa a filial já selecionada no topo do app e o DF de assessores carregado
+        from modules.comissoes import display_comissoes
         display_comissoes(df_assessores=df_assessores, filial_selecionada=selected_filial)
 
     elif pagina in coming_soon:
@@ -911,6 +960,7 @@ def main():
             df_assessores["FILIAL"].astype(str).str.strip().str.upper() == sel_filial_up
         ].copy()
 
+        from modules.analytics import display_analytics
         display_analytics(
             df_log=df_log,
             df_assessores_filial=df_ass_filial,
@@ -927,6 +977,7 @@ def main():
         pagina_ajuda()
 
     elif pagina == "Dashboard Admin":
+        from modules.admin_dashboard import display_admin_dashboard
         display_admin_dashboard()    
 
     elif pagina == "Sugestão de Melhoria":
@@ -1108,7 +1159,7 @@ def main():
                 df_display["COMENTARIO DIRETOR"] = ""
 
                 df_edit = st.data_editor(
-                    df_display[[
+                    para_editor(df_display)[[
                         "ID", "TIMESTAMP", "USUARIO", "ASSESSOR", "PRODUTO",
                         "PERCENTUAL ANTES", "PERCENTUAL DEPOIS", "Aprovado",
                         "Recusado", "COMENTARIO DIRETOR"
@@ -1172,7 +1223,7 @@ def main():
                             <strong style="color:#dc3545;">recusada</strong> pelo Diretor.</p>
                             <p>Comentário do Diretor:<br/><em>{row['COMENTARIO DIRETOR']}</em></p>
                             """
-                            enviar_resumo_email(
+                            enfileirar_resumo_email(
                                 [lider_email],
                                 assunto,
                                 _build_email_html(assunto, conteudo_html),
@@ -1259,61 +1310,62 @@ def main():
 
                     # se aprovou, segue com a lógica normal de aprovação
                     if aprovar_decl:
+                            concluido = False
                             try:
-                                # Atualiza logs de aprovação
-                                for _, row in aprovados.iterrows():
-                                    log_id = int(row["ID"])
-                                    atualizar_alteracao_log(log_id, "ALTERACAO APROVADA", "SIM")
-                                    atualizar_alteracao_log(log_id, "COMENTARIO DIRETOR", "")
-                                    atualizar_alteracao_log(log_id, "VALIDACAO NECESSARIA", "NAO")
-                                # Envia e-mails de resultado e de declaração
-                                send_approval_result(
-                                    st.session_state.df_envio,
-                                    lider_email=st.session_state.dados_lider["EMAIL_LIDER"]
-                                )
-                                items_html = "".join(
-                                    f"<tr><td>{row['ASSESSOR']}</td>"
-                                    f"<td>{row['PRODUTO']}</td>"
-                                    f"<td>{row['PERCENTUAL ANTES']}%</td>"
-                                    f"<td>{row['PERCENTUAL DEPOIS']}%</td>"
-                                    f"<td>{row['TIMESTAMP']}</td></tr>"
-                                    for _, row in st.session_state.df_envio.iterrows()
-                                )
-                                send_declaration_email(
-                                    director_email=st.session_state.dados_lider["EMAIL_LIDER"],
-                                    juridico_email="juridico@investsmart.com.br",
-                                    lider_name=st.session_state.dados_lider["LIDER"],
-                                    filial=selected_filial,
-                                    items_html=items_html,
-                                    timestamp_display=None
-                                )
-                                # Atualiza percentuais na tabela assessores
-                                for _, row in aprovados.iterrows():
-                                    produto_col = row["PRODUTO"]
-                                    novo_val = int(round(parse_valor_percentual(row["PERCENTUAL DEPOIS"]) * 100))
-
-                                    resp = (
-                                        supabase.table("assessores")
-                                        .select("ID")
-                                        .eq("NOME", str(row["ASSESSOR"] or "").strip())
-                                        .eq("FILIAL", selected_filial_up)
-                                        .single()
-                                        .execute()
+                                # 1) percentuais primeiro: valores absolutos, então repetir o
+                                #    lote inteiro após uma falha é seguro (retoma de onde parou)
+                                falhas, _ = aplicar_percentuais(selected_filial_up, [
+                                    (row["ASSESSOR"], row["PRODUTO"],
+                                     int(round(parse_valor_percentual(row["PERCENTUAL DEPOIS"]) * 100)))
+                                    for _, row in aprovados.iterrows()
+                                ])
+                                if falhas:
+                                    st.error(
+                                        "Não foi possível aplicar: "
+                                        + ", ".join(f"{n} ({p})" for n, p, _ in falhas)
+                                        + ". Nenhuma solicitação foi marcada como aprovada; "
+                                          "clique em Aprovar Declaração novamente."
                                     )
-                                    if resp.data:
-                                        supabase.table("assessores") \
-                                            .update({produto_col: novo_val}) \
-                                            .eq("ID", resp.data["ID"]) \
-                                            .execute()
-                                st.success("Declaração aprovada.")
-
-                                st.cache_data.clear()
-                                st.rerun()
+                                else:
+                                    # 2) só com tudo aplicado marca os logs (updates também repetíveis)
+                                    for _, row in aprovados.iterrows():
+                                        log_id = int(row["ID"])
+                                        atualizar_alteracao_log(log_id, "ALTERACAO APROVADA", "SIM")
+                                        atualizar_alteracao_log(log_id, "COMENTARIO DIRETOR", "")
+                                        atualizar_alteracao_log(log_id, "VALIDACAO NECESSARIA", "NAO")
+                                    # 3) e-mails por último: não saem para um lote pela metade
+                                    send_approval_result(
+                                        st.session_state.df_envio,
+                                        lider_email=st.session_state.dados_lider["EMAIL_LIDER"]
+                                    )
+                                    items_html = "".join(
+                                        f"<tr><td>{row['ASSESSOR']}</td>"
+                                        f"<td>{row['PRODUTO']}</td>"
+                                        f"<td>{row['PERCENTUAL ANTES']}%</td>"
+                                        f"<td>{row['PERCENTUAL DEPOIS']}%</td>"
+                                        f"<td>{row['TIMESTAMP']}</td></tr>"
+                                        for _, row in st.session_state.df_envio.iterrows()
+                                    )
+                                    send_declaration_email(
+                                        director_email=st.session_state.dados_lider["EMAIL_LIDER"],
+                                        juridico_email="juridico@investsmart.com.br",
+                                        lider_name=st.session_state.dados_lider["LIDER"],
+                                        filial=selected_filial,
+                                        items_html=items_html,
+                                        timestamp_display=None
+                                    )
+                                    concluido = True
+                                    st.success("Declaração aprovada.")
+
+                                    st.cache_data.clear()
+                                    st.rerun()
                             except Exception as err:
                                 st.error(f"Erro ao aprovar declaração: {err}")
                             finally:
-                                st.session_state.declaration_pending = False
-                                st.session_state["refresh_validation"] = not st.session_state.get("refresh_validation", False)
+                                # com falha a declaração continua aberta para tentar de novo
+                                if concluido:
+                                    st.session_state.declaration_pending = False
+                                    st.session_state["refresh_validation"] = not st.session_state.get("refresh_validation", False)
 
         # ── Somente visualização: Super/Leaders, RM e Comissões ──
         elif level in (4, 5, 6):
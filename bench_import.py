@@ -0,0 +1,106 @@
+# bench_import.py
+"""
+Tempo de importação do app.py (o que o container paga antes do formulário de login).
+
+Cada repetição roda num processo novo (`python -X importtime`), com o `config`
+substituído pelo Supabase local (não precisa de secrets nem de rede), e registra:
+  - tempo total do `import app`
+  - os pacotes de topo mais caros (cumulativo, do -X importtime)
+  - quais bibliotecas pesadas já foram carregadas (devem ficar para o 1º uso)
+
+Exemplos:
+  python bench_import.py
+  python bench_import.py --repeticoes 7 --saida bench_import.json --limite-ms 2500
+"""
+import argparse
+import json
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from datetime import datetime
+
+# só devem ser importadas quando a página/recurso que as usa for aberto
+PESADOS = ["plotly", "altair", "msal", "supabase", "modules.admin_dashboard", "modules.analytics"]
+
+_SCRIPT = f"""
+import json, sys, time
+t0 = time.perf_counter()
+from modules.supabase_local import ClienteLocal, instalar_config_local
+instalar_config_local(ClienteLocal())
+import app
+ms = (time.perf_counter() - t0) * 1000
+print(json.dumps({{"ms": ms, "carregados": [m for m in {PESADOS!r} if m in sys.modules]}}))
+"""
+
+_LINHA = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def _pacotes_topo(stderr: str) -> dict[str, float]:
+    """Cumulativo (ms) por pacote de topo, a partir da saída do -X importtime."""
+    por_pacote: dict[str, float] = defaultdict(float)
+    for linha in stderr.splitlines():
+        m = _LINHA.match(linha)
+        if not m:
+            continue
+        _, cumulativo, recuo, nome = m.groups()
+        if len(recuo) == 1:   # import feito direto pelo script (nível 0 da árvore)
+            por_pacote[nome.split(".")[0]] += int(cumulativo) / 1000
+    return por_pacote
+
+
+def rodar_uma() -> dict:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _SCRIPT],
+        capture_output=True, text=True, check=False
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import app falhou:\n{proc.stderr[-2000:]}")
+    saida = json.loads(proc.stdout.strip().splitlines()[-1])
+    saida["pacotes"] = _pacotes_topo(proc.stderr)
+    return saida
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Benchmark do tempo de importação do app.py.")
+    ap.add_argument("--repeticoes", type=int, default=5)
+    ap.add_argument("--top", type=int, default=15, help="quantos pacotes listar")
+    ap.add_argument("--saida", help="grava o relatório em JSON")
+    ap.add_argument("--limite-ms", type=float, help="sai com erro se a mediana passar disso")
+    args = ap.parse_args()
+
+    execucoes = [rodar_uma() for _ in range(args.repeticoes)]
+    mediana = statistics.median(e["ms"] for e in execucoes)
+    pacotes: dict[str, list[float]] = defaultdict(list)
+    for e in execucoes:
+        for nome, ms in e["pacotes"].items():
+            pacotes[nome].append(ms)
+    top = sorted(((n, statistics.median(v)) for n, v in pacotes.items()), key=lambda x: -x[1])[:args.top]
+    carregados = sorted({m for e in execucoes for m in e["carregados"]})
+
+    print(f"import app: mediana {mediana:.0f} ms (mín {min(e['ms'] for e in execucoes):.0f} ms, "
+          f"{args.repeticoes} processos)")
+    for nome, ms in top:
+        print(f"  {nome:<28} {ms:>8.1f} ms")
+    if carregados:
+        print(f"⚠ carregados no import (deveriam ser sob demanda): {', '.join(carregados)}")
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump({
+                "gerado_em": datetime.now().isoformat(timespec="seconds"),
+                "python": sys.version.split()[0],
+                "repeticoes": args.repeticoes,
+                "mediana_ms": round(mediana, 1),
+                "execucoes_ms": [round(e["ms"], 1) for e in execucoes],
+                "pacotes_ms": {n: round(ms, 1) for n, ms in top},
+                "pesados_carregados": carregados,
+            }, f, ensure_ascii=False, indent=2)
+
+    if args.limite_ms is not None and mediana > args.limite_ms:
+        sys.exit(f"Mediana {mediana:.0f} ms acima do limite de {args.limite_ms:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
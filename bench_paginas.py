@@ -0,0 +1,165 @@
+# bench_paginas.py
+"""
+Benchmark das páginas do app.py sem navegador, com `streamlit.testing.v1.AppTest`.
+
+- secrets falsos (nenhuma credencial real é lida) e o `ClienteLocal` com dados
+  sintéticos no lugar do Supabase (ver modules/supabase_local.py)
+- entra como cada nível de acesso (1, 3, 4, 5, 6) preenchendo a sessão como o
+  login em 2 etapas faz ao confirmar o código (sem OTP/e-mail)
+- renderiza cada página duas vezes: fria (st.cache_data limpo) e quente (rerun)
+
+Por página registra: tempo do script-run, tempo gasto nas leituras/gravações
+de dados, requisições, pico de memória (tracemalloc) e exceções.
+
+Exemplos:
+  python bench_paginas.py
+  python bench_paginas.py --escala 10 --niveis 1 4 --saida bench_paginas.json
+"""
+import argparse
+import json
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from modules.supabase_local import ClienteLocal, gerar_dados, instalar_config_local
+
+_tmp = tempfile.mkdtemp(prefix="smartc_apptest_")
+os.environ.setdefault("SMARTC_ROLLUP_DB", os.path.join(_tmp, "rollup.db"))
+os.environ.setdefault("SMARTC_OUTBOX_DB", os.path.join(_tmp, "outbox.db"))
+_cliente = ClienteLocal()
+instalar_config_local(_cliente)
+
+import streamlit as st  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+PAGINAS = [
+    "Gestão de Percentuais",
+    "Validação",
+    "Painel Analítico",
+    "Comissões",
+    "Spoiler BeSmart",
+    "Dashboard Admin",
+]
+
+# nível → (role, nome do usuário nos dados sintéticos)
+USUARIOS = {
+    1: ("admin",     "ADMIN BENCH"),
+    3: ("director",  "DIRETOR 0"),
+    4: ("leader",    "LIDER 0"),
+    5: ("rm",        "RM 0"),
+    6: ("comissoes", "COMISSOES BENCH"),
+}
+
+SECRETS_FALSOS = {
+    "SUPABASE_URL": "http://localhost",
+    "SUPABASE_KEY": "bench",
+    "AZURE_TENANT_ID": "bench",
+    "AZURE_CLIENT_ID": "bench",
+    "AZURE_CLIENT_SECRET": "bench",
+    "EMAIL_USER": "bench@exemplo.com",
+    "admins": {"ADMIN BENCH": "bench"},
+    "admin_emails": {"ADMIN BENCH": "admin@exemplo.com"},
+    "comissoes": {"COMISSOES BENCH": "bench"},
+    "comissoes_emails": {"COMISSOES BENCH": "comissoes@exemplo.com"},
+    "directors": {"DIRETOR 0": "bench"},
+    "director_emails": {"DIRETOR 0": "diretor0@exemplo.com"},
+    "rms": {"RM 0": "bench"},
+    "rm_emails": {"RM 0": "rm0@exemplo.com"},
+}
+
+
+def _sessao_logada(level: int) -> dict:
+    """Estado que do_login_stage2 deixa na sessão depois do código confirmado."""
+    role, nome = USUARIOS[level]
+    return {
+        "autenticado": True,
+        "login_stage": 2,
+        "first_login": False,
+        "role":        role,
+        "level":       level,
+        "dados_lider": {"LIDER": nome, "EMAIL_LIDER": f"{nome.lower().replace(' ', '.')}@exemplo.com"},
+    }
+
+
+def _rodar(at: AppTest, memoria: bool) -> dict:
+    antes = _cliente.estatisticas.get("tempo_s", 0.0)
+    req_antes = _cliente.estatisticas.get("requisicoes", 0)
+    if memoria:
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+    t0 = time.perf_counter()
+    at.run()
+    total = time.perf_counter() - t0
+    pico = (tracemalloc.get_traced_memory()[1] - base) if memoria else None
+    return {
+        "script_ms": round(total * 1000, 1),
+        "dados_ms": round((_cliente.estatisticas.get("tempo_s", 0.0) - antes) * 1000, 1),
+        "requisicoes": _cliente.estatisticas.get("requisicoes", 0) - req_antes,
+        "pico_memoria_mb": round(pico / 2**20, 1) if pico is not None else None,
+        "excecoes": [str(e.value) for e in at.exception],
+    }
+
+
+def medir_pagina(level: int, pagina: str, timeout: float, memoria: bool) -> dict:
+    at = AppTest.from_file("app.py", default_timeout=timeout)
+    for chave, valor in SECRETS_FALSOS.items():
+        at.secrets[chave] = valor
+    for chave, valor in _sessao_logada(level).items():
+        at.session_state[chave] = valor
+    at.session_state["pagina"] = pagina
+
+    st.cache_data.clear()
+    fria = _rodar(at, memoria)
+    quente = _rodar(at, memoria)
+    return {"nivel": level, "pagina": pagina, "fria": fria, "quente": quente}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Benchmark headless das páginas (AppTest + Supabase local).")
+    ap.add_argument("--escala", type=float, default=1, help="multiplicador do volume de produção")
+    ap.add_argument("--niveis", type=int, nargs="+", default=sorted(USUARIOS), choices=sorted(USUARIOS))
+    ap.add_argument("--paginas", nargs="+", default=PAGINAS, choices=PAGINAS)
+    ap.add_argument("--latencia-ms", type=float, default=0.0, help="round-trip simulado por requisição")
+    ap.add_argument("--timeout", type=float, default=120.0, help="limite por script-run (s)")
+    ap.add_argument("--sem-memoria", action="store_true", help="não usa tracemalloc (tempos sem overhead)")
+    ap.add_argument("--saida", help="grava o relatório em JSON")
+    args = ap.parse_args()
+
+    _cliente.latencia_ms = args.latencia_ms
+    for tabela, registros in gerar_dados(args.escala).items():
+        _cliente.carregar(tabela, registros)
+
+    memoria = not args.sem_memoria
+    if memoria:
+        tracemalloc.start()
+
+    resultados = []
+    for level in args.niveis:
+        for pagina in args.paginas:
+            if pagina == "Dashboard Admin" and level not in (1, 6):
+                continue  # página só aparece no menu dos níveis 1 e 6
+            r = medir_pagina(level, pagina, args.timeout, memoria)
+            resultados.append(r)
+            f, q = r["fria"], r["quente"]
+            erro = f"  ✗ {f['excecoes'][0][:80]}" if f["excecoes"] else ""
+            print(f"nível {level}  {pagina:<24} fria {f['script_ms']:>8.1f} ms (dados {f['dados_ms']:>7.1f}) | "
+                  f"quente {q['script_ms']:>8.1f} ms | pico {f['pico_memoria_mb']} MB{erro}")
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as fh:
+            json.dump({
+                "gerado_em": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "streamlit": st.__version__,
+                "escala": args.escala,
+                "latencia_ms": args.latencia_ms,
+                "tracemalloc": memoria,
+                "resultados": resultados,
+            }, fh, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+# bench_rp_query.py
+"""
+Compara as duas formas de consultar `query_pessoas` por período num banco SQLite
+de teste com dados sintéticos (mesmas colunas do RP, datas em formatos mistos):
+
+  - legado:   CTE com a conversão multi-formato de [DATA/HORA ATUALIZAÇÃO] e filtro
+              sobre o resultado (igual ao teste_rp.py) → varre a tabela inteira
+  - sargavel: filtro direto na coluna DT_ATZ materializada e indexada
+              (ver `ddl_dt_atz_persistida`)
+
+Para cada modo mede: tempo, linhas devolvidas × linhas lidas (SCAN = tabela
+inteira; SEARCH = só as do intervalo no índice), conversões de data feitas durante
+a consulta (chamadas de TRY_DT_ATZ), passos da VM do SQLite e o plano
+(EXPLAIN QUERY PLAN).
+
+Exemplos:
+  python bench_rp_query.py
+  python bench_rp_query.py --linhas 200000 --repeticoes 5 --saida bench_rp.json
+
+No SQL Server o equivalente é comparar `SET STATISTICS IO ON` / plano real das
+duas consultas geradas por `montar_sql_origem` depois de aplicar o DDL.
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+
+from modules.etl_pessoas import (
+    montar_sql_origem, ddl_dt_atz_persistida, preparar_engine, try_dt_atz,
+    TABELA_ORIGEM, COL_ATUALIZACAO, MAPA_PADRAO, MODOS_CONSULTA,
+)
+
+# formatos que aparecem no RP (estilos 103, 126 e 121)
+_FORMATOS_GERADOS = ("%d/%m/%Y %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M:%S.000")
+
+
+class _Contador:
+    """TRY_DT_ATZ instrumentada: conta quantas linhas passaram pela conversão."""
+
+    def __init__(self):
+        self.chamadas = 0
+
+    def __call__(self, valor):
+        self.chamadas += 1
+        return try_dt_atz(valor)
+
+
+def criar_base(engine: sa.Engine, linhas: int, meses: int, seed: int = 42) -> None:
+    """Tabela `query_pessoas` com `linhas` registros espalhados pelos últimos `meses` meses."""
+    rnd = random.Random(seed)
+    colunas = list(dict.fromkeys([*MAPA_PADRAO, COL_ATUALIZACAO]))
+    q = engine.dialect.identifier_preparer.quote
+    fim = datetime.now().replace(microsecond=0)
+    janela_s = int(timedelta(days=30 * meses).total_seconds())
+
+    def registro(i: int) -> dict:
+        rec = {c: f"{c[:3]}-{i}" for c in colunas}
+        rec["SIGLA"] = f"A{i:06d}"
+        dt = fim - timedelta(seconds=rnd.randrange(janela_s))
+        rec[COL_ATUALIZACAO] = dt.strftime(rnd.choice(_FORMATOS_GERADOS))
+        return rec
+
+    with engine.begin() as cn:
+        cn.exec_driver_sql(f"DROP TABLE IF EXISTS {q(TABELA_ORIGEM)}")
+        cn.exec_driver_sql(
+            f"CREATE TABLE {q(TABELA_ORIGEM)} ({', '.join(f'{q(c)} TEXT' for c in colunas)})"
+        )
+        insert = sa.text(
+            f"INSERT INTO {q(TABELA_ORIGEM)} ({', '.join(q(c) for c in colunas)}) "
+            f"VALUES ({', '.join(f':p{j}' for j in range(len(colunas)))})"
+        )
+        for ini in range(0, linhas, 5000):
+            lote = [registro(i) for i in range(ini, min(ini + 5000, linhas))]
+            cn.execute(insert, [{f"p{j}": rec[c] for j, c in enumerate(colunas)} for rec in lote])
+        for ddl in ddl_dt_atz_persistida(engine):
+            cn.exec_driver_sql(ddl)
+        cn.exec_driver_sql("ANALYZE")
+
+
+def medir(engine: sa.Engine, contador: _Contador, modo: str,
+          inicio: datetime, fim: datetime, repeticoes: int) -> dict:
+    sql = montar_sql_origem(engine, list(MAPA_PADRAO), modo)
+    params = {"inicio": inicio, "fim": fim}
+    tempos = []
+    passos = [0]
+
+    def _passo():
+        passos[0] += 1
+        return 0
+
+    with engine.connect() as cn:
+        plano = [r[-1] for r in cn.execute(sa.text(f"EXPLAIN QUERY PLAN {sql.text}"), params)]
+        total = cn.exec_driver_sql(f"SELECT COUNT(*) FROM {TABELA_ORIGEM}").scalar()
+        bruta = cn.connection.driver_connection
+        for _ in range(repeticoes):
+            contador.chamadas, passos[0] = 0, 0
+            bruta.set_progress_handler(_passo, 100)
+            t0 = time.perf_counter()
+            devolvidas = len(cn.execute(sql, params).fetchall())
+            tempos.append(time.perf_counter() - t0)
+            bruta.set_progress_handler(None, 0)
+    tempos.sort()
+    varre_tabela = any(p.startswith(f"SCAN {TABELA_ORIGEM}") for p in plano)
+    return {
+        "modo": modo,
+        "linhas_tabela": total,
+        "linhas_devolvidas": devolvidas,
+        "linhas_lidas": total if varre_tabela else devolvidas,
+        "conversoes_de_data": contador.chamadas,
+        "passos_vm": passos[0] * 100,
+        "tempo_mediano_ms": round(tempos[len(tempos) // 2] * 1000, 2),
+        "tempo_min_ms": round(tempos[0] * 1000, 2),
+        "plano": plano,
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Benchmark da consulta de período em query_pessoas (legado × sargável).")
+    ap.add_argument("--banco", help="arquivo SQLite (padrão: temporário)")
+    ap.add_argument("--linhas", type=int, default=50_000)
+    ap.add_argument("--meses", type=int, default=24, help="quantos meses de histórico gerar")
+    ap.add_argument("--repeticoes", type=int, default=3)
+    ap.add_argument("--saida", help="grava o resultado em JSON")
+    args = ap.parse_args()
+
+    caminho = args.banco or os.path.join(tempfile.mkdtemp(), "rp_bench.db")
+    contador = _Contador()
+    engine = preparar_engine(sa.create_engine(f"sqlite:///{caminho}", future=True), contador)
+    criar_base(engine, args.linhas, args.meses)
+
+    # janela do mês atual, como no job de sincronização
+    hoje = datetime.now()
+    inicio = datetime(hoje.year, hoje.month, 1)
+    fim = (inicio.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+    resultados = [medir(engine, contador, modo, inicio, fim, args.repeticoes) for modo in MODOS_CONSULTA]
+    for r in resultados:
+        print(f"[{r['modo']}] {r['linhas_devolvidas']} devolvidas / {r['linhas_lidas']} lidas "
+              f"(tabela: {r['linhas_tabela']}) | {r['conversoes_de_data']} conversões de data | "
+              f"~{r['passos_vm']} passos VM | mediana {r['tempo_mediano_ms']} ms")
+        for passo in r["plano"]:
+            print(f"    {passo}")
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump({"banco": caminho, "inicio": inicio.isoformat(), "fim": fim.isoformat(),
+                       "resultados": resultados}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+# bench_supabase.py
+"""
+Benchmark offline dos caminhos de dados do SmartC, contra o `ClienteLocal`
+(substituto em memória do Supabase/PostgREST) semeado com dados sintéticos.
+
+Mede, para cada escala (1× ≈ volume atual de produção):
+  - _ler_tabela de cada tabela
+  - inserir_alteracao_log, sobrescrever_assessores e o fluxo de aprovação do diretor
+  - o preparo de dados de cada página (Gestão, Validação, Painel Analítico,
+    Comissões, Spoiler, Dashboard Admin), sem desenhar nada
+
+Cada caso registra tempo (mediana/mín), requisições e linhas lidas/gravadas.
+Os casos `decodificar:*` comparam só a decodificação das páginas das tabelas de
+db.TABELAS_CSV: JSON (lista de dicts) contra CSV (DataFrame por página).
+`--latencia-ms` simula o round-trip até o Supabase (padrão: 0, só CPU/serialização).
+
+Exemplos:
+  python bench_supabase.py --escalas 1 10 --saida bench_base.json
+  python bench_supabase.py --escalas 1 10 --saida bench_novo.json --comparar bench_base.json
+
+As telas em app.py têm o preparo inline; os casos de Gestão, Validação e Spoiler
+repetem aqui a mesma sequência de leituras e filtros.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from modules.supabase_local import ClienteLocal, gerar_dados, instalar_config_local
+
+# o app lê o cliente de `config` na importação: instala o substituto antes de importar os módulos
+_cliente = ClienteLocal()
+_tmp = tempfile.mkdtemp(prefix="smartc_bench_")
+os.environ.setdefault("SMARTC_ROLLUP_DB", os.path.join(_tmp, "rollup.db"))
+instalar_config_local(_cliente)
+
+import pandas as pd  # noqa: E402
+
+from modules import db  # noqa: E402
+from modules.access_log import get_escritor_acessos  # noqa: E402
+from modules.analytics import _preparar_log, _kpis_periodo, _historico_filial  # noqa: E402
+from modules.comissoes import (  # noqa: E402
+    _carregar_comissoes_filial, _base_filial, _pareto_assessores, _lucro_margem_mensal, _pivot_assessor_mes,
+)
+from modules.esquema import aplicar_esquema  # noqa: E402
+from modules.leaderboard import PlacarTopK  # noqa: E402
+from modules.rollup_alteracoes import RollupAlteracoes  # noqa: E402
+
+TABELAS_LEITURA = ["filial", "assessores", "alteracoes", "acessos", "votos",
+                   "comissoes_origem", "comissoes_ajuste", "recebiveis_futuros"]
+COLS_FIXOS = ["SIGLA", "CPF", "NOME", "EMAIL", "FILIAL", "FUNCAO", "LAST_UPDATE"]
+
+
+# ------------------------------------------------------------------ casos
+def _paginas(registros: list[dict], tamanho: int = 1000) -> list[list[dict]]:
+    return [registros[i:i + tamanho] for i in range(0, len(registros), tamanho)]
+
+
+def decodificar_json(tabela: str, paginas: list[bytes]) -> pd.DataFrame:
+    todos: list[dict] = []
+    for p in paginas:
+        todos.extend(json.loads(p))
+    df = pd.DataFrame(todos)
+    df.columns = [str(c).upper() for c in df.columns]
+    return aplicar_esquema(tabela, df)
+
+
+def decodificar_csv(tabela: str, paginas: list[bytes]) -> pd.DataFrame:
+    partes = [db.decodificar_csv(p) for p in paginas]
+    df = pd.concat(partes, ignore_index=True)
+    df.columns = [str(c).upper() for c in df.columns]
+    return aplicar_esquema(tabela, df)
+
+
+def _seg_por_filial(df_filial: pd.DataFrame) -> dict:
+    return (
+        df_filial.assign(FILIAL=df_filial["FILIAL"].astype(str).str.upper().str.strip())
+                 .set_index("FILIAL")["SEGMENTO"]
+                 .astype(str).str.upper().str.strip()
+                 .to_dict()
+    )
+
+
+def _filial_com_pendencia(dados: dict) -> str:
+    pend = [a["FILIAL"] for a in dados["alteracoes"] if a["VALIDACAO NECESSARIA"] == "SIM"]
+    return max(set(pend), key=pend.count) if pend else dados["filial"][0]["FILIAL"]
+
+
+def pagina_gestao(filial: str) -> None:
+    df_filial = db.carregar_filial()
+    df_ass    = db.carregar_assessores()
+    db.carregar_alteracoes()
+    col_perc = [c for c in df_ass.columns if c not in COLS_FIXOS and c != "ID"]
+    df_ass[df_ass["FILIAL"].str.strip().str.upper() == filial.upper()][["NOME", *col_perc]]
+
+
+def pagina_validacao(filiais: list[str]) -> None:
+    df_filial = db.carregar_filial()
+    df_alt = db.carregar_alteracoes()
+    seg = _seg_por_filial(df_filial)
+    base_mask = (
+        (df_alt["VALIDACAO NECESSARIA"] == "SIM") &
+        (df_alt["ALTERACAO APROVADA"] == "NAO") &
+        (df_alt["COMENTARIO DIRETOR"].isna() | (df_alt["COMENTARIO DIRETOR"].str.strip() == ""))
+    )
+    df_base = df_alt.loc[base_mask]
+    for f in filiais:
+        f_up = f.strip().upper()
+        tipos = ["REDUCAO", "AUMENTO"] if seg.get(f_up, "") == "B2C" else ["REDUCAO"]
+        df_base[(df_base["FILIAL"].str.strip().str.upper() == f_up) & (df_base["TIPO"].isin(tipos))].shape[0]
+
+
+def pagina_analytics(filial: str) -> None:
+    df_ass = db.carregar_assessores()
+    df_log = _preparar_log(db.carregar_alteracoes())
+    col_perc = [c for c in df_ass.columns if c not in COLS_FIXOS and c != "ID"]
+    fim = df_log["DataHora"].max()
+    ini = fim - pd.DateOffset(months=3)
+    df_periodo = df_log[
+        (df_log["FILIAL"].str.strip().str.upper() == filial.upper())
+        & (df_log["DataHora"] >= ini) & (df_log["DataHora"] <= fim)
+    ]
+    df_ass_filial = df_ass[df_ass["FILIAL"].str.strip().str.upper() == filial.upper()]
+    _kpis_periodo(df_periodo, df_ass_filial, col_perc, fim)
+    _historico_filial(df_periodo)
+
+
+def pagina_comissoes(filial: str) -> None:
+    _carregar_comissoes_filial.clear()
+    df = _carregar_comissoes_filial()
+    df_ass = db.carregar_assessores()
+    m = _base_filial(df[df["NOME_FILIAL"] == filial.upper()], df_ass)
+    _pareto_assessores(m)
+    _lucro_margem_mensal(m)
+    _pivot_assessor_mes(m)
+
+
+def pagina_spoiler(filial: str) -> None:
+    res = (
+        _cliente.table("recebiveis_futuros")
+        .select("data_de_credito,cliente,nome,duracao_com,comissao_bruto,produto,seguradora")
+        .eq("nome_filial_equipe", filial.upper())
+        .execute()
+    )
+    df = pd.DataFrame(res.data or [])
+    if not df.empty:
+        df["data_de_credito"] = pd.to_datetime(df["data_de_credito"], errors="coerce")
+        df["duracao_com"]     = pd.to_numeric(df["duracao_com"], errors="coerce")
+        df["comissao_bruto"]  = pd.to_numeric(df["comissao_bruto"], errors="coerce")
+
+
+def pagina_admin(rollup: RollupAlteracoes, placar: PlacarTopK) -> None:
+    seg = _seg_por_filial(db.carregar_filial())
+    placar.aplicar(rollup.sincronizar(seg, forcar=True))
+    fim = date.today()
+    ini = fim - timedelta(days=90)
+    rollup.consultar(ini, fim)
+    db.carregar_acessos_por_dia()
+    for tipo in ("REDUCAO", "AUMENTO"):
+        placar.top_por_status("assessor", tipo, ini, fim)
+        placar.top_por_status("usuario", tipo, ini, fim)
+
+
+def fluxo_aprovacao(filial: str) -> None:
+    """Mesma sequência de chamadas do botão "Aprovar Declaração" (sem os e-mails)."""
+    df_alt = db.carregar_alteracoes()
+    aprovados = df_alt[
+        (df_alt["FILIAL"] == filial)
+        & (df_alt["VALIDACAO NECESSARIA"] == "SIM")
+        & (df_alt["ALTERACAO APROVADA"] == "NAO")
+    ]
+    for _, row in aprovados.iterrows():
+        log_id = int(row["ID"])
+        db.atualizar_alteracao_log(log_id, "ALTERACAO APROVADA", "SIM")
+        db.atualizar_alteracao_log(log_id, "COMENTARIO DIRETOR", "")
+        db.atualizar_alteracao_log(log_id, "VALIDACAO NECESSARIA", "NAO")
+    for _, row in aprovados.iterrows():
+        resp = (
+            _cliente.table("assessores").select("ID")
+            .eq("NOME", str(row["ASSESSOR"]).strip()).eq("FILIAL", filial).single().execute()
+        )
+        if resp.data:
+            _cliente.table("assessores").update({row["PRODUTO"]: int(row["PERCENTUAL DEPOIS"])}) \
+                .eq("ID", resp.data["ID"]).execute()
+
+
+def montar_casos(dados: dict) -> list[tuple]:
+    """(nome, preparar, executar): `preparar` roda fora da medição, antes de cada repetição."""
+    filial = _filial_com_pendencia(dados)
+    filiais = sorted({f["FILIAL"] for f in dados["filial"]})
+    ass_filial = [a for a in dados["assessores"] if a["FILIAL"] == filial]
+    linhas_log = [
+        [datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "BENCH", filial, a["NOME"], "XP",
+         "30", "25", "SIM", "NAO", "REDUCAO"]
+        for a in ass_filial[:10]
+    ]
+    estado = {}
+
+    def restaurar(*tabelas):
+        def _preparar():
+            for t in tabelas:
+                _cliente.carregar(t, dados[t])
+        return _preparar
+
+    def rollup_novo():
+        estado["rollup"] = RollupAlteracoes(os.path.join(_tmp, f"rollup_{time.monotonic_ns()}.db"))
+        estado["placar"] = PlacarTopK()
+        get_escritor_acessos()._contadores = None  # força a carga inicial dos contadores
+        _cliente.carregar("alteracoes", dados["alteracoes"])
+
+    casos = [(f"ler_tabela:{t}", None, lambda t=t: db._ler_tabela(t)) for t in TABELAS_LEITURA]
+    for t in sorted(db.TABELAS_CSV):
+        if not dados.get(t):
+            continue
+        paginas = _paginas(dados[t])
+        em_json = [json.dumps(p, default=str).encode() for p in paginas]
+        em_csv = [pd.DataFrame(p).to_csv(index=False).encode() for p in paginas]
+        casos += [
+            (f"decodificar:{t}:json", None, lambda t=t, b=em_json: decodificar_json(t, b)),
+            (f"decodificar:{t}:csv",  None, lambda t=t, b=em_csv: decodificar_csv(t, b)),
+        ]
+    casos += [
+        ("inserir_alteracao_log", restaurar("alteracoes"), lambda: db.inserir_alteracao_log(linhas_log)),
+        ("sobrescrever_assessores", restaurar("assessores"),
+         lambda: db.sobrescrever_assessores(pd.DataFrame(ass_filial))),
+        ("fluxo_aprovacao", restaurar("alteracoes", "assessores"), lambda: fluxo_aprovacao(filial)),
+        ("pagina:gestao", None, lambda: pagina_gestao(filial)),
+        ("pagina:validacao", restaurar("alteracoes"), lambda: pagina_validacao(filiais)),
+        ("pagina:analytics", None, lambda: pagina_analytics(filial)),
+        ("pagina:comissoes", None, lambda: pagina_comissoes(filial)),
+        ("pagina:spoiler", None, lambda: pagina_spoiler(filial)),
+        ("pagina:admin_frio", rollup_novo, lambda: pagina_admin(estado["rollup"], estado["placar"])),
+        ("pagina:admin_quente", None, lambda: pagina_admin(estado["rollup"], estado["placar"])),
+    ]
+    return casos
+
+
+# ------------------------------------------------------------------ execução
+def medir(nome: str, preparar, executar, repeticoes: int) -> dict:
+    tempos, stats, memoria = [], None, None
+    for _ in range(repeticoes):
+        if preparar:
+            preparar()
+        _cliente.zerar_estatisticas()
+        t0 = time.perf_counter()
+        resultado = executar()
+        tempos.append(time.perf_counter() - t0)
+        stats = dict(_cliente.estatisticas)
+        if isinstance(resultado, pd.DataFrame):
+            # tamanho real do snapshot (o que fica no st.cache_data)
+            memoria = int(resultado.memory_usage(deep=True).sum())
+    return {
+        "caso": nome,
+        "mediana_ms": round(statistics.median(tempos) * 1000, 2),
+        "min_ms": round(min(tempos) * 1000, 2),
+        "requisicoes": stats.get("requisicoes", 0),
+        "linhas_lidas": stats.get("linhas_lidas", 0),
+        "linhas_gravadas": stats.get("linhas_gravadas", 0),
+        "memoria_kb": round(memoria / 1024, 1) if memoria is not None else None,
+    }
+
+
+def comparar(atual: list[dict], base_path: str) -> None:
+    with open(base_path, encoding="utf-8") as f:
+        base = {(r["escala"], r["caso"]): r for r in json.load(f)["resultados"]}
+    print(f"\nComparação com {base_path} (mediana):")
+    for r in atual:
+        b = base.get((r["escala"], r["caso"]))
+        if not b or not b["mediana_ms"]:
+            continue
+        razao = r["mediana_ms"] / b["mediana_ms"]
+        marca = "  ⚠" if razao > 1.2 else ""
+        print(f"  {r['escala']:>5}×  {r['caso']:<32} {b['mediana_ms']:>10.2f} → {r['mediana_ms']:>10.2f} ms"
+              f"  ({razao:.2f}×){marca}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Benchmark offline dos caminhos de dados (Supabase local).")
+    ap.add_argument("--escalas", type=float, nargs="+", default=[1, 10],
+                    help="multiplicadores do volume de produção (ex.: 1 10 100)")
+    ap.add_argument("--repeticoes", type=int, default=3)
+    ap.add_argument("--latencia-ms", type=float, default=0.0, help="round-trip simulado por requisição")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--saida", help="grava o relatório em JSON")
+    ap.add_argument("--comparar", help="relatório JSON anterior para comparar")
+    args = ap.parse_args()
+
+    _cliente.latencia_ms = args.latencia_ms
+    resultados = []
+    for escala in args.escalas:
+        dados = gerar_dados(escala, args.seed)
+        for tabela, registros in dados.items():
+            _cliente.carregar(tabela, registros)
+        print(f"== escala {escala:g}× ({sum(len(r) for r in dados.values())} linhas)")
+        for nome, preparar, executar in montar_casos(dados):
+            r = medir(nome, preparar, executar, args.repeticoes)
+            r["escala"] = escala
+            resultados.append(r)
+            print(f"  {nome:<32} {r['mediana_ms']:>10.2f} ms | {r['requisicoes']:>5} req | "
+                  f"{r['linhas_lidas']:>7} lidas | {r['linhas_gravadas']:>5} gravadas"
+                  + (f" | {r['memoria_kb']:>9.1f} KB" if r["memoria_kb"] is not None else ""))
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump({
+                "gerado_em": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "pandas": pd.__version__,
+                "repeticoes": args.repeticoes,
+                "latencia_ms": args.latencia_ms,
+                "seed": args.seed,
+                "resultados": resultados,
+            }, f, ensure_ascii=False, indent=2)
+    if args.comparar:
+        comparar(resultados, args.comparar)
+
+
+if __name__ == "__main__":
+    main()
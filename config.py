@@ -1,13 +1,38 @@
 # config.py
 import json
+import threading
 import streamlit as st
-from supabase import create_client
 
 # 1) Credenciais do SUPABASE
 SUPABASE_URL = st.secrets["SUPABASE_URL"]
 SUPABASE_KEY = st.secrets["SUPABASE_KEY"]
 
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+_cliente = None
+_cliente_lock = threading.Lock()
+
+
+def get_supabase():
+    """
+    Cliente Supabase do processo, criado (e o pacote importado) só no primeiro uso.
+    Um só pool HTTP para todas as sessões — ver modules/supabase_http.py.
+    """
+    global _cliente
+    if _cliente is None:
+        with _cliente_lock:
+            if _cliente is None:
+                from modules.supabase_http import criar_cliente_supabase
+                _cliente = criar_cliente_supabase(SUPABASE_URL, SUPABASE_KEY)
+    return _cliente
+
+
+class _SupabasePreguicoso:
+    """Mantém `from config import supabase` funcionando: repassa tudo ao cliente real."""
+
+    def __getattr__(self, nome):
+        return getattr(get_supabase(), nome)
+
+
+supabase = _SupabasePreguicoso()
 
 # 3) Azure / OAuth
 TENANT_ID     = st.secrets["AZURE_TENANT_ID"]
@@ -1,11 +1,20 @@
 # envio_email.py
-import pandas as pd
-import win32com.client as win32
+import argparse
+import json
+import os
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
 from typing import Dict, Tuple
 
+import pandas as pd
+
 # mantém o mesmo template visual do e-mail
 from modules.email_service import _build_email_html
+from modules.email_outbox import LimitadorTaxa
+from modules.mail_transport import GraphMailTransport, SmtpMailTransport, ErroEnvioEmail
 
 # -----------------------------------------------------------------------------
 # Carrega secrets: tenta via Streamlit; se não houver, lê secrets.toml local
@@ -89,13 +98,18 @@ GROUP_MAP = {
 # -----------------------------------------------------------------------------
 # Montadores de HTML
 # -----------------------------------------------------------------------------
+# linha da senha no bloco de credenciais (também usada para ocultá-la no dry-run)
+_LINHA_SENHA = "<strong>Senha:</strong> {senha}</p>"
+SENHA_OCULTA = "********"
+
+
 def _justificar_e_inserir_login(template_texto: str, nome: str, login: str, senha: str) -> str:
     # margens nos <li>
     corpo = re.sub(r"<li>", '<li style="margin-bottom:10px;">', template_texto)
     # bloco final com credenciais
     credenciais = f"""
     <p><strong>Login:</strong> {login}<br>
-       <strong>Senha:</strong> {senha}</p>
+       {_LINHA_SENHA.format(senha=senha)}
     <p>Esse acesso é individual. Não compartilhe suas credenciais.</p>
     <p>Atenciosamente,<br>Equipe de Comissões</p>
     """
@@ -104,7 +118,11 @@ def _justificar_e_inserir_login(template_texto: str, nome: str, login: str, senh
 # -----------------------------------------------------------------------------
 # Construção da lista por grupo (rms | superintendents | directors)
 # -----------------------------------------------------------------------------
-def construir_lista_por_grupo(grupo: str) -> Tuple[str, pd.DataFrame]:
+def construir_lista_por_grupo(grupo: str, inline_logo: bool = False) -> Tuple[str, pd.DataFrame]:
+    """
+    inline_logo=False: logo embutido (Outlook / arquivos do dry-run)
+    inline_logo=True:  logo por CID, anexado pelo transporte (Graph/SMTP)
+    """
     if grupo not in GROUP_MAP:
         raise ValueError(f"Grupo inválido: {grupo}. Use: {list(GROUP_MAP.keys())}")
 
@@ -125,7 +143,7 @@ def construir_lista_por_grupo(grupo: str) -> Tuple[str, pd.DataFrame]:
         login = nome
         corpo = meta["template_texto"].format(NOME=nome)
         corpo_html = _justificar_e_inserir_login(corpo, nome, login, senha)
-        html_final = _build_email_html(assunto, corpo_html)
+        html_final = _build_email_html(assunto, corpo_html, inline_logo=inline_logo)
 
         lista.append(
             {
@@ -150,6 +168,7 @@ def salvar_excel_validacao(df: pd.DataFrame, path: str = "validacao_emails.xlsx"
     print(f"Arquivo de validação gerado: {path}")
 
 def mostrar_exemplar_outlook(email: str, assunto: str, html: str):
+    import win32com.client as win32  # só existe no Windows com Outlook instalado
     outlook = win32.Dispatch("Outlook.Application")
     mail = outlook.CreateItem(0)
     mail.SentOnBehalfOfName = EMAIL_USER
@@ -159,6 +178,7 @@ def mostrar_exemplar_outlook(email: str, assunto: str, html: str):
     mail.Display()
 
 def enviar_todos_outlook(df: pd.DataFrame, assunto: str, batch_size: int = 10):
+    import win32com.client as win32  # só existe no Windows com Outlook instalado
     outlook = win32.Dispatch("Outlook.Application")
     total = len(df)
     for idx, row in enumerate(df.itertuples(index=False), start=1):
@@ -179,14 +199,199 @@ def enviar_todos_outlook(df: pd.DataFrame, assunto: str, batch_size: int = 10):
                 print("Processo interrompido pelo usuário.")
                 break
 
+# -----------------------------------------------------------------------------
+# Envio em lote sem Outlook (Graph/SMTP), com jornal de progresso e dry-run
+# -----------------------------------------------------------------------------
+class JornalProgresso:
+    """
+    Arquivo JSON-lines com uma linha por tentativa de envio.
+    Ao retomar, quem já consta como "enviado" para o mesmo grupo é pulado.
+    (não grava senha nem corpo do e-mail)
+    """
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+
+    def enviados(self, grupo: str) -> set[str]:
+        feitos: set[str] = set()
+        if not os.path.exists(self.caminho):
+            return feitos
+        with open(self.caminho, encoding="utf-8") as f:
+            for linha in f:
+                try:
+                    reg = json.loads(linha)
+                except ValueError:
+                    continue  # linha truncada por interrupção
+                if reg.get("grupo") == grupo and reg.get("status") == "enviado":
+                    feitos.add(str(reg.get("email", "")).strip().lower())
+        return feitos
+
+    def registrar(self, grupo: str, email: str, status: str, erro: str | None = None) -> None:
+        reg = {
+            "ts": datetime.now().isoformat(timespec="seconds"),
+            "grupo": grupo,
+            "email": email,
+            "status": status,
+        }
+        if erro:
+            reg["erro"] = erro
+        with self._lock, open(self.caminho, "a", encoding="utf-8") as f:
+            f.write(json.dumps(reg, ensure_ascii=False) + "\n")
+
+
+def criar_transport_graph(graph_url: str | None = None, token_estatico: str | None = None) -> GraphMailTransport:
+    """
+    Transporte Graph a partir do secrets. Para um Graph local (stand-in HTTP),
+    informe `graph_url` e um `token_estatico` (dispensa o MSAL).
+    """
+    kwargs = {}
+    if graph_url:
+        kwargs["graph_url"] = graph_url
+    if token_estatico:
+        kwargs["obter_token_fn"] = lambda: {"access_token": token_estatico, "expires_in": 3600}
+    return GraphMailTransport(
+        SECRETS.get("AZURE_TENANT_ID", ""),
+        SECRETS.get("AZURE_CLIENT_ID", ""),
+        SECRETS.get("AZURE_CLIENT_SECRET", ""),
+        EMAIL_USER,
+        **kwargs
+    )
+
+
+def gravar_dry_run(df: pd.DataFrame, assunto: str, pasta: str) -> str:
+    """
+    Grava cada e-mail renderizado em <pasta>/NNN_nome.html + manifesto.json (nada é enviado).
+    A senha sai trocada por SENHA_OCULTA: os arquivos ficam em disco e não devem conter credenciais.
+    """
+    os.makedirs(pasta, exist_ok=True)
+    manifesto = []
+    for idx, row in enumerate(df.itertuples(index=False), start=1):
+        nome_arq = f"{idx:03d}_" + re.sub(r"[^A-Za-z0-9]+", "_", str(row.nome_destinatario)).strip("_") + ".html"
+        corpo = row.corpo_do_email.replace(
+            _LINHA_SENHA.format(senha=row.senha), _LINHA_SENHA.format(senha=SENHA_OCULTA)
+        )
+        with open(os.path.join(pasta, nome_arq), "w", encoding="utf-8") as f:
+            f.write(corpo)
+        manifesto.append({
+            "arquivo": nome_arq,
+            "perfil": row.perfil,
+            "nome": row.nome_destinatario,
+            "email": row.email_destinatario,
+            "assunto": assunto,
+        })
+    with open(os.path.join(pasta, "manifesto.json"), "w", encoding="utf-8") as f:
+        json.dump(manifesto, f, ensure_ascii=False, indent=2)
+    print(f"[DRY-RUN] {len(manifesto)} e-mail(s) gravados em {pasta}")
+    return pasta
+
+
+def enviar_todos_lote(
+    df: pd.DataFrame,
+    assunto: str,
+    transport,
+    grupo: str,
+    jornal_path: str = "envio_email_progresso.jsonl",
+    max_workers: int = 4,
+    taxa_por_s: float = 0.5,
+    max_tentativas: int = 3,
+) -> dict[str, int]:
+    """
+    Dispara os e-mails do DataFrame em paralelo (até `max_workers`), limitado a
+    `taxa_por_s` envios/s, com retry para falhas transitórias. Pode ser
+    interrompido e reexecutado: o jornal evita reenviar para quem já recebeu.
+    """
+    jornal = JornalProgresso(jornal_path)
+    ja_enviados = jornal.enviados(grupo)
+    pendentes = [
+        row for row in df.itertuples(index=False)
+        if str(row.email_destinatario).strip().lower() not in ja_enviados
+    ]
+    if len(pendentes) < len(df):
+        print(f"Retomando: {len(df) - len(pendentes)} já enviados, {len(pendentes)} restantes.")
+
+    limitador = LimitadorTaxa(taxa_por_s, rajada=max_workers)
+    total = len(pendentes)
+    contagem = {"enviado": 0, "falhou": 0}
+
+    def _enviar(row) -> str:
+        ultimo_erro = None
+        for tentativa in range(1, max_tentativas + 1):
+            limitador.aguardar()
+            try:
+                transport.enviar([row.email_destinatario], assunto, row.corpo_do_email, content_type="HTML")
+                jornal.registrar(grupo, row.email_destinatario, "enviado")
+                return "enviado"
+            except ErroEnvioEmail as e:
+                ultimo_erro = e
+                if e.status_code in (400, 403, 404):
+                    break
+                if tentativa < max_tentativas:
+                    time.sleep(e.retry_after or 2 ** tentativa)
+            except Exception as e:  # erro inesperado: falha só deste destinatário, sem repetir
+                ultimo_erro = e
+                break
+        jornal.registrar(grupo, row.email_destinatario, "falhou", str(ultimo_erro))
+        return "falhou"
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futuros = {pool.submit(_enviar, row): row for row in pendentes}
+        for idx, fut in enumerate(as_completed(futuros), start=1):
+            row = futuros[fut]
+            status = fut.result()
+            contagem[status] += 1
+            print(f"[{idx}/{total}] {status.upper()}: {row.nome_destinatario} <{row.email_destinatario}>")
+
+    print(f"Concluído: {contagem['enviado']} enviado(s), {contagem['falhou']} falha(s). Jornal: {jornal_path}")
+    return contagem
+
+
 # -----------------------------------------------------------------------------
 # Execução
 # -----------------------------------------------------------------------------
+def _parse_args():
+    p = argparse.ArgumentParser(
+        description="Comunicado de acesso SmartC por grupo.",
+        epilog="A planilha validacao_emails.xlsx (com as senhas em texto) não é mais gerada "
+               "automaticamente: use --excel quando precisar dela e apague-a depois.",
+    )
+    p.add_argument("grupo", choices=list(GROUP_MAP.keys()))
+    p.add_argument("--modo", choices=["graph", "smtp", "dry-run", "outlook"], required=True,
+                   help="graph/smtp enviam sem Outlook; dry-run só grava os HTMLs (senhas ocultas); "
+                        "outlook = fluxo antigo (Windows)")
+    p.add_argument("--saida", default="emails_renderizados", help="pasta do dry-run")
+    p.add_argument("--jornal", default="envio_email_progresso.jsonl", help="jornal de progresso (retomada)")
+    p.add_argument("--workers", type=int, default=4)
+    p.add_argument("--taxa", type=float, default=0.5, help="envios por segundo")
+    p.add_argument("--graph-url", default=None, help="ex.: http://localhost:8000/v1.0 (Graph local)")
+    p.add_argument("--token", default=None, help="token fixo para o Graph local (dispensa MSAL)")
+    p.add_argument("--smtp-host", default="localhost")
+    p.add_argument("--smtp-port", type=int, default=1025)
+    p.add_argument("--excel", action="store_true",
+                   help="gera também a planilha de validação (contém as senhas; antes era sempre gerada)")
+    return p.parse_args()
+
+
 if __name__ == "__main__":
-    # escolha aqui o grupo que deseja disparar:
-    # opções: "rms", "superintendents", (opcional) "directors"
-    grupo = "superintendents"  # <-- altere para "superintendents" quando quiser
+    args = _parse_args()
 
-    assunto, df_emails = construir_lista_por_grupo(grupo)
-    salvar_excel_validacao(df_emails)
-    enviar_todos_outlook(df_emails, assunto, batch_size=10)
+    inline = args.modo in ("graph", "smtp")
+    assunto, df_emails = construir_lista_por_grupo(args.grupo, inline_logo=inline)
+    if args.excel:
+        salvar_excel_validacao(df_emails)
+
+    if args.modo == "dry-run":
+        gravar_dry_run(df_emails, assunto, args.saida)
+    elif args.modo == "outlook":
+        enviar_todos_outlook(df_emails, assunto, batch_size=10)
+    else:
+        if args.modo == "graph":
+            transport = criar_transport_graph(args.graph_url, args.token)
+        else:
+            transport = SmtpMailTransport(EMAIL_USER, host=args.smtp_host, port=args.smtp_port)
+        enviar_todos_lote(
+            df_emails, assunto, transport, args.grupo,
+            jornal_path=args.jornal,
+            max_workers=args.workers,
+            taxa_por_s=args.taxa,
+        )
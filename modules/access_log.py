@@ -0,0 +1,181 @@
+# modules/access_log.py
+import atexit
+import logging
+import queue
+import threading
+import time
+from collections import Counter, defaultdict
+
+import httpx
+import pandas as pd
+from postgrest import APIError
+
+from config import supabase
+from modules.resiliencia import SupabaseIndisponivel, executar
+
+logger = logging.getLogger(__name__)
+
+# o insert em lote não tem chave: só é repetido quando com certeza não foi gravado
+# (disjuntor aberto, conexão que nem abriu, erro do Postgres — a transação voltou —,
+# 429/503). Timeout de leitura, 502/504 e afins são ambíguos — o lote pode ter sido
+# gravado — e repetir duplicaria os acessos.
+_NAO_ENVIADO = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+def _nao_gravado(causa) -> bool:
+    if causa is None or isinstance(causa, _NAO_ENVIADO):
+        return True
+    if isinstance(causa, APIError):
+        codigo = str(causa.code)
+        return not (codigo.isdigit() and len(codigo) == 3) or codigo in ("429", "503")
+    return False
+
+
+class EscritorAcessos:
+    """
+    Grava eventos da tabela `acessos` em lote, fora do caminho da requisição:
+    - fila limitada em memória (`max_fila`); se lotar, o evento é descartado com aviso
+    - uma thread faz flush a cada `intervalo_s` ou quando junta `tamanho_lote` eventos
+    - flush final no encerramento do processo (atexit)
+    Mantém também contadores por dia/usuário, para o Dashboard Admin não
+    precisar ler a tabela inteira a cada render. Só contam lotes gravados: o que é
+    descartado não aparece nos contadores (nem na tabela, depois de um restart).
+    """
+
+    def __init__(
+        self,
+        tamanho_lote: int = 50,
+        intervalo_s: float = 5.0,
+        max_fila: int = 5000,
+        max_tentativas: int = 5,
+    ):
+        self.tamanho_lote   = tamanho_lote
+        self.intervalo_s    = intervalo_s
+        self.max_tentativas = max_tentativas
+
+        self._fila: queue.Queue = queue.Queue(maxsize=max_fila)
+        self._parar     = threading.Event()
+        self._lock_io   = threading.Lock()   # serializa insert x carga inicial dos contadores
+        self._lock_cont = threading.Lock()
+        self._contadores: dict | None = None   # dia -> Counter(usuario); None até a 1ª carga
+        self._thread = threading.Thread(target=self._loop, name="acessos-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.encerrar)
+
+    # ------------------------------------------------------------------ escrita
+    def registrar(self, payload: dict) -> None:
+        try:
+            self._fila.put_nowait(payload)
+        except queue.Full:
+            logger.warning("Fila de acessos cheia; evento descartado: %s", payload)
+
+    def _coletar_lote(self, espera_s: float) -> list[dict]:
+        lote: list[dict] = []
+        limite = time.monotonic() + espera_s
+        while len(lote) < self.tamanho_lote:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                ev = self._fila.get(timeout=restante)
+            except queue.Empty:
+                break
+            lote.append(ev)
+        return lote
+
+    def _contar(self, lote: list[dict]) -> None:
+        with self._lock_cont:
+            if self._contadores is None:
+                return   # a carga inicial (depois deste insert) já lê o lote da tabela
+            for ev in lote:
+                self._contadores[str(ev.get("TIMESTAMP", ""))[:10]][ev.get("USUARIO")] += 1
+
+    def _gravar(self, lote: list[dict]) -> None:
+        for tentativa in range(1, self.max_tentativas + 1):
+            try:
+                # _lock_io: insert + contagem não se intercalam com a carga inicial
+                with self._lock_io:
+                    executar("acessos", lambda: supabase.table("acessos").insert(lote).execute(), repetir=False)
+                    self._contar(lote)
+                return
+            except APIError as e:
+                # o banco recusou o lote (4xx): repetir não muda nada
+                logger.error("Lote de %s acesso(s) recusado, descartado: %s", len(lote), e)
+                return
+            except SupabaseIndisponivel as e:
+                if not _nao_gravado(e.__cause__):
+                    logger.error("Lote de %s acesso(s) em estado incerto, descartado: %s", len(lote), e)
+                    return
+                if tentativa == self.max_tentativas or self._parar.is_set():
+                    logger.error("Falha ao gravar %s acesso(s), descartados: %s", len(lote), e)
+                    return
+                self._parar.wait(min(30.0, 2 ** tentativa))
+
+    def _loop(self) -> None:
+        while not self._parar.is_set():
+            lote = self._coletar_lote(self.intervalo_s)
+            if lote:
+                self._gravar(lote)
+
+    def flush(self) -> None:
+        """Grava imediatamente tudo o que está na fila."""
+        while True:
+            lote = self._coletar_lote(0.01)
+            if not lote:
+                return
+            self._gravar(lote)
+
+    def encerrar(self) -> None:
+        self._parar.set()
+        self._thread.join(timeout=self.intervalo_s + 1)
+        self.flush()
+
+    # ------------------------------------------------------------------ contadores
+    def _carregar_contadores(self) -> None:
+        from modules.db import _ler_tabela  # evita import circular (db usa este módulo)
+
+        # _lock_io: nenhum lote é gravado (e contado) durante a leitura da tabela
+        with self._lock_io:
+            df = _ler_tabela("acessos", columns=["TIMESTAMP", "USUARIO"])
+            contadores: dict = defaultdict(Counter)
+            if not df.empty:
+                dias = (
+                    pd.to_datetime(df["TIMESTAMP"], errors="coerce", utc=True)
+                    .dt.tz_localize(None).dt.strftime("%Y-%m-%d")
+                )
+                for (dia, usuario), qtd in df.groupby([dias, df["USUARIO"]], observed=True).size().items():
+                    contadores[dia][usuario] += int(qtd)
+
+            with self._lock_cont:
+                if self._contadores is None:
+                    self._contadores = contadores
+
+    def acessos_por_dia(self) -> pd.DataFrame:
+        """
+        Contagem de acessos por (dia, usuário): colunas TS (dia), USUARIO, QTD.
+        A 1ª chamada do processo lê só TIMESTAMP/USUARIO da tabela; depois é incremental.
+        """
+        if self._contadores is None:
+            self._carregar_contadores()
+        with self._lock_cont:
+            linhas = [
+                (dia, usuario, qtd)
+                for dia, por_usuario in self._contadores.items()
+                for usuario, qtd in por_usuario.items()
+            ]
+        df = pd.DataFrame(linhas, columns=["TS", "USUARIO", "QTD"])
+        df["TS"] = pd.to_datetime(df["TS"], errors="coerce")
+        return df.dropna(subset=["TS"])
+
+
+_escritor: EscritorAcessos | None = None
+_escritor_lock = threading.Lock()
+
+
+def get_escritor_acessos() -> EscritorAcessos:
+    global _escritor
+    if _escritor is None:
+        with _escritor_lock:
+            if _escritor is None:
+                _escritor = EscritorAcessos()
+    return _escritor
@@ -4,77 +4,32 @@ import streamlit as st
 import textwrap
 
 from modules.formatters import parse_valor_percentual, formatar_para_exibir
+from modules.secoes import secao, memo, assinatura_df
 
-def display_analytics(
-    df_log,
-    df_assessores_filial,
-    df_filial_do_lider,
-    col_perc,
-    nome_lider,
-    filial_lider,
-    is_b2c,
-    role,
-    level
-):
-    
-    
+# colunas do log que entram nos cálculos do painel (assinatura dos dados)
+COLS_LOG_ANALYTICS = [
+    "ID", "TIMESTAMP", "FILIAL", "USUARIO", "ASSESSOR", "PRODUTO",
+    "PERCENTUAL ANTES", "PERCENTUAL DEPOIS",
+    "VALIDACAO NECESSARIA", "ALTERACAO APROVADA", "COMENTARIO DIRETOR"
+]
+
+
+def _preparar_log(df_log: pd.DataFrame) -> pd.DataFrame:
     # — parse de Timestamp, drop de timezone e eliminação de linhas inválidas —
+    df_log = df_log.copy()
     df_log["TIMESTAMP"] = df_log["TIMESTAMP"].astype(str).str.strip()
     df_log["DataHora"] = pd.to_datetime(
         df_log["TIMESTAMP"],
         utc=True,            # lê igual "2025-07-04T11:28:16+00:00"
         errors="coerce"
     ).dt.tz_localize(None)
-    df_log = df_log.dropna(subset=["DataHora"])
 
     # remove quaisquer registros sem DataHora válida
-    df_log = df_log.dropna(subset=["DataHora"])
-
-    # — define automaticamente o menor e maior dia presente no log —
-    min_date = df_log["DataHora"].dt.date.min()
-    max_date = df_log["DataHora"].dt.date.max()
-
-    # — espaçamento acima do filtro de datas —
-    st.markdown("<div style='margin-top:1.5rem;'></div>", unsafe_allow_html=True)
-
-    # — widget de período: Início e Término lado a lado —
-    col_start, col_end = st.columns(2)
-    with col_start:
-        start_date = st.date_input(
-            "Data de Início",
-            value=min_date,
-            min_value=min_date,
-            max_value=max_date
-        )
-    with col_end:
-        end_date = st.date_input(
-            "Data de Término",
-            value=max_date,
-            min_value=min_date,
-            max_value=max_date
-        )
+    return df_log.dropna(subset=["DataHora"])
 
 
-    # — validação de intervalo e espaçamento abaixo do filtro —
-    if end_date < start_date:
-        st.error("Data de término não pode ser anterior à de início")
-    st.markdown("<div style='margin-bottom:2rem;'></div>", unsafe_allow_html=True)
-
-    base_mask = (
-        (df_log["FILIAL"].str.upper() == filial_lider.strip().upper()) &
-        (df_log["DataHora"].dt.date >= start_date) &
-        (df_log["DataHora"].dt.date <= end_date)
-    )
-
-    mask = base_mask
-
-    df_periodo = df_log.loc[mask].copy()
-
-
-    total_alt      = df_periodo.shape[0]
-    num_ass        = df_assessores_filial.shape[0]
+def _kpis_periodo(df_periodo: pd.DataFrame, df_assessores_filial, col_perc, end_date) -> dict:
     one_month_ago  = pd.to_datetime(end_date) - pd.DateOffset(months=1)
-    alt_last_month = df_periodo[df_periodo["DataHora"] >= one_month_ago].shape[0]
 
     # Média geral dos percentuais da filial (robusto a falta de colunas)
     cols_validos = [c for c in col_perc if c in df_assessores_filial.columns]
@@ -96,40 +51,18 @@ def display_analytics(
         new = parse_valor_percentual(str(row["PERCENTUAL DEPOIS"]))
         if old != 0:
             variacoes.append((new - old) / old * 100)
-    variacao_media = sum(variacoes) / len(variacoes) if variacoes else 0
 
-    # Exibe 5 “cartões” customizados com títulos maiores
-    cols = st.columns(5)
-    labels = [
-        "👥 Assessores ativos",
-        "🔄 Alterações no período",
-        "📅 Alterações nos Últimos 30 dias",
-        "📊 Média Simples de % dos AAI",
-        "📈 Variação Mensal de Alterações"
-    ]
-    values = [
-        num_ass,
-        total_alt,
-        alt_last_month,
-        f"{media_percentual:.1f}%",
-        f"{'↑' if variacao_media>=0 else '↓'} {abs(variacao_media):.1f}%"
-    ]
+    return {
+        "total_alt":        df_periodo.shape[0],
+        "alt_last_month":   df_periodo[df_periodo["DataHora"] >= one_month_ago].shape[0],
+        "media_percentual": media_percentual,
+        "variacao_media":   sum(variacoes) / len(variacoes) if variacoes else 0,
+    }
 
-    for col, label, value in zip(cols, labels, values):
-        col.markdown(
-            f"<div style='font-size:17px; font-weight:bold; margin-bottom:4px;'>{label}</div>"
-            f"<div style='font-size:28px; color:#111;'>{value}</div>",
-            unsafe_allow_html=True
-        )
-
-    st.markdown("---")
-
-    # — Histórico de alterações da filial (com quem fez) —
-    st.markdown("**Histórico de Alterações de Percentual da Filial**")
 
+def _historico_filial(df_periodo: pd.DataFrame) -> pd.DataFrame:
     # inclui TODAS as alterações do período/filial (sem filtrar VALIDACAO)
-    df_hist = df_log.loc[
-        base_mask,
+    df_hist = df_periodo[
         [
             "DataHora", "USUARIO", "ASSESSOR", "PRODUTO",
             "PERCENTUAL ANTES", "PERCENTUAL DEPOIS",
@@ -154,10 +87,10 @@ def display_analytics(
             return "Não foi necessário"
         return "Recusado"
 
-    df_hist["Aprovação do Diretor"] = df_hist.apply(_status, axis=1)
+    df_hist["Aprovação do Diretor"] = df_hist.apply(_status, axis=1) if not df_hist.empty else []
 
     # organiza, renomeia e ordena por DataHora (mais recente primeiro)
-    df_hist = df_hist[[
+    return df_hist[[
         "Data e Hora", "USUARIO", "ASSESSOR", "PRODUTO",
         "PERCENTUAL ANTES", "PERCENTUAL DEPOIS", "Aprovação do Diretor"
     ]].rename(columns={
@@ -168,22 +101,124 @@ def display_analytics(
         "PERCENTUAL DEPOIS": "Percentual Depois"
     }).sort_values("Data e Hora", ascending=False)
 
-    st.dataframe(df_hist, use_container_width=True, hide_index=True)
 
+def display_analytics(
+    df_log,
+    df_assessores_filial,
+    df_filial_do_lider,
+    col_perc,
+    nome_lider,
+    filial_lider,
+    is_b2c,
+    role,
+    level
+):
+    # entradas das seções: cada bloco só recalcula quando as suas mudam
+    sig_log = assinatura_df(df_log, COLS_LOG_ANALYTICS)
+    sig_ass = assinatura_df(df_assessores_filial, ["NOME", *col_perc])
+    perc    = tuple(col_perc)
+    filial  = filial_lider.strip().upper()
 
+    df_log = memo("analytics_log", lambda: _preparar_log(df_log), sig_log)
 
-    st.markdown("---")
+    # — define automaticamente o menor e maior dia presente no log —
+    min_date = df_log["DataHora"].dt.date.min()
+    max_date = df_log["DataHora"].dt.date.max()
+
+    # — espaçamento acima do filtro de datas —
+    st.markdown("<div style='margin-top:1.5rem;'></div>", unsafe_allow_html=True)
+
+    # — widget de período: Início e Término lado a lado —
+    col_start, col_end = st.columns(2)
+    with col_start:
+        start_date = st.date_input(
+            "Data de Início",
+            value=min_date,
+            min_value=min_date,
+            max_value=max_date
+        )
+    with col_end:
+        end_date = st.date_input(
+            "Data de Término",
+            value=max_date,
+            min_value=min_date,
+            max_value=max_date
+        )
+
+
+    # — validação de intervalo e espaçamento abaixo do filtro —
+    if end_date < start_date:
+        st.error("Data de término não pode ser anterior à de início")
+    st.markdown("<div style='margin-bottom:2rem;'></div>", unsafe_allow_html=True)
+
+    periodo = (filial, start_date, end_date, sig_log)
+
+    def _filtrar_periodo():
+        base_mask = (
+            (df_log["FILIAL"].str.upper() == filial) &
+            (df_log["DataHora"].dt.date >= start_date) &
+            (df_log["DataHora"].dt.date <= end_date)
+        )
+        return df_log.loc[base_mask].copy()
+
+    df_periodo = memo("analytics_periodo", _filtrar_periodo, *periodo)
+
+    kpis = memo(
+        "analytics_kpis",
+        lambda: _kpis_periodo(df_periodo, df_assessores_filial, col_perc, end_date),
+        *periodo, sig_ass, perc
+    )
+    num_ass          = df_assessores_filial.shape[0]
+    total_alt        = kpis["total_alt"]
+    alt_last_month   = kpis["alt_last_month"]
+    media_percentual = kpis["media_percentual"]
+    variacao_media   = kpis["variacao_media"]
+
+    # Exibe 5 “cartões” customizados com títulos maiores
+    cols = st.columns(5)
+    labels = [
+        "👥 Assessores ativos",
+        "🔄 Alterações no período",
+        "📅 Alterações nos Últimos 30 dias",
+        "📊 Média Simples de % dos AAI",
+        "📈 Variação Mensal de Alterações"
+    ]
+    values = [
+        num_ass,
+        total_alt,
+        alt_last_month,
+        f"{media_percentual:.1f}%",
+        f"{'↑' if variacao_media>=0 else '↓'} {abs(variacao_media):.1f}%"
+    ]
 
-    st.markdown("**Alterações por Mês**")
+    for col, label, value in zip(cols, labels, values):
+        col.markdown(
+            f"<div style='font-size:17px; font-weight:bold; margin-bottom:4px;'>{label}</div>"
+            f"<div style='font-size:28px; color:#111;'>{value}</div>",
+            unsafe_allow_html=True
+        )
+
+    # — Histórico de alterações da filial (com quem fez) —
+    def _secao_historico():
+        df_hist = memo("analytics_historico", lambda: _historico_filial(df_periodo), *periodo)
+        st.dataframe(df_hist, use_container_width=True, hide_index=True)
 
-    if not df_periodo.empty:
+    secao("Histórico de Alterações de Percentual da Filial", "analytics_historico", _secao_historico)
+
+    def _secao_mensal():
+        if df_periodo.empty:
+            return
         # agrupa mensalmente e conta as alterações
-        df_time = (
-            df_periodo
-            .groupby(pd.Grouper(key="DataHora", freq="M"))["PRODUTO"]
-            .count()
-            .reset_index()
-            .rename(columns={"PRODUTO": "Qtd Alterações"})
+        df_time = memo(
+            "analytics_mensal",
+            lambda: (
+                df_periodo
+                .groupby(pd.Grouper(key="DataHora", freq="M"))["PRODUTO"]
+                .count()
+                .reset_index()
+                .rename(columns={"PRODUTO": "Qtd Alterações"})
+            ),
+            *periodo
         )
 
         # — barras com largura fixa e tooltip igual ao gráfico de produto —
@@ -215,73 +250,79 @@ def display_analytics(
 
         st.altair_chart(chart_time, use_container_width=True)
 
-
-    st.markdown("---")
-
-    st.markdown("**Média de percentual por assessor**")
-    df_ass_med = pd.DataFrame([
-        {
-            "Assessor": row["NOME"],
-            "Média (%)": f"{(sum(parse_valor_percentual(row[c]) for c in col_perc)/len(col_perc))*100:.1f}"
-        }
-        for _, row in df_assessores_filial.iterrows()
-    ])
-    st.dataframe(df_ass_med, use_container_width=True)
-
-    st.markdown("---")
-
-    st.markdown("**Média (%) por Produto**")
-
-    df_medias = pd.DataFrame({
-        "Produto": col_perc,
-        "Média (%)": [
-            df_assessores_filial[c].apply(parse_valor_percentual).mean() * 100
-            for c in col_perc
-        ]
-    })
-    bar_prod = (
-        alt.Chart(df_medias)
-        .mark_bar(color="black")
-        .encode(
-            x=alt.X("Produto:N", sort="-y", title="Produto"),
-            y=alt.Y("Média (%):Q", title="Média (%)"),
-            tooltip=["Produto", "Média (%)"]
+    secao("Alterações por Mês", "analytics_mensal", _secao_mensal)
+
+    # blocos abaixo não dependem do período: trocar as datas não os recalcula
+    def _secao_media_assessor():
+        df_ass_med = memo(
+            "analytics_media_assessor",
+            lambda: pd.DataFrame([
+                {
+                    "Assessor": row["NOME"],
+                    "Média (%)": f"{(sum(parse_valor_percentual(row[c]) for c in col_perc)/len(col_perc))*100:.1f}"
+                }
+                for _, row in df_assessores_filial.iterrows()
+            ]),
+            filial, sig_ass, perc
         )
-    )
-
-    # texto com valor no topo
-    text_prod = (
-        alt.Chart(df_medias)
-        .mark_text(
-            dy=-8,        # posiciona acima da barra
-            fontSize=14
+        st.dataframe(df_ass_med, use_container_width=True)
+
+    secao("Média de percentual por assessor", "analytics_media_assessor", _secao_media_assessor)
+
+    def _secao_media_produto():
+        df_medias = memo(
+            "analytics_media_produto",
+            lambda: pd.DataFrame({
+                "Produto": col_perc,
+                "Média (%)": [
+                    df_assessores_filial[c].apply(parse_valor_percentual).mean() * 100
+                    for c in col_perc
+                ]
+            }),
+            filial, sig_ass, perc
         )
-        .encode(
-            x=alt.X("Produto:N", sort="-y"),
-            y=alt.Y("Média (%):Q"),
-            text=alt.Text("Média (%):Q", format=".1f")
+        bar_prod = (
+            alt.Chart(df_medias)
+            .mark_bar(color="black")
+            .encode(
+                x=alt.X("Produto:N", sort="-y", title="Produto"),
+                y=alt.Y("Média (%):Q", title="Média (%)"),
+                tooltip=["Produto", "Média (%)"]
+            )
         )
-    )
 
-    # calcula o valor máximo para definir altura dinâmica
-    max_val = df_medias["Média (%)"].max()
-    # usa 6px por ponto percentual + 20px de folga para o texto
-    dynamic_height = int(max_val * 6) + 20
+        # texto com valor no topo
+        text_prod = (
+            alt.Chart(df_medias)
+            .mark_text(
+                dy=-8,        # posiciona acima da barra
+                fontSize=14
+            )
+            .encode(
+                x=alt.X("Produto:N", sort="-y"),
+                y=alt.Y("Média (%):Q"),
+                text=alt.Text("Média (%):Q", format=".1f")
+            )
+        )
 
-    # combina barras e texto, ajustando apenas a altura
-    chart_prod = (
-        (bar_prod + text_prod)
-        .properties(height=dynamic_height)
-    )
-    st.altair_chart(chart_prod, use_container_width=True)
+        # calcula o valor máximo para definir altura dinâmica
+        max_val = df_medias["Média (%)"].max()
+        # usa 6px por ponto percentual + 20px de folga para o texto
+        dynamic_height = int(max_val * 6) + 20
 
+        # combina barras e texto, ajustando apenas a altura
+        chart_prod = (
+            (bar_prod + text_prod)
+            .properties(height=dynamic_height)
+        )
+        st.altair_chart(chart_prod, use_container_width=True)
 
-    st.markdown("---")
+    secao("Média (%) por Produto", "analytics_media_produto", _secao_media_produto)
 
-    st.markdown("**Teto de percentuais da filial**")
-    if is_b2c:
-        st.info("Filial B2C: não se aplica teto de percentual.")
-    else:
+    def _secao_teto():
+        if is_b2c:
+            st.info("Filial B2C: não se aplica teto de percentual.")
+            return
         teto_vals = df_filial_do_lider.iloc[0][col_perc]
         teto_display = {
             c: formatar_para_exibir(teto_vals[c])
@@ -298,3 +339,5 @@ def display_analytics(
             "<hr style='margin-top:0.5rem; margin-bottom:1rem;'/>",
             unsafe_allow_html=True
         )
+
+    secao("Teto de percentuais da filial", "analytics_teto", _secao_teto)
@@ -1,18 +1,10 @@
-import random
-import pandas as pd
+import hmac
 import streamlit as st
-import requests
-import msal
-import time
 
-from modules.db import carregar_filial
-from modules.email_service import (
-    limpar_cpf,
-    gerar_senha_personalizada,
-    enviar_codigo_email
-)
-from config import TENANT_ID, CLIENT_ID, CLIENT_SECRET, EMAIL_USER
+from modules.email_service import enviar_resumo_email as _enviar_resumo_email
 from modules.db import registrar_acesso
+from modules.login_directory import get_diretorio
+from modules.otp import aquecer_transporte, emitir_codigo
 
 LEVEL_BY_ROLE = {
     "admin": 1,
@@ -25,7 +17,69 @@ LEVEL_BY_ROLE = {
     "comissoes": 6,
 }
 
+# mensagens por perfil: (senha inválida, código enviado, falha no envio)
+MENSAGENS_LOGIN = {
+    "admin": (
+        "Senha de Admin inválida.",
+        "Código de verificação enviado para seu e-mail de Admin.",
+        "Não foi possível enviar o código de verificação ao Admin.",
+    ),
+    "rh": (
+        "Senha de RH inválida.",
+        "Código de verificação enviado para seu e-mail (RH).",
+        "Não foi possível enviar o código de verificação (RH).",
+    ),
+    "comissoes": (
+        "Senha de Comissões inválida.",
+        "Código de verificação enviado para seu e-mail (Comissões).",
+        "Não foi possível enviar o código de verificação (Comissões).",
+    ),
+    "director": (
+        "Senha de Diretor inválida.",
+        "Código de verificação enviado para seu e-mail de Diretor.",
+        "Não foi possível enviar o código de verificação ao Diretor.",
+    ),
+    "rm": (
+        "Senha de RM inválida.",
+        "Código de verificação enviado para seu e-mail de RM.",
+        "Não foi possível enviar o código de verificação à RM.",
+    ),
+    "superintendent": (
+        "Senha de Superintendente inválida.",
+        "Código de verificação enviado para seu e-mail de Superintendente.",
+        "Não foi possível enviar o código de verificação ao Superintendente.",
+    ),
+    "leader": (
+        "Usuário não encontrado ou senha incorreta.",
+        "Código de verificação enviado para seu e-mail.",
+        "Não foi possível enviar o código de verificação ao Líder.",
+    ),
+}
+MENSAGENS_LOGIN["leader2"] = MENSAGENS_LOGIN["leader"]
+
+def _iniciar_otp(temp_dados: dict, role: str, level: int) -> None:
+    """
+    Dispara o envio do código em segundo plano e já avança para a etapa 2;
+    o resultado do envio é acompanhado em do_login_stage2.
+    """
+    _, msg_ok, msg_falha = MENSAGENS_LOGIN[role]
+    email = temp_dados.get("EMAIL_LIDER")
+    if not email:
+        st.error(msg_falha)
+        return
+    code, envio = emitir_codigo(email, temp_dados["LIDER"])
+    st.session_state.confirmation_code = code
+    st.session_state.otp_envio   = envio
+    st.session_state.otp_msgs    = (msg_ok, msg_falha)
+    st.session_state.temp_dados  = temp_dados
+    st.session_state.role        = role
+    st.session_state.level       = level
+    st.session_state.login_stage = 2
+    st.rerun()
+
 def do_login_stage1():
+    # token + TLS com o Graph prontos enquanto o usuário digita
+    aquecer_transporte()
     st.subheader("Faça login")
     with st.form("login_form"):
         usuario_input = st.text_input("Usuário", placeholder="Nome e sobrenome")
@@ -40,247 +94,82 @@ def do_login_stage1():
         st.error("Informe usuário e senha para prosseguir.")
         return
 
-    # 1) Tenta como ADMIN (OTP por e-mail)
-    admins = st.secrets.get("admins", {})
-    found_admin = next(
-        (k for k in admins if k.strip().upper() == user.upper()),
-        None
-    )
-    if found_admin:
-        if pwd != admins[found_admin]:
-            st.error("Senha de Admin inválida.")
-            return
-        code = f"{random.randint(0, 999999):06d}"
-        admin_email = st.secrets["admin_emails"][found_admin]
-        if enviar_codigo_email(admin_email, found_admin, code):
-            st.session_state.confirmation_code = code
-            st.session_state.temp_dados = {
-                "LIDER":       found_admin.strip(),
-                "EMAIL_LIDER": admin_email
-            }
-            st.session_state.role        = "admin"
-            st.session_state.level = 1
-            st.session_state.login_stage = 2
-            st.info("Código de verificação enviado para seu e-mail de Admin.")
-        else:
-            st.error("Não foi possível enviar o código de verificação ao Admin.")
-        return
-    
-    # 1.25) RH (OTP por e-mail) - nível 2
-    rh_users = st.secrets.get("rh", {})
-    found_rh = next((k for k in rh_users if k.strip().upper() == user.upper()), None)
-    if found_rh:
-        if pwd != rh_users[found_rh]:
-            st.error("Senha de RH inválida.")
-            return
-        code = f"{random.randint(0, 999999):06d}"
-        rh_email = st.secrets["rh_emails"][found_rh]
-        if enviar_codigo_email(rh_email, found_rh, code):
-            st.session_state.confirmation_code = code
-            st.session_state.temp_dados = {
-                "LIDER":       found_rh.strip(),
-                "EMAIL_LIDER": rh_email
-            }
-            st.session_state.role        = "rh"
-            st.session_state.level       = 6
-            st.session_state.login_stage = 2
-            st.info("Código de verificação enviado para seu e-mail (RH).")
-        else:
-            st.error("Não foi possível enviar o código de verificação (RH).")
-        return
-    
-    # 1.3) Comissões (OTP por e-mail) - nível 6
-    com_users = st.secrets.get("comissoes", {})
-    found_com = next((k for k in com_users if k.strip().upper() == user.upper()), None)
-    if found_com:
-        if pwd != com_users[found_com]:
-            st.error("Senha de Comissões inválida.")
-            return
-        code = f"{random.randint(0, 999999):06d}"
-        com_email = st.secrets["comissoes_emails"][found_com]
-        if enviar_codigo_email(com_email, found_com, code):
-            st.session_state.confirmation_code = code
-            st.session_state.temp_dados = {
-                "LIDER":       found_com.strip(),
-                "EMAIL_LIDER": com_email
-            }
-            st.session_state.role        = "comissoes"
-            st.session_state.level       = 6   # ✅ Comissões = nível 6 (leitura global)
-            st.session_state.login_stage = 2
-            st.info("Código de verificação enviado para seu e-mail (Comissões).")
-        else:
-            st.error("Não foi possível enviar o código de verificação (Comissões).")
+    # 1) Um único lookup no diretório (secrets + snapshot da filial)
+    entrada = get_diretorio().buscar(user)
+    if entrada is None:
+        st.error("Usuário não encontrado ou senha incorreta.")
         return
 
-
-
-    # 1.35) Diretor (OTP por e-mail)
-    directors = st.secrets["directors"]  # { "NOME": "senha", ... }
-    found_dir = next(
-        (k for k in directors if k.strip().upper() == user.upper()),
-        None
-    )
-    if found_dir:
-        if pwd != directors[found_dir]:
-            st.error("Senha de Diretor inválida.")
+    # 1.1) Admin, RH, Comissões, Diretor, RM, Superintendente (OTP por e-mail)
+    cred = entrada.secrets
+    if cred is not None:
+        if not hmac.compare_digest(pwd.encode(), cred.senha.encode()):
+            st.error(MENSAGENS_LOGIN[cred.role][0])
             return
-        code = f"{random.randint(0, 999999):06d}"
-        diretor_email = st.secrets["director_emails"][found_dir]
-        if enviar_codigo_email(diretor_email, found_dir, code):
-            st.session_state.confirmation_code = code
-            st.session_state.temp_dados = {
-                "LIDER":       found_dir.strip(),
-                "EMAIL_LIDER": diretor_email
-            }
-            st.session_state.role        = "director"
-            st.session_state.level = 3
-            st.session_state.login_stage = 2
-            st.info("Código de verificação enviado para seu e-mail de Diretor.")
-        else:
-            st.error("Não foi possível enviar o código de verificação ao Diretor.")
+        _iniciar_otp(
+            {"LIDER": cred.nome.strip(), "EMAIL_LIDER": cred.email},
+            cred.role,
+            cred.level
+        )
         return
 
-    # 1.5) Agora tenta autenticar como RM com OTP (mesma lógica de Diretor)
-    rms = st.secrets["rms"]  # { "NOME_RM": "senha", ... }
-    found_rm = next(
-        (k for k in rms if k.strip().upper() == user.upper()),
-        None
-    )
-    if found_rm:
-        if pwd != rms[found_rm]:
-            st.error("Senha de RM inválida.")
-            return
-        code = f"{random.randint(0, 999999):06d}"
-        rm_email = st.secrets["rm_emails"][found_rm]
-        if enviar_codigo_email(rm_email, found_rm, code):
-            st.session_state.confirmation_code = code
-            st.session_state.temp_dados = {
-                "LIDER":       found_rm.strip(),
-                "EMAIL_LIDER": rm_email
-            }
-            st.session_state.role        = "rm"
-            st.session_state.level = 5
-            st.session_state.login_stage = 2
-            st.info("Código de verificação enviado para seu e-mail de RM.")
-        else:
-            st.error("Não foi possível enviar o código de verificação à RM.")
-        return
-    
-    # 1.75) Agora autentica como Superintendente com OTP
-    superintendents = st.secrets["superintendents"]  # { "NOME_SUP": "senha", … }
-    found_sup = next(
-        (k for k in superintendents if k.strip().upper() == user.upper()),
-        None
-    )
-    if found_sup:
-        if pwd != superintendents[found_sup]:
-            st.error("Senha de Superintendente inválida.")
-            return
-        code = f"{random.randint(0,999999):06d}"
-        sup_email = st.secrets["superintendent_emails"][found_sup]
-        if enviar_codigo_email(sup_email, found_sup, code):
-            st.session_state.confirmation_code = code
-            st.session_state.temp_dados = {
-                "LIDER":       found_sup.strip(),
-                "EMAIL_LIDER": sup_email
-            }
-            st.session_state.role        = "superintendent"
-            st.session_state.level = 4
-            st.session_state.login_stage = 2
-            st.info("Código de verificação enviado para seu e-mail de Superintendente.")
-        else:
-            st.error("Não foi possível enviar o código de verificação ao Superintendente.")
+    # 2) Líder 1 / Líder 2 (OTP por e-mail) — senha conferida pelo digest pré-calculado
+    cand = entrada.verificar_lider(pwd)
+    if cand is not None:
+        _iniciar_otp(
+            {
+                "LIDER":       cand.lider,
+                "CPF_LIDER":   cand.cpf,
+                "EMAIL_LIDER": cand.email
+            },
+            cand.role,
+            LEVEL_BY_ROLE[cand.role]
+        )
         return
 
+    st.error("Usuário não encontrado ou senha incorreta.")
 
-    # 2) Se não for Diretor, tenta como Líder 1 (OTP por e-mail)
-    df_filial_all = carregar_filial()
-    df_filial_all["CPF_LIDER_CLEAN"] = (
-        df_filial_all["CPF"].astype(str).apply(limpar_cpf)
-    )
-
-    nome_upper = user.upper()
-    # -> Líder 1
-    df_cand1 = df_filial_all[
-        df_filial_all["LIDER"].str.strip().str.upper() == nome_upper
-    ]
-    valid = False
-    if not df_cand1.empty:
-        for _, row in df_cand1.iterrows():
-            senha_esp = gerar_senha_personalizada(
-                row["FILIAL"], row["LIDER"], row["CPF"]
-            )
-            if pwd == senha_esp:
-                valid = True
-                st.session_state.temp_dados = {
-                    "LIDER":       row["LIDER"],
-                    "CPF_LIDER":   row["CPF"],
-                    "EMAIL_LIDER": row["EMAIL"]
-                }
-                st.session_state.role = "leader"
-                st.session_state.level = 4
-                break
-
-    # -> Líder 2
-    if not valid:
-        df_cand2 = df_filial_all[
-            df_filial_all["LIDER2"].str.strip().str.upper() == nome_upper
-        ]
-        if not df_cand2.empty:
-            for _, row in df_cand2.iterrows():
-                senha_esp2 = gerar_senha_personalizada(
-                    row["FILIAL"], row["LIDER2"], row["CPF_LIDER2"]
-                )
-                if pwd == senha_esp2:
-                    valid = True
-                    st.session_state.temp_dados = {
-                        "LIDER":        row["LIDER2"],
-                        "CPF_LIDER":    row["CPF_LIDER2"],
-                        "EMAIL_LIDER":  row["EMAIL_LIDER2"]
-                    }
-                    # distinguir a role interna
-                    st.session_state.role = "leader2"
-                    st.session_state.level = 4
-                    break
-
-    if not valid:
-        st.error("Usuário não encontrado ou senha incorreta.")
-        return
-
-    # envia OTP ao Líder (1 ou 2)
-    code = f"{random.randint(0, 999999):06d}"
-    email = st.session_state.temp_dados["EMAIL_LIDER"]
-    nome  = st.session_state.temp_dados["LIDER"]
-    if enviar_codigo_email(email, nome, code):
-        st.session_state.confirmation_code = code
-        # Garante que role exista; se já for "leader2" mantém, caso contrário define "leader"
-        st.session_state.role        = st.session_state.get("role", "leader")
-        st.session_state.login_stage = 2
-        st.info("Código de verificação enviado para seu e-mail.")
-    else:
-        st.error("Não foi possível enviar o código de verificação ao Líder.")
-    return
+def _status_envio_otp() -> bool:
+    """Mostra o andamento do envio do código; False se o envio falhou."""
+    envio = st.session_state.get("otp_envio")
+    msg_ok, msg_falha = st.session_state.get("otp_msgs", ("", ""))
+    if envio is None:
+        return True
+    if not envio.done():
+        st.caption("Enviando código para o seu e-mail…")
+        return True
+    erro = envio.exception()
+    if erro is None:
+        st.info(msg_ok)
+        return True
+    st.error(msg_falha)
+    st.caption(str(erro))
+    return False
 
 def do_login_stage2():
     st.subheader("Confirme o código de acesso")
+    envio_ok = _status_envio_otp()
     with st.form("confirm_form"):
         code_input = st.text_input(
             "Código de 6 dígitos", max_chars=6
         )
         btn2 = st.form_submit_button("Confirmar")
+    if not envio_ok and st.button("Voltar ao login"):
+        for k in ("login_stage", "confirmation_code", "otp_envio", "otp_msgs", "temp_dados"):
+            st.session_state.pop(k, None)
+        st.rerun()
     if btn2:
         if code_input == st.session_state.confirmation_code:
             st.session_state.autenticado = True
             st.session_state.dados_lider = st.session_state.temp_dados
-            # salva quem é o usuário e role atual
+            st.session_state.pop("otp_envio", None)
+            # salva quem é o usuário e role atual (enfileirado; gravação em lote)
             registrar_acesso(
                 usuario=st.session_state.dados_lider["LIDER"],
                 role=st.session_state.get("role", ""),
                 nivel=st.session_state.get("level", None)
             )
-            st.success("Login completo! Bem-vindo.")
-            time.sleep(3)
-            return        # sai e recarrega já logado, liberando o app
+            st.rerun()    # recarrega já logado, liberando o app
         else:
             st.error("Código incorreto. Tente novamente.")
 
@@ -288,43 +177,4 @@ def enviar_resumo_email(destinatarios: list[str], assunto: str, corpo: str) -> b
     """
     Envia um e-mail com assunto e corpo para uma lista de destinatários via Microsoft Graph.
     """
-    # 1) Obter token via Client Credentials Flow
-    app = msal.ConfidentialClientApplication(
-        CLIENT_ID,
-        authority=f"https://login.microsoftonline.com/{TENANT_ID}",
-        client_credential=CLIENT_SECRET
-    )
-    token_resp = app.acquire_token_for_client(scopes=["https://graph.microsoft.com/.default"])
-    if "access_token" not in token_resp:
-        st.error(f"Erro ao obter token para envio de e-mail: {token_resp.get('error_description')}")
-        return False
-    token = token_resp["access_token"]
-
-    # 2) Montar payload
-    mail = {
-        "message": {
-            "subject": assunto,
-            "body": {
-                "contentType": "Text",
-                "content": corpo
-            },
-            "toRecipients": [
-                {"emailAddress": {"address": email}} for email in destinatarios
-            ],
-            "from": {"emailAddress": {"address": EMAIL_USER}}
-        },
-        "saveToSentItems": "true"
-    }
-
-    # 3) Enviar via Graph API
-    endpoint = f"https://graph.microsoft.com/v1.0/users/{EMAIL_USER}/sendMail"
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/json"
-    }
-    resp = requests.post(endpoint, headers=headers, json=mail)
-    if resp.status_code == 202:
-        return True
-    else:
-        st.error(f"Falha ao enviar e-mail: {resp.status_code} – {resp.text}")
-        return False
\ No newline at end of file
+    return _enviar_resumo_email(destinatarios, assunto, corpo, content_type="Text")
@@ -1,9 +1,16 @@
 # modules/comissoes.py
 import pandas as pd
 import streamlit as st
-import altair as alt
 
 from modules.db import _ler_tabela  # reusa o reader já existente (chunked)
+from modules.esquema import marcar_versao
+from modules.resiliencia import desatualizado_desde
+from modules.secoes import secao, memo, assinatura_df
+from modules.tracing import rastrear
+
+COLS_ASSINATURA_COMISSOES = [
+    "ID", "DT_REF", "QUEM_RECEBE", "SIGLA_RECEBEDOR", "VLR_COMISSAO_BRUTA", "VLR_COMISSAO_LIQUIDA"
+]
 
 def _fmt_brl(x: float) -> str:
     try:
@@ -13,6 +20,7 @@ def _fmt_brl(x: float) -> str:
 
 # cache ~35 dias; sem spinner (não aparece a tarja "Running ...")
 @st.cache_data(ttl=60*60*24*25, show_spinner=False, max_entries=1)
+@rastrear("comissoes_ajuste+origem", "carregar")
 def _carregar_comissoes_filial() -> pd.DataFrame:
     """
     Carrega e unifica comissoes_ajuste + comissoes_origem
@@ -25,7 +33,12 @@ def _carregar_comissoes_filial() -> pd.DataFrame:
     ]
     a = _ler_tabela("comissoes_ajuste", columns=cols)
     b = _ler_tabela("comissoes_origem", columns=cols)
-    df = pd.concat([a, b], ignore_index=True)
+    # concat descarta attrs diferentes: a versão da carga é carimbada de novo, e o
+    # aviso de snapshot antigo (ver resiliencia.ler_com_fallback) é repassado
+    desde = [d for d in (desatualizado_desde(a), desatualizado_desde(b)) if d]
+    df = marcar_versao(pd.concat([a, b], ignore_index=True), "comissoes")
+    if desde:
+        df.attrs["desatualizado_desde"] = min(desde)
 
     if df.empty:
         return df
@@ -42,12 +55,75 @@ def _carregar_comissoes_filial() -> pd.DataFrame:
     return df.dropna(subset=["DT_REF"])
 
 
+def _base_filial(m: pd.DataFrame, df_assessores: pd.DataFrame) -> pd.DataFrame:
+    """Comissões da filial com o NOME do assessor (ou da filial, para equipe/escritório)."""
+    m = m.copy()
+
+    # Normaliza assessores e adiciona NOME à base filtrada m
+    df_ass = df_assessores[["SIGLA", "NOME", "FILIAL"]].copy()
+    df_ass["SIGLA_MERGE"] = df_ass["SIGLA"].astype(str).str.strip().str.upper()
+    df_ass["FILIAL"] = df_ass["FILIAL"].astype(str).str.strip().str.upper()
+
+    m["SIGLA_MERGE"] = m["SIGLA_RECEBEDOR"].astype(str).str.strip().str.upper()
+    m = m.merge(df_ass[["SIGLA_MERGE", "NOME"]], on="SIGLA_MERGE", how="left")
+
+    # Para linhas de EQUIPE/ESCRITÓRIO que não são assessor, usamos o nome da FILIAL
+    m["NOME"] = m["NOME"].where(m["NOME"].notna() & (m["QUEM_RECEBE"] == "ASSESSOR"), m["NOME_FILIAL"])
+    return m
+
+
+def _pareto_assessores(m: pd.DataFrame) -> pd.DataFrame:
+    df_ass_pareto = (
+        m.loc[m["QUEM_RECEBE"].isin(["ASSESSOR","EXTERNO"])]
+        .groupby("NOME", as_index=False)["VLR_COMISSAO_LIQUIDA"]
+        .sum()
+        .rename(columns={"VLR_COMISSAO_LIQUIDA": "VALOR"})
+    )
+    if df_ass_pareto.empty:
+        return df_ass_pareto
+    df_ass_pareto = df_ass_pareto.sort_values("VALOR", ascending=False).reset_index(drop=True)
+    total_val = float(df_ass_pareto["VALOR"].sum())
+    df_ass_pareto["ACUM"]      = df_ass_pareto["VALOR"].cumsum()
+    df_ass_pareto["ACUM_PCT"]  = (df_ass_pareto["ACUM"] / total_val).fillna(0.0)  # 0–1
+    return df_ass_pareto
+
+
+def _lucro_margem_mensal(m: pd.DataFrame) -> pd.DataFrame:
+    tmp = m.groupby(["MES","QUEM_RECEBE"], as_index=False)["VLR_COMISSAO_LIQUIDA"].sum()
+    rep  = tmp[tmp["QUEM_RECEBE"].isin(["ASSESSOR","EQUIPE","EXTERNO"])].groupby("MES", as_index=False)["VLR_COMISSAO_LIQUIDA"].sum().rename(columns={"VLR_COMISSAO_LIQUIDA":"REPASSE"})
+    com  = tmp[tmp["QUEM_RECEBE"].isin(["ASSESSOR","EXTERNO"])].groupby("MES", as_index=False)["VLR_COMISSAO_LIQUIDA"].sum().rename(columns={"VLR_COMISSAO_LIQUIDA":"COMISSOES"})
+    fat  = m.groupby("MES", as_index=False)["VLR_COMISSAO_BRUTA"].sum().rename(columns={"VLR_COMISSAO_BRUTA":"FATURAMENTO"})
+
+    g_mes = fat.merge(rep, on="MES", how="left").merge(com, on="MES", how="left").fillna(0.0)
+    g_mes["LUCRO BRUTO FILIAL"]  = g_mes["REPASSE"] - g_mes["COMISSOES"]
+    g_mes["MARGEM"] = (g_mes["LUCRO BRUTO FILIAL"] / g_mes["REPASSE"]).replace([float("inf"), -float("inf")], 0.0).fillna(0.0)
+    # TOTAL agora representa apenas o que é exibido nas barras (COMISSÕES + LUCRO BRUTO FILIAL)
+    g_mes["TOTAL"] = g_mes[["COMISSOES", "LUCRO BRUTO FILIAL"]].sum(axis=1)
+    return g_mes.sort_values("MES")
+
+
+def _pivot_assessor_mes(m: pd.DataFrame) -> pd.DataFrame:
+    pvt = (
+        m.pivot_table(
+            index="NOME",
+            columns="MES",
+            values="VLR_COMISSAO_LIQUIDA",
+            aggfunc="sum",
+            fill_value=0.0,
+        )
+        .sort_index()
+    )
+    return pvt.applymap(_fmt_brl)
+
+
 def display_comissoes(df_assessores: pd.DataFrame, filial_selecionada: str) -> None:
     """
     Página 'Comissões': join com assessores, filtros e visualizações.
     - df_assessores: DataFrame completo já carregado pelo app
     - filial_selecionada: string (ex.: 'TAMBORE')
     """
+    import altair as alt  # só quando a página abre (o pré-aquecimento do cache não precisa)
+
     title_ph = st.empty()
 
     # CSS para cards (mesma linha editorial dos seus dashboards)
@@ -107,29 +183,25 @@ def display_comissoes(df_assessores: pd.DataFrame, filial_selecionada: str) -> N
     finally:
         ph_loader.empty()
 
+    # snapshot antigo servido no lugar do banco: não pode ficar 25 dias no cache
+    if desatualizado_desde(df_all):
+        st.warning("O banco de dados não respondeu; exibindo as últimas comissões carregadas.")
+        _carregar_comissoes_filial.clear()
+
     if df_all.empty:
         st.info("Sem dados nas tabelas 'comissoes_ajuste' / 'comissoes_origem'.")
         return
 
     sel_filial_up = (filial_selecionada or "").strip().upper()
-    m = df_all[df_all["NOME_FILIAL"] == sel_filial_up].copy()
-    if m.empty:
+    m_filial = df_all[df_all["NOME_FILIAL"] == sel_filial_up]
+    if m_filial.empty:
         st.info(f"Não há registros para a filial **{filial_selecionada}**.")
         return
 
-    # Normaliza assessores e adiciona NOME à base filtrada m
-    df_ass = df_assessores[["SIGLA", "NOME", "FILIAL"]].copy()
-    df_ass["SIGLA_MERGE"] = df_ass["SIGLA"].astype(str).str.strip().str.upper()
-    df_ass["FILIAL"] = df_ass["FILIAL"].astype(str).str.strip().str.upper()
-
-    m["SIGLA_MERGE"] = m["SIGLA_RECEBEDOR"].astype(str).str.strip().str.upper()
-    m = m.merge(df_ass[["SIGLA_MERGE", "NOME"]], on="SIGLA_MERGE", how="left")
-
-    # Para linhas de EQUIPE/ESCRITÓRIO que não são assessor, usamos o nome da FILIAL
-    m["NOME"] = m.apply(
-        lambda r: r["NOME"] if pd.notna(r["NOME"]) and r["QUEM_RECEBE"] == "ASSESSOR" else r["NOME_FILIAL"],
-        axis=1
-    )
+    # entradas das seções: filial + assinatura dos dados (+ filtros, mais abaixo)
+    sig_com = assinatura_df(m_filial, COLS_ASSINATURA_COMISSOES)
+    sig_ass = assinatura_df(df_assessores, ["SIGLA", "NOME"])
+    m = memo("comissoes_base", lambda: _base_filial(m_filial, df_assessores), sel_filial_up, sig_com, sig_ass)
 
     # Título fixo da página
     title_ph = st.empty()
@@ -156,13 +228,12 @@ def display_comissoes(df_assessores: pd.DataFrame, filial_selecionada: str) -> N
 
 
     # A base de trabalho agora é sempre 'm' (já filtrada por filial e mês)
-    df = m.copy()
+    df = m
 
     # 3) Filtros adicionais (sem categoria)
     meses = ["Todos"] + sorted(df["MES"].dropna().unique().tolist())
     nomes = ["Todos"] + sorted(df["NOME"].dropna().unique().tolist())
 
-    m = df.copy()
     c1, c2, c3 = st.columns(3)
     with c1:
         nome_sel = st.selectbox("Assessor", nomes, index=0, key="f_nome_comissoes")
@@ -172,17 +243,18 @@ def display_comissoes(df_assessores: pd.DataFrame, filial_selecionada: str) -> N
         quem_opts = ["Todos"] + sorted(df["QUEM_RECEBE"].dropna().unique().tolist())
         quem_sel  = st.selectbox("Quem recebe", quem_opts, index=0, key="f_quem_comissoes")
 
-    if nome_sel != "Todos":
-        m = m[m["NOME"] == nome_sel]
-    if mes_sel != "Todos":
-        m = m[m["MES"] == mes_sel]
-    if quem_sel != "Todos":
-        m = m[m["QUEM_RECEBE"] == quem_sel]
+    def _filtrar():
+        f = df
+        if nome_sel != "Todos":
+            f = f[f["NOME"] == nome_sel]
+        if mes_sel != "Todos":
+            f = f[f["MES"] == mes_sel]
+        if quem_sel != "Todos":
+            f = f[f["QUEM_RECEBE"] == quem_sel]
+        return f
 
-    if nome_sel != "Todos":
-        m = m[m["NOME"] == nome_sel]
-    if mes_sel != "Todos":
-        m = m[m["MES"] == mes_sel]
+    filtros = (sel_filial_up, nome_sel, mes_sel, quem_sel, sig_com, sig_ass)
+    m = memo("comissoes_filtrada", _filtrar, *filtros)
 
     if m.empty:
         st.warning("Nenhum registro para os filtros selecionados.")
@@ -257,26 +329,13 @@ def display_comissoes(df_assessores: pd.DataFrame, filial_selecionada: str) -> N
 
 
 
-    st.markdown("---")
-
     # 5) Pareto por Assessores
+    def _secao_pareto():
+        df_ass_pareto = memo("comissoes_pareto", lambda: _pareto_assessores(m), *filtros)
 
-    st.markdown("**Pareto do 'Lucro Bruto' por Assessores**")
-
-    df_ass_pareto = (
-        m.loc[m["QUEM_RECEBE"].isin(["ASSESSOR","EXTERNO"])]
-        .groupby("NOME", as_index=False)["VLR_COMISSAO_LIQUIDA"]
-        .sum()
-        .rename(columns={"VLR_COMISSAO_LIQUIDA": "VALOR"})
-    )
-
-    if df_ass_pareto.empty:
-        st.info("Não há comissões de assessores no recorte selecionado.")
-    else:
-        df_ass_pareto = df_ass_pareto.sort_values("VALOR", ascending=False).reset_index(drop=True)
-        total_val = float(df_ass_pareto["VALOR"].sum())
-        df_ass_pareto["ACUM"]      = df_ass_pareto["VALOR"].cumsum()
-        df_ass_pareto["ACUM_PCT"]  = (df_ass_pareto["ACUM"] / total_val).fillna(0.0)  # 0–1
+        if df_ass_pareto.empty:
+            st.info("Não há comissões de assessores no recorte selecionado.")
+            return
 
         # Barras (VALOR) + Linha (ACUM_% com eixo secundário)
         bars = (
@@ -329,120 +388,92 @@ def display_comissoes(df_assessores: pd.DataFrame, filial_selecionada: str) -> N
             use_container_width=True
         )
 
-
-    st.markdown("---")
+    secao("Pareto do 'Lucro Bruto' por Assessores", "comissoes_pareto", _secao_pareto)
 
     # ==== Representação do Lucro Bruto e Margem da Filial (competência) ====
-    st.markdown("**Representação do Lucro Bruto e Margem da Filial no regime de competência (Liquidação no mês subsequente)**")
-
-    g_mes = (
-        m.groupby("MES", as_index=False)
-        .agg(
-            FATURAMENTO=("VLR_COMISSAO_BRUTA", "sum"),
-            REPASSE=("VLR_COMISSAO_LIQUIDA", lambda s: float(m.loc[(m["MES"]==s.index.get_level_values(0)[0]) & (m["QUEM_RECEBE"].isin(["ASSESSOR","EQUIPE"])),"VLR_COMISSAO_LIQUIDA"].sum())),
-            COMISSOES=("VLR_COMISSAO_LIQUIDA", lambda s: float(m.loc[(m["MES"]==s.index.get_level_values(0)[0]) & (m["QUEM_RECEBE"]=="ASSESSOR"),"VLR_COMISSAO_LIQUIDA"].sum()))
+    def _secao_lucro_margem():
+        g_mes = memo("comissoes_lucro_margem", lambda: _lucro_margem_mensal(m), *filtros)
+
+        base = alt.Chart(g_mes).encode(x=alt.X("MES:N", title="Mês (YYYY-MM)"))
+
+        bars = base.mark_bar().encode(
+            y=alt.Y("value:Q", title="Valores (R$)"),
+            color=alt.Color(
+                "variavel:N",
+                legend=alt.Legend(title="Séries"),
+                scale=alt.Scale(                             # <- cores fixas por série
+                    domain=["COMISSOES", "LUCRO BRUTO FILIAL"],
+                    range=["#8B5CF6", "#887575"]            # COMISSÕES=preto | LBF=roxo SmartC
+                )
+            ),
+            tooltip=[
+                "MES",
+                alt.Tooltip("variavel:N", title="Série"),
+                alt.Tooltip("value:Q", format=",.2f", title="R$")
+            ]
+        ).transform_fold(
+            fold=["COMISSOES","LUCRO BRUTO FILIAL"], as_=["variavel","value"]
         )
-        .sort_values("MES")
-    )
 
-    # Ajuste das agregações (mais explícito e estável)
-    tmp = m.groupby(["MES","QUEM_RECEBE"], as_index=False)["VLR_COMISSAO_LIQUIDA"].sum()
-    rep  = tmp[tmp["QUEM_RECEBE"].isin(["ASSESSOR","EQUIPE","EXTERNO"])].groupby("MES", as_index=False)["VLR_COMISSAO_LIQUIDA"].sum().rename(columns={"VLR_COMISSAO_LIQUIDA":"REPASSE"})
-    com  = tmp[tmp["QUEM_RECEBE"].isin(["ASSESSOR","EXTERNO"])].groupby("MES", as_index=False)["VLR_COMISSAO_LIQUIDA"].sum().rename(columns={"VLR_COMISSAO_LIQUIDA":"COMISSOES"})
-    fat  = m.groupby("MES", as_index=False)["VLR_COMISSAO_BRUTA"].sum().rename(columns={"VLR_COMISSAO_BRUTA":"FATURAMENTO"})
-
-    g_mes = fat.merge(rep, on="MES", how="left").merge(com, on="MES", how="left").fillna(0.0)
-    g_mes["LUCRO BRUTO FILIAL"]  = g_mes["REPASSE"] - g_mes["COMISSOES"]
-    g_mes["MARGEM"] = (g_mes["LUCRO BRUTO FILIAL"] / g_mes["REPASSE"]).replace([float("inf"), -float("inf")], 0.0).fillna(0.0)
-    # TOTAL agora representa apenas o que é exibido nas barras (COMISSÕES + LUCRO BRUTO FILIAL)
-    g_mes["TOTAL"] = g_mes[["COMISSOES", "LUCRO BRUTO FILIAL"]].sum(axis=1)
-
-
-    base = alt.Chart(g_mes).encode(x=alt.X("MES:N", title="Mês (YYYY-MM)"))
-
-    bars = base.mark_bar().encode(
-        y=alt.Y("value:Q", title="Valores (R$)"),
-        color=alt.Color(
-            "variavel:N",
-            legend=alt.Legend(title="Séries"),
-            scale=alt.Scale(                             # <- cores fixas por série
-                domain=["COMISSOES", "LUCRO BRUTO FILIAL"],
-                range=["#8B5CF6", "#887575"]            # COMISSÕES=preto | LBF=roxo SmartC
+        line = (
+            base
+            .mark_line(
+                color="#000000",
+                point=alt.OverlayMarkDef(filled=True, color="#000000")
+            )
+            .encode(
+                y=alt.Y(
+                    "MARGEM:Q",
+                    axis=alt.Axis(title="Margem Bruta (L/R)", orient="right"),
+                    scale=alt.Scale(domain=[0, 1.15], nice=False, clamp=True)
+                ),
+                tooltip=["MES", alt.Tooltip("MARGEM:Q", format=".0%")]
             )
-        ),
-        tooltip=[
-            "MES",
-            alt.Tooltip("variavel:N", title="Série"),
-            alt.Tooltip("value:Q", format=",.2f", title="R$")
-        ]
-    ).transform_fold(
-        fold=["COMISSOES","LUCRO BRUTO FILIAL"], as_=["variavel","value"]
-    )
-
-    line = (
-        base
-        .mark_line(
-            color="#000000",
-            point=alt.OverlayMarkDef(filled=True, color="#000000")
         )
-        .encode(
-            y=alt.Y(
-                "MARGEM:Q",
-                axis=alt.Axis(title="Margem Bruta (L/R)", orient="right"),
-                scale=alt.Scale(domain=[0, 1.15], nice=False, clamp=True)
-            ),
-            tooltip=["MES", alt.Tooltip("MARGEM:Q", format=".0%")]
+
+        # ===== labels =====
+        # 1) label TOTAL no topo das barras (um por mês)
+        total_labels = (
+            alt.Chart(g_mes)
+            .mark_text(align="center", baseline="bottom", dy=-6, fontSize=13, color="black")
+            .encode(
+                x="MES:N",
+                y=alt.Y("TOTAL:Q", axis=None),           # não cria eixo extra
+                text=alt.Text("TOTAL:Q", format=",.0f")
+            )
         )
-    )
 
-    # ===== labels =====
-    # 1) label TOTAL no topo das barras (um por mês)
-    total_labels = (
-        alt.Chart(g_mes)
-        .mark_text(align="center", baseline="bottom", dy=-6, fontSize=13, color="black")
-        .encode(
-            x="MES:N",
-            y=alt.Y("TOTAL:Q", axis=None),           # não cria eixo extra
-            text=alt.Text("TOTAL:Q", format=",.0f")
+        # 2) label da linha (margem %) sobre cada ponto — usa a MESMA escala do eixo da direita
+        line_labels = (
+            alt.Chart(g_mes)
+            .mark_text(align="center", baseline="bottom", dy=-6, fontSize=12, color="#FFFFFF")
+            .encode(
+                x="MES:N",
+                y=alt.Y(
+                    "MARGEM:Q",
+                    axis=None,
+                    scale=alt.Scale(domain=[0, 1.15])   # mesmo domínio do eixo direito
+                ),
+                text=alt.Text("MARGEM:Q", format=".0%")
+            )
         )
-    )
 
-    # 2) label da linha (margem %) sobre cada ponto — usa a MESMA escala do eixo da direita
-    line_labels = (
-        alt.Chart(g_mes)
-        .mark_text(align="center", baseline="bottom", dy=-6, fontSize=12, color="#FFFFFF")
-        .encode(
-            x="MES:N",
-            y=alt.Y(
-                "MARGEM:Q",
-                axis=None,
-                scale=alt.Scale(domain=[0, 1.15])   # mesmo domínio do eixo direito
-            ),
-            text=alt.Text("MARGEM:Q", format=".0%")
+        ch = (
+            alt.layer(bars, line, total_labels, line_labels)
+            .resolve_scale(y="independent")   # mantém os eixos independentes
+            .properties(height=460)           # aumenta a altura total do chart
         )
-    )
 
-    ch = (
-        alt.layer(bars, line, total_labels, line_labels)
-        .resolve_scale(y="independent")   # mantém os eixos independentes
-        .properties(height=460)           # aumenta a altura total do chart
-    )
+        st.altair_chart(ch, use_container_width=True)
 
-    st.altair_chart(ch, use_container_width=True)
+    secao(
+        "Representação do Lucro Bruto e Margem da Filial no regime de competência (Liquidação no mês subsequente)",
+        "comissoes_lucro_margem", _secao_lucro_margem
+    )
 
-    st.markdown("---")
+    # 8) Pivot opcional — Assessor x Meses (soma comissão); fechado por padrão (é o bloco mais pesado)
+    def _secao_pivot():
+        pvt = memo("comissoes_pivot", lambda: _pivot_assessor_mes(m), *filtros)
+        st.dataframe(pvt, use_container_width=True)
 
-    # 8) Pivot opcional — Assessor x Meses (soma comissão)
-    st.markdown("**Comissão Mensal por Assessor**")
-    pvt = (
-        m.pivot_table(
-            index="NOME",
-            columns="MES",
-            values="VLR_COMISSAO_LIQUIDA",
-            aggfunc="sum",
-            fill_value=0.0,
-        )
-        .sort_index()
-    )
-    pvt = pvt.applymap(_fmt_brl)
-    st.dataframe(pvt, use_container_width=True)
\ No newline at end of file
+    secao("Comissão Mensal por Assessor", "comissoes_pivot", _secao_pivot, aberta=False)
@@ -1,54 +1,216 @@
+import importlib.util
+import re
+import threading
+import time
 import pandas as pd
 from datetime import datetime
 from config import supabase
 from postgrest import APIError
+from modules.access_log import get_escritor_acessos
+from modules.tracing import medir
+from modules.resiliencia import SupabaseIndisponivel, executar, ler_com_fallback
+from modules.esquema import aplicar_esquema, alinhar_tipos_json, decodificar_csv, marcar_versao
 import numpy as np, math
 
+# ── Projeções: o que cada tela realmente lê (o resto nem sai do Supabase) ──
+# log de alterações: validação, painel analítico e gestão de percentuais
+COLS_ALTERACOES = [
+    "ID", "TIMESTAMP", "USUARIO", "FILIAL", "ASSESSOR", "PRODUTO",
+    "PERCENTUAL ANTES", "PERCENTUAL DEPOIS",
+    "VALIDACAO NECESSARIA", "ALTERACAO APROVADA", "TIPO", "COMENTARIO DIRETOR",
+]
+COLS_ACESSOS = ["TIMESTAMP", "USUARIO", "ROLE", "NIVEL"]
+
+# filial e assessores têm uma coluna por produto (muda com o tempo): em vez de
+# listar, as páginas pedem "todas menos" os dados pessoais que não exibem
+SEM_PESSOAIS_FILIAL     = ("CPF", "EMAIL", "CPF_LIDER2", "EMAIL_LIDER2", "EMAIL_DIRETOR")
+SEM_PESSOAIS_ASSESSORES = ("CPF",)
+
+# quanto tempo a lista de colunas de uma tabela fica guardada (novo produto = nova coluna)
+TTL_ESQUEMA_S = 600
+
+# tabela → (quando, uma linha lida em JSON): dá as colunas e os tipos que o JSON devolve
+_esquema: dict[str, tuple[float, dict]] = {}
+_esquema_lock = threading.Lock()
+
+_IDENTIFICADOR = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+# tabelas grandes e só de leitura nas telas: páginas pedidas em CSV e decodificadas
+# direto em colunas (sem passar por uma lista de dicts); tipos vêm de ESQUEMAS e,
+# nas demais colunas, de uma linha lida em JSON. Só com pyarrow: os leitores de CSV
+# do pandas não distinguem NULL de "" e o resultado divergiria do JSON.
+TABELAS_CSV = {"alteracoes", "acessos", "comissoes_ajuste", "comissoes_origem"}
+_CSV_DISPONIVEL = importlib.util.find_spec("pyarrow") is not None
+_csv_recusado: set[str] = set()
+
+
+def expr_select(columns: list[str] | None) -> str:
+    """Expressão do `select` do PostgREST; nomes com espaço/acento vão entre aspas."""
+    if not columns:
+        return "*"
+    return ",".join(c if _IDENTIFICADOR.fullmatch(c) else f'"{c}"' for c in columns)
+
+
+def amostra_tabela(tabela: str) -> dict:
+    """Uma linha da tabela lida em JSON (colunas + tipos), guardada por TTL_ESQUEMA_S."""
+    with _esquema_lock:
+        guardado = _esquema.get(tabela)
+    if guardado and time.monotonic() - guardado[0] < TTL_ESQUEMA_S:
+        return guardado[1]
+    try:
+        with medir(tabela, "select_esquema") as m:
+            resp = executar(tabela, lambda: supabase.table(tabela).select("*").limit(1).execute())
+            m.resposta(resp)
+    except SupabaseIndisponivel:
+        if guardado:
+            return guardado[1]   # vencida, mas serve para montar a projeção
+        raise
+    linha = (resp.data or [{}])[0]
+    with _esquema_lock:
+        _esquema[tabela] = (time.monotonic(), linha)
+    return linha
+
+
+def colunas_tabela(tabela: str) -> list[str]:
+    """Colunas da tabela (1 linha lida), guardadas por TTL_ESQUEMA_S."""
+    return list(amostra_tabela(tabela))
+
+
+def projetar(tabela: str, colunas: list[str] | None = None, sem: tuple[str, ...] = ()) -> list[str] | None:
+    """
+    Colunas a pedir: `colunas` (só as que existem na tabela) ou todas menos `sem`.
+    None = `select *` (tabela vazia: não há como descobrir as colunas).
+    """
+    if colunas is None and not sem:
+        return None
+    try:
+        existentes = colunas_tabela(tabela)
+    except SupabaseIndisponivel:
+        existentes = []   # a leitura em seguida cai no snapshot (ou propaga o erro)
+    if not existentes:
+        return list(colunas) if colunas else None
+    if colunas is not None:
+        presentes = {c.upper() for c in existentes}
+        return [c for c in colunas if c.upper() in presentes]
+    fora = {c.upper() for c in sem}
+    return [c for c in existentes if c.upper() not in fora]
+
+
 def _ler_tabela(tabela: str, columns: list[str] | None = None) -> pd.DataFrame:
+    # se o Supabase não responder, devolve o último snapshot bom (marcado como desatualizado)
+    return ler_com_fallback((tabela, tuple(columns or ())), lambda: _ler_paginas(tabela, columns))
+
+def _ler_paginas(tabela: str, columns: list[str] | None) -> pd.DataFrame:
+    sessao = _sessao_rest() if _CSV_DISPONIVEL and tabela in TABELAS_CSV and tabela not in _csv_recusado else None
+    df = None
+    if sessao is not None:
+        try:
+            df = _ler_paginas_csv(tabela, columns, sessao)
+        except APIError as e:
+            if str(e.code) not in ("406", "415"):
+                raise
+            _csv_recusado.add(tabela)   # servidor não aceita CSV: segue em JSON
+    if df is None:
+        df = _ler_paginas_json(tabela, columns)
+    elif not df.empty:
+        df = alinhar_tipos_json(df, amostra_tabela(tabela))
+
+    # projeção sem linhas: mantém as colunas pedidas (as telas filtram por elas)
+    if df.empty and columns and len(df.columns) == 0:
+        df = pd.DataFrame(columns=columns)
+    df.columns = [str(col).upper() for col in df.columns]
+    return marcar_versao(aplicar_esquema(tabela, df), tabela)
+
+def _ler_paginas_json(tabela: str, columns: list[str] | None) -> pd.DataFrame:
 
     chunk_size = 1000
     todos: list[dict] = []
     start = 0
 
-    select_expr = "*" if not columns else ",".join(columns)
+    select_expr = expr_select(columns)
 
-    while True:
-        resp = (
-            supabase
-            .table(tabela)
-            .select(select_expr)
-            .range(start, start + chunk_size - 1)
-            .execute()
-        )
-        data = resp.data or []
-        if not data:
-            break
-        todos.extend(data)
-        if len(data) < chunk_size:
-            break
-        start += chunk_size
-
-    df = pd.DataFrame(todos)
-    df.columns = [str(col).upper() for col in df.columns]
-    return df
+    with medir(tabela, "select") as m:
+        while True:
+            resp = executar(tabela, lambda: (
+                supabase
+                .table(tabela)
+                .select(select_expr)
+                .range(start, start + chunk_size - 1)
+                .execute()
+            ))
+            m.resposta(resp)
+            data = resp.data or []
+            if not data:
+                break
+            todos.extend(data)
+            if len(data) < chunk_size:
+                break
+            start += chunk_size
 
-def carregar_filial() -> pd.DataFrame:
-    return _ler_tabela("filial")
+    return pd.DataFrame(todos)
 
-def carregar_assessores() -> pd.DataFrame:
-    return _ler_tabela("assessores")
+def _sessao_rest():
+    """httpx.Client do PostgREST (None quando o cliente não é o supabase-py, ex.: Supabase local)."""
+    return getattr(getattr(supabase, "postgrest", None), "session", None)
+
+def _pagina_csv(sessao, tabela: str, select_expr: str, start: int, n: int) -> bytes:
+    r = sessao.get(
+        f"/{tabela}",
+        params={"select": select_expr, "offset": start, "limit": n},
+        headers={"Accept": "text/csv"},
+    )
+    if r.status_code >= 400:
+        raise APIError({"message": r.text[:300], "code": str(r.status_code), "hint": None, "details": None})
+    return r.content
+
+def _ler_paginas_csv(tabela: str, columns: list[str] | None, sessao) -> pd.DataFrame:
+    """
+    Mesmo paginado do JSON, mas cada página (CSV) vira um DataFrame de texto na hora;
+    no fim as páginas são concatenadas por coluna. NULL chega como None e "" como "".
+    """
+    chunk_size = 1000
+    partes: list[pd.DataFrame] = []
+    start = 0
+
+    select_expr = expr_select(columns)
+
+    with medir(tabela, "select_csv") as m:
+        while True:
+            conteudo = executar(tabela, lambda: _pagina_csv(sessao, tabela, select_expr, start, chunk_size))
+            if not conteudo.strip():
+                m.pagina(0, 0)
+                break
+            parte = decodificar_csv(conteudo)
+            m.pagina(len(parte), len(conteudo))
+            if parte.empty:
+                break
+            partes.append(parte)
+            if len(parte) < chunk_size:
+                break
+            start += chunk_size
+
+    if not partes:
+        return pd.DataFrame()
+    return pd.concat(partes, ignore_index=True) if len(partes) > 1 else partes[0]
+
+def carregar_filial(colunas: list[str] | None = None, sem: tuple[str, ...] = ()) -> pd.DataFrame:
+    return _ler_tabela("filial", projetar("filial", colunas, sem))
+
+def carregar_assessores(colunas: list[str] | None = None, sem: tuple[str, ...] = ()) -> pd.DataFrame:
+    return _ler_tabela("assessores", projetar("assessores", colunas, sem))
 
 def carregar_sugestoes() -> list[dict]:
     df = _ler_tabela("sugestoes")
     return df.to_dict(orient="records")
 
-def carregar_alteracoes() -> pd.DataFrame:
-    return _ler_tabela("alteracoes")
+def carregar_alteracoes(colunas: list[str] | None = COLS_ALTERACOES) -> pd.DataFrame:
+    return _ler_tabela("alteracoes", projetar("alteracoes", colunas))
 
-def carregar_acessos() -> pd.DataFrame:
-    return _ler_tabela("acessos")
+def carregar_acessos(colunas: list[str] | None = COLS_ACESSOS) -> pd.DataFrame:
+    return _ler_tabela("acessos", projetar("acessos", colunas))
 
 def registrar_acesso(usuario: str, role: str, nivel: int | None = None) -> None:
+    """Enfileira o acesso; a gravação em `acessos` acontece em lote, em segundo plano."""
     payload = {
         "TIMESTAMP": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
         "USUARIO":   usuario,
@@ -56,10 +218,28 @@ def registrar_acesso(usuario: str, role: str, nivel: int | None = None) -> None:
     }
     if nivel is not None:
         payload["NIVEL"] = int(nivel)
-    try:
-        supabase.table("acessos").insert(payload).execute()
-    except APIError as e:
-        raise Exception(f"Erro ao registrar acesso: {e}")
+    get_escritor_acessos().registrar(payload)
+
+def carregar_acessos_por_dia() -> pd.DataFrame:
+    """Acessos agregados por (dia, usuário) — colunas TS, USUARIO, QTD."""
+    return get_escritor_acessos().acessos_por_dia()
+
+def _conferir_gravados(tabela: str, registros: list[dict], campos: tuple[str, ...]):
+    """
+    Para `executar(conferir=...)`: relê as linhas pelos IDs e confirma que são as
+    nossas (mesmos `campos` de texto; TIMESTAMP/números voltam reformatados do banco).
+    Se outro usuário pegou o mesmo ID, devolve False e o "chave duplicada" sobe como erro.
+    """
+    def conferir() -> bool:
+        ids = [r["ID"] for r in registros]
+        resp = supabase.table(tabela).select("*").in_("ID", ids).execute()
+        no_banco = {r["ID"]: r for r in (resp.data or [])}
+        return all(
+            r["ID"] in no_banco
+            and all(str(no_banco[r["ID"]].get(c) or "").strip() == str(r.get(c) or "").strip() for c in campos)
+            for r in registros
+        )
+    return conferir
 
 def inserir_alteracao_log(linhas: list[list]) -> None:
     # 1) Defina as colunas do payload (sem ID)
@@ -78,14 +258,16 @@ def inserir_alteracao_log(linhas: list[list]) -> None:
 
     # 2) Busque o maior ID atual para gerar novos IDs sequenciais
     try:
-        resp = (
-            supabase
-            .table("alteracoes")
-            .select("ID")
-            .order("ID", desc=True)
-            .limit(1)
-            .execute()
-        )
+        with medir("alteracoes", "select_ultimo_id") as m:
+            resp = executar("alteracoes", lambda: (
+                supabase
+                .table("alteracoes")
+                .select("ID")
+                .order("ID", desc=True)
+                .limit(1)
+                .execute()
+            ))
+            m.resposta(resp)
         last_rows = resp.data or []
         last_id = last_rows[0]["ID"] if last_rows else 0
     except APIError as e:
@@ -101,29 +283,36 @@ def inserir_alteracao_log(linhas: list[list]) -> None:
     # 4) Evita duplicatas: só insere o que não existe
     try:
         data_unique = []
-        for rec in data:
-            # critério de unicidade: FILIAL, ASSESSOR, PRODUTO,
-            # PERCENTUAL ANTES, PERCENTUAL DEPOIS,
-            # VALIDACAO NECESSARIA, ALTERACAO APROVADA, TIPO
-            q = (
-                supabase.table("alteracoes")
-                .select("ID")
-                .eq("FILIAL",               rec["FILIAL"])
-                .eq("ASSESSOR",             rec["ASSESSOR"])
-                .eq("PRODUTO",              rec["PRODUTO"])
-                .eq("PERCENTUAL ANTES",     rec["PERCENTUAL ANTES"])
-                .eq("PERCENTUAL DEPOIS",    rec["PERCENTUAL DEPOIS"])
-                .eq("VALIDACAO NECESSARIA", rec["VALIDACAO NECESSARIA"])
-                .eq("ALTERACAO APROVADA",   rec["ALTERACAO APROVADA"])
-                .eq("TIPO",                 rec["TIPO"])
-                .limit(1)
-                .execute()
-            )
-            if not q.data:
-                data_unique.append(rec)
+        with medir("alteracoes", "select_duplicata") as m:
+            for rec in data:
+                # critério de unicidade: FILIAL, ASSESSOR, PRODUTO,
+                # PERCENTUAL ANTES, PERCENTUAL DEPOIS,
+                # VALIDACAO NECESSARIA, ALTERACAO APROVADA, TIPO
+                q = executar("alteracoes", lambda: (
+                    supabase.table("alteracoes")
+                    .select("ID")
+                    .eq("FILIAL",               rec["FILIAL"])
+                    .eq("ASSESSOR",             rec["ASSESSOR"])
+                    .eq("PRODUTO",              rec["PRODUTO"])
+                    .eq("PERCENTUAL ANTES",     rec["PERCENTUAL ANTES"])
+                    .eq("PERCENTUAL DEPOIS",    rec["PERCENTUAL DEPOIS"])
+                    .eq("VALIDACAO NECESSARIA", rec["VALIDACAO NECESSARIA"])
+                    .eq("ALTERACAO APROVADA",   rec["ALTERACAO APROVADA"])
+                    .eq("TIPO",                 rec["TIPO"])
+                    .limit(1)
+                    .execute()
+                ))
+                m.resposta(q)
+                if not q.data:
+                    data_unique.append(rec)
 
         if data_unique:
-            supabase.table("alteracoes").insert(data_unique).execute()
+            with medir("alteracoes", "insert") as m:
+                # IDs explícitos: repetir não duplica (vira "chave duplicada", conferida pelo conteúdo)
+                m.resposta(executar(
+                    "alteracoes", lambda: supabase.table("alteracoes").insert(data_unique).execute(),
+                    conferir=_conferir_gravados("alteracoes", data_unique, ("USUARIO", "FILIAL", "ASSESSOR", "PRODUTO", "TIPO"))
+                ))
         # se tudo já existia, não insere
 
     except APIError as e:
@@ -156,35 +345,79 @@ def sobrescrever_assessores(df: pd.DataFrame) -> None:
         records.append(clean_rec)
 
     # 5) upsert usando 'id' maiúsculo (é assim que a coluna existe no Postgres)
-    for rec in records:
-        # separa o ID (chave primária) e retira do dict de atualização
-        record_id = rec.pop("ID")
+    with medir("assessores", "update_lote") as m:
+        for rec in records:
+            # separa o ID (chave primária) e retira do dict de atualização
+            record_id = rec.pop("ID")
+
+            m.resposta(executar("assessores", lambda: (
+                supabase.table("assessores")
+                .update(rec)
+                .eq("ID", record_id)
+                .execute()
+            )))
 
-        supabase.table("assessores") \
-            .update(rec) \
-            .eq("ID", record_id) \
-            .execute()
+def aplicar_percentuais(filial: str, itens: list[tuple[str, str, int]]) -> tuple[list, list]:
+    """
+    Grava em `assessores` os percentuais (inteiro, unidade do app) de cada item
+    (NOME, PRODUTO, valor) da filial. Os valores são absolutos: repetir o lote
+    inteiro depois de uma falha só regrava o que já estava certo — dá para retomar.
+    Devolve (falhas, nao_encontrados); falhas = [(nome, produto, erro)].
+    """
+    falhas, nao_encontrados = [], []
+    for nome, produto, valor in itens:
+        nome = str(nome or "").strip()
+        try:
+            with medir("assessores", "select_id") as m:
+                resp = executar("assessores", lambda: (
+                    supabase.table("assessores")
+                    .select("ID")
+                    .eq("NOME", nome)
+                    .eq("FILIAL", filial)
+                    .limit(1)
+                    .execute()
+                ))
+                m.resposta(resp)
+            if not resp.data:
+                nao_encontrados.append((nome, produto))
+                continue
+            assessor_id = resp.data[0]["ID"]
+            with medir("assessores", "update") as m:
+                m.resposta(executar("assessores", lambda: (
+                    supabase.table("assessores")
+                    .update({produto: valor})
+                    .eq("ID", assessor_id)
+                    .execute()
+                )))
+        except (APIError, SupabaseIndisponivel) as e:
+            falhas.append((nome, produto, str(e)))
+    return falhas, nao_encontrados
 
 def atualizar_alteracao_log(row_id: int, coluna: str, valor) -> None:
     try:
-        supabase.table("alteracoes") \
-            .update({coluna: valor}) \
-            .eq("ID", row_id) \
-            .execute()
+        with medir("alteracoes", "update") as m:
+            m.resposta(executar("alteracoes", lambda: (
+                supabase.table("alteracoes")
+                .update({coluna: valor})
+                .eq("ID", row_id)
+                .execute()
+            )))
     except APIError as e:
         raise Exception(f"Erro ao atualizar log de alteração: {e}")
 
 def adicionar_sugestao(texto: str, autor: str) -> None:
     # 1) Busca o maior ID atual
     try:
-        resp = (
-            supabase
-            .table("sugestoes")
-            .select("ID")
-            .order("ID", desc=True)
-            .limit(1)
-            .execute()
-        )
+        with medir("sugestoes", "select_ultimo_id") as m:
+            resp = executar("sugestoes", lambda: (
+                supabase
+                .table("sugestoes")
+                .select("ID")
+                .order("ID", desc=True)
+                .limit(1)
+                .execute()
+            ))
+            m.resposta(resp)
     except APIError as e:
         raise Exception(f"Erro ao buscar último ID: {e}")
 
@@ -202,7 +435,11 @@ def adicionar_sugestao(texto: str, autor: str) -> None:
 
     # 4) Insere no Supabase
     try:
-        supabase.table("sugestoes").insert(registro).execute()
+        with medir("sugestoes", "insert") as m:
+            m.resposta(executar(
+                "sugestoes", lambda: supabase.table("sugestoes").insert(registro).execute(),
+                conferir=_conferir_gravados("sugestoes", [registro], ("SUGESTAO", "AUTOR"))
+            ))
     except APIError as e:
         raise Exception(f"Erro ao adicionar sugestão: {e}")
 
@@ -233,6 +470,8 @@ def adicionar_voto(sugestao_id: int, usuario: str) -> None:
       "TIMESTAMP": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     }
     try:
-        supabase.table("votos").insert(registro).execute()
+        with medir("votos", "insert") as m:
+            # sem chave única garantida: não repete para não contar voto em dobro
+            m.resposta(executar("votos", lambda: supabase.table("votos").insert(registro).execute(), repetir=False))
     except APIError as e:
         raise Exception(f"Erro ao adicionar voto: {e}")
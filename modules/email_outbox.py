@@ -0,0 +1,326 @@
+# modules/email_outbox.py
+import json
+import logging
+import os
+import random
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from modules.mail_transport import get_transport, ErroEnvioEmail
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_DB = os.environ.get("SMARTC_OUTBOX_DB", ".smartc_outbox.db")
+
+# status HTTP que não adianta repetir (payload/destinatário inválido, sem permissão)
+STATUS_SEM_RETRY = {400, 403, 404, 413}
+
+# por quanto tempo uma mensagem reservada pertence ao processo que a reservou;
+# vencido o prazo (processo caiu no meio do envio), outro processo pode reenviá-la
+RESERVA_S = float(os.environ.get("SMARTC_OUTBOX_RESERVA_S", "300"))
+# mensagens enviadas ficam na tabela por este tempo (consulta/auditoria) e depois saem
+RETENCAO_ENVIADOS_S = float(os.environ.get("SMARTC_OUTBOX_RETENCAO_DIAS", "30")) * 86400
+INTERVALO_LIMPEZA_S = 3600.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id                INTEGER PRIMARY KEY AUTOINCREMENT,
+    criado_em         REAL    NOT NULL,
+    destinatarios     TEXT    NOT NULL,
+    assunto           TEXT    NOT NULL,
+    corpo             TEXT    NOT NULL,
+    content_type      TEXT    NOT NULL DEFAULT 'Text',
+    status            TEXT    NOT NULL DEFAULT 'pendente',
+    tentativas        INTEGER NOT NULL DEFAULT 0,
+    proxima_tentativa REAL    NOT NULL,
+    ultimo_erro       TEXT,
+    enviado_em        REAL,
+    dono              TEXT,
+    reservado_ate     REAL
+);
+CREATE INDEX IF NOT EXISTS ix_outbox_fila ON outbox (status, proxima_tentativa);
+"""
+
+# bancos criados antes das colunas de reserva
+_MIGRACOES = {
+    "dono":          "ALTER TABLE outbox ADD COLUMN dono TEXT",
+    "reservado_ate": "ALTER TABLE outbox ADD COLUMN reservado_ate REAL",
+}
+
+
+class LimitadorTaxa:
+    """
+    Token bucket thread-safe: no máximo `taxa_por_s` envios por segundo,
+    com rajadas de até `rajada` mensagens. O Exchange Online limita a caixa
+    remetente a ~30 mensagens/minuto; o padrão da outbox fica nesse teto.
+    """
+
+    def __init__(self, taxa_por_s: float, rajada: int = 1):
+        self.taxa_por_s = taxa_por_s
+        self.rajada     = max(1, rajada)
+        self._fichas    = float(self.rajada)
+        self._ultimo    = time.monotonic()
+        self._lock      = threading.Lock()
+
+    def aguardar(self) -> None:
+        if self.taxa_por_s <= 0:
+            return
+        while True:
+            with self._lock:
+                agora = time.monotonic()
+                self._fichas = min(self.rajada, self._fichas + (agora - self._ultimo) * self.taxa_por_s)
+                self._ultimo = agora
+                if self._fichas >= 1:
+                    self._fichas -= 1
+                    return
+                espera = (1 - self._fichas) / self.taxa_por_s
+            time.sleep(espera)
+
+
+class EmailOutbox:
+    """
+    Fila de e-mails persistida em SQLite e drenada por uma thread em segundo plano.
+    - `enfileirar` só grava a mensagem e retorna (a UI não espera o Graph)
+    - o despachante envia em paralelo (até `max_workers`) e repete falhas
+      transitórias com backoff exponencial + jitter, até `max_tentativas`
+    - cada reserva leva o dono (host:pid) e um prazo (`reserva_s`): só volta para a
+      fila o que ficou "enviando" com prazo vencido, nunca o que outro processo vivo
+      está enviando (vários processos podem compartilhar o mesmo arquivo)
+    - enviadas são apagadas depois de `retencao_s`
+    - envios passam por um `LimitadorTaxa` (throttling da caixa remetente)
+    """
+
+    def __init__(
+        self,
+        caminho_db: str = OUTBOX_DB,
+        transport_factory=get_transport,
+        max_workers: int = 4,
+        max_tentativas: int = 6,
+        backoff_base_s: float = 2.0,
+        backoff_max_s: float = 300.0,
+        intervalo_poll_s: float = 2.0,
+        taxa_por_s: float = 0.5,
+        rajada: int = 10,
+        reserva_s: float = RESERVA_S,
+        retencao_s: float = RETENCAO_ENVIADOS_S,
+    ):
+        self.caminho_db        = caminho_db
+        self.transport_factory = transport_factory
+        self.max_workers       = max_workers
+        self.max_tentativas    = max_tentativas
+        self.backoff_base_s    = backoff_base_s
+        self.backoff_max_s     = backoff_max_s
+        self.intervalo_poll_s  = intervalo_poll_s
+        self.limitador         = LimitadorTaxa(taxa_por_s, rajada)
+        self.reserva_s         = reserva_s
+        self.retencao_s        = retencao_s
+        self.dono              = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._ultima_limpeza   = 0.0
+
+        self._lock    = threading.Lock()
+        self._acordar = threading.Event()
+        self._parar   = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._pool: ThreadPoolExecutor | None = None
+
+        self._conn = sqlite3.connect(caminho_db, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        existentes = {r[1] for r in self._conn.execute("PRAGMA table_info(outbox)")}
+        for coluna, ddl in _MIGRACOES.items():
+            if coluna not in existentes:
+                self._conn.execute(ddl)
+        # recuperação de processos que caíram: `_reservar_lote` retoma reservas vencidas
+
+    # ------------------------------------------------------------------ fila
+    def enfileirar(
+        self,
+        destinatarios: list[str],
+        assunto: str,
+        corpo: str,
+        content_type: str = "Text",
+    ) -> int:
+        dest = [d for d in destinatarios if d]
+        if not dest:
+            raise ValueError("Nenhum destinatário informado para o e-mail.")
+        agora = time.time()
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT INTO outbox (criado_em, destinatarios, assunto, corpo, content_type, proxima_tentativa) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (agora, json.dumps(dest), assunto, corpo, content_type, agora)
+            )
+            msg_id = cur.lastrowid
+        self._acordar.set()
+        return msg_id
+
+    def _reservar_lote(self, limite: int) -> list[dict]:
+        """Pendentes vencidas + reservas vencidas de outros processos, numa transação de escrita."""
+        agora = time.time()
+        with self._lock:
+            # IMMEDIATE: dois processos não selecionam as mesmas linhas entre o SELECT e o UPDATE
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT id, destinatarios, assunto, corpo, content_type, tentativas FROM outbox "
+                    "WHERE (status = 'pendente' AND proxima_tentativa <= ?) "
+                    "   OR (status = 'enviando' AND COALESCE(reservado_ate, 0) < ?) "
+                    "ORDER BY proxima_tentativa, id LIMIT ?",
+                    (agora, agora, limite)
+                ).fetchall()
+                if rows:
+                    self._conn.executemany(
+                        "UPDATE outbox SET status = 'enviando', dono = ?, reservado_ate = ? WHERE id = ?",
+                        [(self.dono, agora + self.reserva_s, r[0]) for r in rows]
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [
+            {
+                "id": r[0],
+                "destinatarios": json.loads(r[1]),
+                "assunto": r[2],
+                "corpo": r[3],
+                "content_type": r[4],
+                "tentativas": r[5],
+            }
+            for r in rows
+        ]
+
+    def _marcar_enviado(self, msg_id: int) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE outbox SET status = 'enviado', enviado_em = ?, ultimo_erro = NULL, reservado_ate = NULL "
+                "WHERE id = ? AND dono = ?",
+                (time.time(), msg_id, self.dono)
+            )
+
+    def _marcar_falha(self, msg: dict, erro: Exception) -> None:
+        tentativas = msg["tentativas"] + 1
+        status_code = getattr(erro, "status_code", None)
+        definitivo = tentativas >= self.max_tentativas or status_code in STATUS_SEM_RETRY
+
+        espera = getattr(erro, "retry_after", None)
+        if espera is None:
+            espera = min(self.backoff_max_s, self.backoff_base_s * (2 ** (tentativas - 1)))
+            espera *= random.uniform(0.5, 1.5)
+
+        with self._lock:
+            self._conn.execute(
+                "UPDATE outbox SET status = ?, tentativas = ?, proxima_tentativa = ?, ultimo_erro = ?, "
+                "reservado_ate = NULL WHERE id = ? AND dono = ?",
+                (
+                    "falhou" if definitivo else "pendente",
+                    tentativas,
+                    time.time() + espera,
+                    str(erro)[:2000],
+                    msg["id"],
+                    self.dono,
+                )
+            )
+        if definitivo:
+            logger.error("E-mail %s descartado após %s tentativa(s): %s", msg["id"], tentativas, erro)
+        else:
+            logger.warning("E-mail %s falhou (tentativa %s), nova tentativa em %.0fs: %s",
+                           msg["id"], tentativas, espera, erro)
+
+    # ------------------------------------------------------------------ envio
+    def _enviar(self, msg: dict) -> bool:
+        self.limitador.aguardar()
+        try:
+            self.transport_factory().enviar(
+                msg["destinatarios"], msg["assunto"], msg["corpo"], msg["content_type"]
+            )
+        except Exception as e:  # ErroEnvioEmail ou erro inesperado do transporte
+            if not isinstance(e, ErroEnvioEmail):
+                logger.exception("Erro inesperado ao enviar e-mail %s", msg["id"])
+            self._marcar_falha(msg, e)
+            return False
+        self._marcar_enviado(msg["id"])
+        return True
+
+    def processar_pendentes(self, limite: int | None = None) -> int:
+        """
+        Envia (em paralelo) as mensagens vencidas e retorna quantas foram entregues.
+        Usado pelo despachante e, de forma síncrona, em testes.
+        """
+        lote = self._reservar_lote(limite or self.max_workers * 4)
+        if not lote:
+            return 0
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="outbox")
+        return sum(self._pool.map(self._enviar, lote))
+
+    def limpar_enviados(self) -> int:
+        """Apaga as mensagens enviadas há mais de `retencao_s`; retorna quantas saíram."""
+        limite = time.time() - self.retencao_s
+        with self._lock:
+            cur = self._conn.execute(
+                "DELETE FROM outbox WHERE status = 'enviado' AND enviado_em < ?", (limite,)
+            )
+        self._ultima_limpeza = time.monotonic()
+        return cur.rowcount
+
+    def _loop(self) -> None:
+        while not self._parar.is_set():
+            try:
+                if time.monotonic() - self._ultima_limpeza >= INTERVALO_LIMPEZA_S:
+                    self.limpar_enviados()
+                if self.processar_pendentes():
+                    continue  # ainda pode haver fila; não espera
+            except Exception:
+                logger.exception("Falha no despachante de e-mails")
+            self._acordar.wait(self.intervalo_poll_s)
+            self._acordar.clear()
+
+    def iniciar(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._loop, name="email-outbox", daemon=True)
+        self._thread.start()
+
+    def parar(self, timeout: float = 10.0) -> None:
+        self._parar.set()
+        self._acordar.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def resumo(self) -> dict[str, int]:
+        """Quantidade de mensagens por status (pendente/enviando/enviado/falhou)."""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall()
+        return {status: qtd for status, qtd in rows}
+
+
+_outbox: EmailOutbox | None = None
+_outbox_lock = threading.Lock()
+
+
+def get_outbox() -> EmailOutbox:
+    """Outbox compartilhada pelo processo, com o despachante já em execução."""
+    global _outbox
+    if _outbox is None:
+        with _outbox_lock:
+            if _outbox is None:
+                _outbox = EmailOutbox()
+                _outbox.iniciar()
+    return _outbox
+
+
+def enfileirar_email(
+    destinatarios: list[str],
+    assunto: str,
+    corpo: str,
+    content_type: str = "Text",
+) -> int:
+    return get_outbox().enfileirar(destinatarios, assunto, corpo, content_type)
@@ -1,11 +1,10 @@
 import re
 from datetime import datetime
-import msal
-import requests
 import streamlit as st
-import base64
 
-from config import CLIENT_ID, TENANT_ID, CLIENT_SECRET, EMAIL_USER
+from modules.mail_transport import get_transport, ErroEnvioEmail
+from modules.email_outbox import enfileirar_email
+from modules.email_templates import render_email_html, logo_data_uri
 
 
 def enviar_resumo_email(
@@ -16,6 +15,7 @@ def enviar_resumo_email(
 ) -> bool:
     """
     Envia um e-mail com assunto e corpo para uma lista de destinatários via Microsoft Graph.
+    Reaproveita o transporte compartilhado (token em cache + conexões persistentes).
 
     Parâmetros:
     - destinatarios: lista de endereços de e-mail
@@ -23,46 +23,29 @@ def enviar_resumo_email(
     - corpo: conteúdo (plain text ou HTML)
     - content_type: "Text" ou "HTML"
     """
-    # Autenticação MSAL
-    app = msal.ConfidentialClientApplication(
-        CLIENT_ID,
-        authority=f"https://login.microsoftonline.com/{TENANT_ID}",
-        client_credential=CLIENT_SECRET
-    )
-    token_resp = app.acquire_token_for_client(scopes=["https://graph.microsoft.com/.default"])
-    if "access_token" not in token_resp:
-        st.error(f"Erro ao obter token para envio de e-mail: {token_resp.get('error_description')}")
+    try:
+        get_transport().enviar(destinatarios, assunto, corpo, content_type)
+    except ErroEnvioEmail as e:
+        st.error(str(e))
         return False
-    token = token_resp["access_token"]
-
-    # Monta payload
-    mail = {
-        "message": {
-            "subject": assunto,
-            "body": {
-                "contentType": content_type,
-                "content": corpo
-            },
-            "toRecipients": [
-                {"emailAddress": {"address": email}} for email in destinatarios
-            ],
-            "from": {"emailAddress": {"address": EMAIL_USER}}
-        },
-        "saveToSentItems": "true"
-    }
+    return True
 
-    # Envio via Graph API
-    endpoint = f"https://graph.microsoft.com/v1.0/users/{EMAIL_USER}/sendMail"
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/json"
-    }
-    resp = requests.post(endpoint, headers=headers, json=mail)
-    if resp.status_code == 202:
-        return True
-
-    st.error(f"Falha ao enviar e-mail: {resp.status_code} – {resp.text}")
-    return False
+def enfileirar_resumo_email(
+    destinatarios: list[str],
+    assunto: str,
+    corpo: str,
+    content_type: str = "Text"
+) -> bool:
+    """
+    Mesmo contrato de `enviar_resumo_email`, mas só grava na outbox e retorna:
+    o envio acontece em segundo plano (com retry), sem bloquear a página.
+    Se a outbox não estiver disponível, cai para o envio síncrono.
+    """
+    try:
+        enfileirar_email(destinatarios, assunto, corpo, content_type)
+    except Exception:
+        return enviar_resumo_email(destinatarios, assunto, corpo, content_type)
+    return True
 
 def limpar_cpf(texto: str) -> str:
     return re.sub(r"\D", "", texto or "")
@@ -75,11 +58,8 @@ def gerar_senha_personalizada(filial: str, nome_lider: str, cpf: str) -> str:
     parte_cpf    = cpf_limpo[:6] if len(cpf_limpo) >= 6 else cpf_limpo
     return parte_filial + parte_lider + parte_cpf
 
-def enviar_codigo_email(destino: str, nome: str, codigo: str) -> bool:
-    """
-    Envia um código OTP de acesso em formato HTML estilizado.
-    """
-    # Define assunto e corpo em HTML
+def montar_email_codigo(nome: str, codigo: str) -> tuple[str, str]:
+    """Assunto e HTML do e-mail com o código OTP."""
     assunto = "🔐 Código de confirmação • SmartC"
     conteudo_html = f"""
     <p>Olá {nome} 👋,</p>
@@ -87,7 +67,13 @@ def enviar_codigo_email(destino: str, nome: str, codigo: str) -> bool:
     <p style=\"font-size:1.8em;color:#9966ff;\"><strong>{codigo}</strong></p>
     <p style=\"color:#888;font-size:0.9em;\">Caso não tenha sido você, basta ignorar esta mensagem.</p>
     """
-    html = _build_email_html(assunto, conteudo_html)
+    return assunto, _build_email_html(assunto, conteudo_html)
+
+def enviar_codigo_email(destino: str, nome: str, codigo: str) -> bool:
+    """
+    Envia um código OTP de acesso em formato HTML estilizado.
+    """
+    assunto, html = montar_email_codigo(nome, codigo)
     return enviar_resumo_email(
         [destino],
         assunto,
@@ -95,25 +81,58 @@ def enviar_codigo_email(destino: str, nome: str, codigo: str) -> bool:
         content_type="HTML"
     )
 
-def send_director_request(
+def agrupar_solicitacoes_diretor(solicitacoes: list[dict]) -> dict[tuple, list[dict]]:
+    """
+    Agrupa as solicitações por (e-mail do diretor, filial, lote de gravação).
+    Cada solicitação traz DIRETOR_EMAIL, FILIAL e LOTE além de NOME, PRODUTO,
+    PERCENTUAL ANTES e PERCENTUAL DEPOIS.
+    """
+    grupos: dict[tuple, list[dict]] = {}
+    for s in solicitacoes:
+        chave = (
+            (s.get("DIRETOR_EMAIL") or "").strip().lower(),
+            (s.get("FILIAL") or "").strip(),
+            s.get("LOTE") or ""
+        )
+        grupos.setdefault(chave, []).append(s)
+    return grupos
+
+def send_director_digest(
     director_email: str,
     lider: str,
     filial: str,
-    assessor: str,
-    produto: str,
-    antigo: float,
-    novo: float,
-    link: str
+    itens: list[dict],
+    link: str,
+    momento_display: str = ""
 ) -> bool:
     """
-    Envia ao Diretor um pedido de validação de redução, com botão e layout da marca.
-    Utiliza o mesmo helper (enviar_resumo_email) para garantir autenticação e envio.
+    Envia ao Diretor UM e-mail com todas as solicitações de um lote de gravação
+    (tabela por assessor/produto), em vez de um e-mail por alteração.
     """
-    assunto = f"Validação de alteração em {filial}"
+    if not itens:
+        return True
+
+    linhas = "".join(
+        f"<tr>"
+        f"<td>{i.get('NOME','')}</td>"
+        f"<td>{i.get('PRODUTO','')}</td>"
+        f"<td>{i.get('PERCENTUAL ANTES','')}%</td>"
+        f"<td>{i.get('PERCENTUAL DEPOIS','')}%</td>"
+        f"</tr>"
+        for i in itens
+    )
+    quando = f" em <strong>{momento_display}</strong>" if momento_display else ""
+    plural = "alterações" if len(itens) > 1 else "alteração"
+
+    assunto = f"Validação de {len(itens)} {plural} em {filial}"
     conteudo_html = f"""
     <p>Olá,</p>
-    <p>O líder <strong>{lider}</strong> solicitou alteração do produto <strong>{produto}</strong><br/>
-    de <strong>{antigo}% → {novo}%</strong> para <strong>{assessor}</strong> em <strong>{filial}</strong>.</p>
+    <p>O líder <strong>{lider}</strong> solicitou{quando} as {plural} abaixo
+    em <strong>{filial}</strong>:</p>
+    <table border="1" cellpadding="6" cellspacing="0">
+      <thead><tr><th>Assessor</th><th>Produto</th><th>Antes</th><th>Depois</th></tr></thead>
+      <tbody>{linhas}</tbody>
+    </table>
     <p style=\"text-align:center;margin:2rem 0;\">
       <a href=\"{link}\" style=\"display:inline-block;padding:12px 24px;
          background-color:#9966ff;color:#ffffff;text-decoration:none;border-radius:4px;\">
@@ -123,7 +142,7 @@ def send_director_request(
     <p>Obrigado!</p>
     """
     html = _build_email_html(assunto, conteudo_html)
-    return enviar_resumo_email(
+    return enfileirar_resumo_email(
         [director_email],
         assunto,
         html,
@@ -177,7 +196,7 @@ def send_approval_result(df_changes, lider_email):
         if email_sol:  dest.add(email_sol)
 
         if dest:
-            enviar_resumo_email(list(dest), subject, html, content_type="HTML")
+            enfileirar_resumo_email(list(dest), subject, html, content_type="HTML")
 
 
 
@@ -214,7 +233,7 @@ def send_declaration_email(
     <p>Este e-mail também foi enviado para o Departamento Jurídico.</p>
     """
     html = _build_email_html(assunto, conteudo_html)
-    return enviar_resumo_email(
+    return enfileirar_resumo_email(
         [director_email, juridico_email],
         assunto,
         html,
@@ -223,40 +242,7 @@ def send_declaration_email(
 
 
 def _get_logo_data_uri() -> str:
-    with open("assets/investsmart_horizontal_branco.png", "rb") as f:
-        b64 = base64.b64encode(f.read()).decode()
-    return f"data:image/png;base64,{b64}"
+    return logo_data_uri()
 
-def _build_email_html(titulo: str, conteudo_html: str) -> str:
-    logo_data_uri = _get_logo_data_uri()
-    return f"""
-    <html>
-      <body style="margin:0;padding:0;font-family:Montserrat,sans-serif;background-color:#f4f4f4;">
-        <table align="center" width="600" cellpadding="0" cellspacing="0"
-               style="background-color:#ffffff;border-radius:8px;overflow:hidden;">
-          <!-- header com logo -->
-          <tr>
-            <td style="background-color:#9966ff;padding:20px;text-align:center;">
-              <div style="max-width:300px; margin:0 auto;">
-                <img src="{logo_data_uri}" alt="SmartC" width="170" style="display:block;margin:0 auto;" />
-              </div>
-            </td>
-          </tr>
-          <!-- título -->
-          <tr>
-            <td style="padding:20px;">
-              <h2 style="color:#4A4A4A;margin-bottom:1rem;">{titulo}</h2>
-              {conteudo_html}
-            </td>
-          </tr>
-          <!-- rodapé -->
-          <tr>
-            <td style="background-color:#f0f0f0;padding:10px;text-align:center;font-size:12px;color:#666;">
-              Este é um e-mail automático, por favor não responda.<br/>
-              © 2025 InvestSmart – Todos os direitos reservados.
-            </td>
-          </tr>
-        </table>
-      </body>
-    </html>
-    """
+def _build_email_html(titulo: str, conteudo_html: str, inline_logo: bool = True) -> str:
+    return render_email_html(titulo, conteudo_html, inline_logo=inline_logo)
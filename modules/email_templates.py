@@ -0,0 +1,90 @@
+# modules/email_templates.py
+import base64
+from functools import lru_cache
+from pathlib import Path
+
+LOGO_PATH = Path(__file__).resolve().parent.parent / "assets" / "investsmart_horizontal_branco.png"
+LOGO_CID  = "logo_smartc"
+
+# moldura visual de todos os e-mails; só {logo_src}, {titulo} e {conteudo} variam
+_SHELL = """
+    <html>
+      <body style="margin:0;padding:0;font-family:Montserrat,sans-serif;background-color:#f4f4f4;">
+        <table align="center" width="600" cellpadding="0" cellspacing="0"
+               style="background-color:#ffffff;border-radius:8px;overflow:hidden;">
+          <!-- header com logo -->
+          <tr>
+            <td style="background-color:#9966ff;padding:20px;text-align:center;">
+              <div style="max-width:300px; margin:0 auto;">
+                <img src="{logo_src}" alt="SmartC" width="170" style="display:block;margin:0 auto;" />
+              </div>
+            </td>
+          </tr>
+          <!-- título -->
+          <tr>
+            <td style="padding:20px;">
+              <h2 style="color:#4A4A4A;margin-bottom:1rem;">{titulo}</h2>
+              {conteudo}
+            </td>
+          </tr>
+          <!-- rodapé -->
+          <tr>
+            <td style="background-color:#f0f0f0;padding:10px;text-align:center;font-size:12px;color:#666;">
+              Este é um e-mail automático, por favor não responda.<br/>
+              © 2025 InvestSmart – Todos os direitos reservados.
+            </td>
+          </tr>
+        </table>
+      </body>
+    </html>
+    """
+
+
+@lru_cache(maxsize=1)
+def logo_base64() -> str:
+    """Logo lido do disco e codificado uma única vez por processo."""
+    return base64.b64encode(LOGO_PATH.read_bytes()).decode()
+
+
+def logo_data_uri() -> str:
+    return f"data:image/png;base64,{logo_base64()}"
+
+
+@lru_cache(maxsize=1)
+def anexo_logo_inline() -> dict:
+    """Logo como anexo inline (CID) no formato do Microsoft Graph."""
+    return {
+        "@odata.type": "#microsoft.graph.fileAttachment",
+        "name": LOGO_PATH.name,
+        "contentType": "image/png",
+        "contentBytes": logo_base64(),
+        "contentId": LOGO_CID,
+        "isInline": True,
+    }
+
+
+def usa_logo_inline(corpo_html: str) -> bool:
+    return f"cid:{LOGO_CID}" in (corpo_html or "")
+
+
+@lru_cache(maxsize=2)
+def _shell_partes(inline_logo: bool) -> tuple[str, str, str]:
+    """
+    "Compila" a moldura uma vez: logo já resolvido e o HTML fatiado em volta
+    do título e do conteúdo. Renderizar vira só concatenação.
+    """
+    logo_src = f"cid:{LOGO_CID}" if inline_logo else logo_data_uri()
+    html = _SHELL.replace("{logo_src}", logo_src)
+    antes, resto = html.split("{titulo}", 1)
+    meio, depois = resto.split("{conteudo}", 1)
+    return antes, meio, depois
+
+
+def render_email_html(titulo: str, conteudo_html: str, inline_logo: bool = True) -> str:
+    """
+    Monta o e-mail com a moldura da marca.
+    - inline_logo=True: logo referenciado por CID (anexado pelo transporte do Graph)
+    - inline_logo=False: logo embutido como data URI (Outlook/arquivos locais)
+    """
+    antes, meio, depois = _shell_partes(inline_logo)
+    return f"{antes}{titulo}{meio}{conteudo_html}{depois}"
@@ -0,0 +1,129 @@
+# modules/esquema.py
+import csv
+import io
+import itertools
+import time
+
+import pandas as pd
+
+# pandas 2 fixa o formato pela 1ª linha; "ISO8601" aceita as variações do log
+_ISO = {"format": "ISO8601"} if int(pd.__version__.split(".")[0]) >= 2 else {}
+
+# sufixo de fuso no texto ISO ("Z", "+00:00", "-0300")
+_OFFSET = r"(?:Z|[+-]\d{2}:?\d{2})$"
+
+# Tipos compactos aplicados na carga (só nas colunas presentes; o resto fica como veio).
+# - "data":      datetime64 sem fuso, com a hora exatamente como está gravada (o offset
+#                é descartado, não convertido: as telas mostram a mesma hora de antes)
+# - "data_local": datetime64 sem fuso (tabelas que gravam hora local sem offset)
+# - "category":  texto muito repetido e só lido; comparações (== "SIM", .isin, .str) seguem iguais
+#
+# Colunas que as telas alteram (assessor/produto editados, aprovação e validação
+# regravadas) ficam como texto comum: atribuir um valor fora das categorias daria
+# TypeError, e o dtype "string" devolve <NA> em `== "SIM"`, o que quebra as máscaras.
+# Percentuais ficam como texto: são digitados ("35,5%"), exibidos em TextColumn e
+# voltam ao banco — float32 mudaria o valor gravado (0.1 → 0.100000001).
+ESQUEMAS: dict[str, dict[str, str]] = {
+    "alteracoes": {
+        "ID":                   "Int32",
+        "TIMESTAMP":            "data",
+        "USUARIO":              "category",
+        "FILIAL":               "category",
+        "TIPO":                 "category",
+    },
+    "acessos": {
+        "TIMESTAMP": "data_local",
+        "USUARIO":   "category",
+        "ROLE":      "category",
+        "NIVEL":     "Int8",
+    },
+    # editadas no data_editor e regravadas linha a linha: só o ID muda de tipo
+    "assessores": {"ID": "Int32"},
+    "filial":     {"ID": "Int32"},
+    "sugestoes":  {"ID": "Int32"},
+    "votos":      {"ID": "Int32"},
+}
+
+
+def decodificar_csv(conteudo: bytes) -> pd.DataFrame:
+    """
+    Uma página CSV do PostgREST → DataFrame de texto, no mesmo formato do JSON:
+    NULL (campo vazio) vira None e "" (aspas vazias) continua "". O PostgREST monta
+    o CSV com a saída de texto de registro do Postgres: aspas dobradas e barra
+    invertida escapada dentro de aspas. Requer pyarrow (dependência do Streamlit).
+    """
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+
+    cabecalho = next(csv.reader([conteudo.split(b"\n", 1)[0].decode("utf-8").rstrip("\r")]))
+    tabela = pacsv.read_csv(
+        io.BytesIO(conteudo),
+        parse_options=pacsv.ParseOptions(double_quote=True, escape_char="\\", newlines_in_values=True),
+        convert_options=pacsv.ConvertOptions(
+            column_types={c: pa.string() for c in cabecalho},
+            null_values=[""],
+            strings_can_be_null=True,
+            quoted_strings_can_be_null=False,
+        ),
+    )
+    return tabela.to_pandas()
+
+
+_BOOL_CSV = {"t": True, "true": True, "f": False, "false": False}
+
+
+def alinhar_tipos_json(df: pd.DataFrame, amostra: dict) -> pd.DataFrame:
+    """
+    CSV chega só como texto; o JSON traz números e booleanos tipados. Usa uma linha
+    do JSON (`amostra`, ver db.amostra_tabela) para dar às colunas numéricas/booleanas
+    da página CSV o mesmo tipo que o caminho JSON daria. Colunas nulas na amostra
+    ficam como texto (não há como saber o tipo).
+    """
+    for col, exemplo in amostra.items():
+        if col not in df.columns:
+            continue
+        if isinstance(exemplo, bool):
+            serie = df[col].map(lambda v: _BOOL_CSV.get(str(v).lower()) if isinstance(v, str) else None)
+            df[col] = serie.astype(bool) if serie.notna().all() else serie.astype(object)
+        elif isinstance(exemplo, (int, float)):
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+    return df
+
+
+def aplicar_esquema(tabela: str, df: pd.DataFrame) -> pd.DataFrame:
+    """Converte as colunas de `df` para os tipos de ESQUEMAS[tabela] (no lugar)."""
+    for col, tipo in ESQUEMAS.get(tabela, {}).items():
+        if col not in df.columns:
+            continue
+        if tipo == "data":
+            serie = df[col]
+            if isinstance(serie.dtype, pd.DatetimeTZDtype):
+                df[col] = serie.dt.tz_localize(None)
+            else:
+                texto = serie.astype("object").where(serie.notna(), None).astype(str).str.strip()
+                df[col] = pd.to_datetime(texto.str.replace(_OFFSET, "", regex=True), errors="coerce", **_ISO)
+        elif tipo == "data_local":
+            df[col] = pd.to_datetime(df[col], errors="coerce", **_ISO)
+        elif tipo.startswith("Int"):
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype(tipo)
+        else:
+            df[col] = df[col].astype(tipo)
+    return df
+
+
+# identifica a carga que produziu o DataFrame; sobrevive ao pickle do st.cache_data,
+# a cópias, filtros e projeções — mesma versão = mesmo conteúdo de origem
+ATTR_VERSAO = "versao_dados"
+_seq_versao = itertools.count()
+
+
+def marcar_versao(df: pd.DataFrame, origem: str) -> pd.DataFrame:
+    """Carimba `df` com uma versão nova (chamar em cada leitura real do banco)."""
+    df.attrs[ATTR_VERSAO] = f"{origem}:{time.time_ns()}:{next(_seq_versao)}"
+    return df
+
+
+def para_editor(df: pd.DataFrame) -> pd.DataFrame:
+    """Categóricas voltam a texto: TextColumn do st.data_editor não aceita category."""
+    cats = df.select_dtypes("category").columns
+    return df.astype({c: object for c in cats}) if len(cats) else df
@@ -0,0 +1,117 @@
+# modules/etl_estado.py
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+ESTADO_DB = os.environ.get("SMARTC_ETL_DB", ".smartc_etl.db")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS watermark (
+    fonte         TEXT PRIMARY KEY,
+    ultimo_dt_atz TEXT,
+    ultimo_id     INTEGER,
+    atualizado_em REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS hashes (
+    fonte TEXT NOT NULL,
+    chave TEXT NOT NULL,
+    hash  TEXT NOT NULL,
+    PRIMARY KEY (fonte, chave)
+);
+CREATE TABLE IF NOT EXISTS execucoes (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    fonte       TEXT NOT NULL,
+    iniciada_em REAL NOT NULL,
+    terminada_em REAL,
+    status      TEXT NOT NULL DEFAULT 'em_andamento',
+    detalhe     TEXT
+);
+"""
+
+
+class EstadoETL:
+    """
+    Checkpoints dos jobs de carga, em SQLite local, por tabela de origem (`fonte`):
+    - watermark: último dt_atz (e/ou ID) já gravado no destino
+    - hashes: hash da última versão gravada de cada chave (ex.: SIGLA)
+    - execucoes: histórico simples (em_andamento / ok / falhou)
+    `checkpoint` grava hashes e avança a watermark na mesma transação, depois de
+    cada lote aplicado no destino: se o job cair, a próxima execução retoma dali.
+    """
+
+    def __init__(self, caminho_db: str = ESTADO_DB):
+        self.caminho_db = caminho_db
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(caminho_db, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    # ------------------------------------------------------------------ leitura
+    def watermark(self, fonte: str) -> tuple[datetime | None, int | None]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT ultimo_dt_atz, ultimo_id FROM watermark WHERE fonte = ?", (fonte,)
+            ).fetchone()
+        if not row:
+            return None, None
+        dt, ultimo_id = row
+        return (datetime.fromisoformat(dt) if dt else None), ultimo_id
+
+    def hashes(self, fonte: str) -> dict[str, str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT chave, hash FROM hashes WHERE fonte = ?", (fonte,)).fetchall()
+        return dict(rows)
+
+    # ------------------------------------------------------------------ escrita
+    def checkpoint(
+        self,
+        fonte: str,
+        hashes: dict[str, str],
+        ultimo_dt_atz: datetime | None = None,
+        ultimo_id: int | None = None,
+    ) -> None:
+        """Grava os hashes do lote e avança a watermark (nunca retrocede), atomicamente."""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                if hashes:
+                    self._conn.executemany(
+                        "INSERT INTO hashes (fonte, chave, hash) VALUES (?, ?, ?) "
+                        "ON CONFLICT (fonte, chave) DO UPDATE SET hash = excluded.hash",
+                        [(fonte, chave, h) for chave, h in hashes.items()]
+                    )
+                self._conn.execute(
+                    "INSERT INTO watermark (fonte, ultimo_dt_atz, ultimo_id, atualizado_em) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (fonte) DO UPDATE SET "
+                    "  ultimo_dt_atz = MAX(COALESCE(ultimo_dt_atz, ''), COALESCE(excluded.ultimo_dt_atz, '')), "
+                    "  ultimo_id     = MAX(COALESCE(ultimo_id, 0), COALESCE(excluded.ultimo_id, 0)), "
+                    "  atualizado_em = excluded.atualizado_em",
+                    (fonte, ultimo_dt_atz.isoformat() if ultimo_dt_atz else None, ultimo_id, time.time())
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def reiniciar(self, fonte: str) -> None:
+        """Esquece watermark e hashes da fonte (a próxima execução relê tudo)."""
+        with self._lock:
+            self._conn.execute("DELETE FROM hashes WHERE fonte = ?", (fonte,))
+            self._conn.execute("DELETE FROM watermark WHERE fonte = ?", (fonte,))
+
+    # ------------------------------------------------------------------ execuções
+    def iniciar_execucao(self, fonte: str) -> int:
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT INTO execucoes (fonte, iniciada_em) VALUES (?, ?)", (fonte, time.time())
+            )
+            return cur.lastrowid
+
+    def finalizar_execucao(self, execucao_id: int, ok: bool, detalhe: str = "") -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE execucoes SET terminada_em = ?, status = ?, detalhe = ? WHERE id = ?",
+                (time.time(), "ok" if ok else "falhou", detalhe[:2000], execucao_id)
+            )
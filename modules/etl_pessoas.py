@@ -0,0 +1,484 @@
+# modules/etl_pessoas.py
+import hashlib
+import json
+import logging
+import math
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import pandas as pd
+import sqlalchemy as sa
+
+from modules.formatters import parse_valor_percentual
+
+logger = logging.getLogger(__name__)
+
+TABELA_ORIGEM = "query_pessoas"
+COL_ATUALIZACAO = "DATA/HORA ATUALIZAÇÃO"
+
+# coluna do SQL Server → coluna de `assessores`
+MAPA_IDENTIDADE = {
+    "SIGLA":          "SIGLA",
+    "NOME":           "NOME",
+    "FILIAL/EQUIPE":  "FILIAL",
+    "FUNÇÃO":         "FUNCAO",
+    "E-MAIL BNKRIO":  "EMAIL",
+}
+MAPA_PRODUTOS = {
+    "% XP":           "XP",
+    "MESA":           "MESA",
+    "MESA PRÓPRIA":   "MESA PRÓPRIA",
+    "BULL COTIZADOR": "BULL COTIZADOR",
+    "GLOBAL":         "GLOBAL",
+    "CâMBIO":         "CÂMBIO",
+    "CORRETORA":      "CORRETORA",
+    "XP SEGUROS":     "XP SEGUROS",
+    "XP BANCOS":      "XP BANCOS",
+    "ASSET":          "ASSET",
+    "CRÉDITO":        "CRÉDITO",
+    "JURIDICO":       "JURIDICO",
+    "IMÓVEIS":        "IMÓVEIS",
+    "OUTROS":         "OUTROS",
+    "CÓDIGO XP":      "CODIGO XP",
+}
+MAPA_PADRAO = {**MAPA_IDENTIDADE, **MAPA_PRODUTOS}
+CHAVE = "SIGLA"
+
+# colunas de `assessores` com percentual inteiro (35 = 35%), a mesma unidade que o
+# app grava (`int(round(parse_valor_percentual(v) * 100))`)
+COLUNAS_PERCENTUAIS = frozenset(d for d in MAPA_PRODUTOS.values() if d != "CODIGO XP")
+
+
+def carregar_mapa(caminho: str | None) -> dict[str, str]:
+    """Mapa de colunas padrão ou o de um JSON {"coluna origem": "coluna assessores"}."""
+    if not caminho:
+        return dict(MAPA_PADRAO)
+    with open(caminho, encoding="utf-8") as f:
+        return json.load(f)
+
+
+# ------------------------------------------------------------------ origem
+# coluna calculada persistida (e indexada) com o dt_atz já convertido — modo "sargavel"
+COL_DT_PERSISTIDA = "DT_ATZ"
+MODOS_CONSULTA = ("legado", "sargavel")
+# dialetos em que `ddl_dt_atz_persistida` sabe criar a coluna (e o modo "sargavel" funciona)
+DIALETOS_DT_PERSISTIDA = ("mssql", "sqlite")
+
+# formatos aceitos pela conversão (mesma ordem dos estilos 103, 126 e 121 do SQL Server)
+_FORMATOS_DT = ("%d/%m/%Y %H:%M:%S", "%d/%m/%Y %H:%M", "%d/%m/%Y",
+                "%Y-%m-%dT%H:%M:%S.%f", "%Y-%m-%dT%H:%M:%S",
+                "%Y-%m-%d %H:%M:%S.%f", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d")
+
+
+def try_dt_atz(valor) -> str | None:
+    """Equivalente em Python do COALESCE(TRY_CONVERT(...)) — usado nos bancos SQLite de teste."""
+    if valor is None:
+        return None
+    texto = str(valor).strip()
+    for fmt in _FORMATOS_DT:
+        try:
+            return datetime.strptime(texto, fmt).strftime("%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            continue
+    return None
+
+
+def preparar_engine(engine: sa.Engine, funcao_dt=try_dt_atz) -> sa.Engine:
+    """
+    SQLite de teste: registra TRY_DT_ATZ (a conversão multi-formato do SQL Server)
+    em cada conexão, para a consulta "legado" se comportar como a de produção.
+    """
+    if engine.dialect.name == "sqlite":
+        @sa.event.listens_for(engine, "connect")
+        def _registrar(dbapi_conn, _):
+            dbapi_conn.create_function("TRY_DT_ATZ", 1, funcao_dt, deterministic=True)
+    return engine
+
+
+def _expr_dt_atz(engine: sa.Engine, deterministica: bool = False) -> str:
+    """
+    Expressão de data/hora de atualização por dialeto.
+    SQL Server: tenta dd/mm/aaaa (103), ISO (126), ODBC canonical (121) e conversão padrão;
+    a versão determinística (para coluna PERSISTED) não inclui a conversão sem estilo,
+    que depende do idioma/DATEFORMAT da sessão.
+    SQLite de teste: TRY_DT_ATZ (ver `preparar_engine`). Outros: a coluna já vem em ISO.
+    """
+    col = engine.dialect.identifier_preparer.quote(COL_ATUALIZACAO)
+    if engine.dialect.name == "mssql":
+        estilos = [
+            f"TRY_CONVERT(datetime2, {col}, 103)",
+            f"TRY_CONVERT(datetime2, {col}, 126)",
+            f"TRY_CONVERT(datetime2, {col}, 121)",
+        ]
+        if not deterministica:
+            estilos.append(f"TRY_CONVERT(datetime2, {col})")
+        return f"COALESCE({', '.join(estilos)})"
+    if engine.dialect.name == "sqlite":
+        return f"TRY_DT_ATZ({col})"
+    return col
+
+
+def ddl_dt_atz_persistida(engine: sa.Engine) -> list[str]:
+    """
+    DDL (opcional, executado uma vez pelo DBA) que materializa dt_atz numa coluna
+    indexada, tornando o filtro por período sargável.
+    SQL Server: coluna calculada PERSISTED + índice não clusterizado.
+    SQLite de teste: coluna gerada + índice.
+    """
+    q = engine.dialect.identifier_preparer.quote
+    tabela, col = q(TABELA_ORIGEM), q(COL_DT_PERSISTIDA)
+    indice = q(f"IX_{TABELA_ORIGEM}_{COL_DT_PERSISTIDA}")
+    expr = _expr_dt_atz(engine, deterministica=True)
+    if engine.dialect.name == "mssql":
+        return [
+            f"ALTER TABLE {tabela} ADD {col} AS {expr} PERSISTED",
+            f"CREATE INDEX {indice} ON {tabela} ({col}) INCLUDE ({q('SIGLA')})",
+        ]
+    if engine.dialect.name == "sqlite":
+        return [
+            f"ALTER TABLE {tabela} ADD COLUMN {col} TEXT GENERATED ALWAYS AS ({expr}) VIRTUAL",
+            f"CREATE INDEX {indice} ON {tabela} ({col})",
+        ]
+    raise ValueError(
+        f"DDL de dt_atz persistida não disponível para {engine.dialect.name} "
+        f"(suportados: {', '.join(DIALETOS_DT_PERSISTIDA)}); use o modo \"legado\""
+    )
+
+
+def montar_sql_origem(engine: sa.Engine, colunas: list[str], modo: str = "legado") -> sa.TextClause:
+    """
+    SELECT das colunas mapeadas com janela [:inicio, :fim) em dt_atz (parâmetros ligados).
+    - "legado": converte [DATA/HORA ATUALIZAÇÃO] numa CTE e filtra o resultado
+      (igual ao teste_rp.py: varre a tabela inteira)
+    - "sargavel": filtra direto na coluna persistida/indexada DT_ATZ
+      (requer `ddl_dt_atz_persistida` aplicado na origem)
+    """
+    if modo not in MODOS_CONSULTA:
+        raise ValueError(f"Modo de consulta inválido: {modo} (use {', '.join(MODOS_CONSULTA)})")
+    if modo == "sargavel" and engine.dialect.name not in DIALETOS_DT_PERSISTIDA:
+        raise ValueError(
+            f"Modo \"sargavel\" requer a coluna {COL_DT_PERSISTIDA}, só disponível em "
+            f"{', '.join(DIALETOS_DT_PERSISTIDA)} (origem: {engine.dialect.name}); use o modo \"legado\""
+        )
+    q = engine.dialect.identifier_preparer.quote
+    cols = ",\n        ".join(q(c) for c in dict.fromkeys([*colunas, COL_ATUALIZACAO]))
+
+    if modo == "sargavel":
+        dt = q(COL_DT_PERSISTIDA)
+        return sa.text(f"""
+SELECT
+        {cols},
+        {dt} AS dt_atz
+FROM {q(TABELA_ORIGEM)}
+WHERE {dt} >= :inicio
+  AND {dt} <  :fim
+ORDER BY {dt}
+""")
+
+    return sa.text(f"""
+WITH Q AS (
+    SELECT
+        {cols},
+        {_expr_dt_atz(engine)} AS dt_atz
+    FROM {q(TABELA_ORIGEM)}
+)
+SELECT * FROM Q
+WHERE dt_atz >= :inicio
+  AND dt_atz <  :fim
+ORDER BY dt_atz
+""")
+
+
+def ler_origem_em_lotes(
+    engine: sa.Engine,
+    colunas: list[str],
+    inicio: datetime,
+    fim: datetime,
+    chunksize: int = 5000,
+    sql: sa.TextClause | None = None,
+    modo: str = "legado",
+):
+    """
+    Gera DataFrames de até `chunksize` linhas, em ordem de dt_atz, com cursor do
+    lado do servidor (stream_results): a memória não cresce com o tamanho do mês.
+    """
+    sql = sql if sql is not None else montar_sql_origem(engine, colunas, modo)
+    with engine.connect() as cn:
+        cn = cn.execution_options(stream_results=True, max_row_buffer=chunksize)
+        for chunk in pd.read_sql(sql, cn, params={"inicio": inicio, "fim": fim}, chunksize=chunksize):
+            yield chunk
+
+
+# ------------------------------------------------------------------ mapeamento / hash
+def _valor(v):
+    """Normaliza texto para comparação/gravação: NaN/None → None, números inteiros sem '.0', texto aparado."""
+    if v is None or (isinstance(v, float) and math.isnan(v)) or v is pd.NaT or v is pd.NA:
+        return None
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    if isinstance(v, (pd.Timestamp, datetime)):
+        return v.isoformat()
+    s = str(v).strip()
+    return s or None
+
+
+def _percentual(v) -> int | None:
+    """Percentual da origem ("35%", "35,5", 0.35, 35) → inteiro na unidade do app (35)."""
+    if _valor(v) is None:
+        return None
+    return int(round(parse_valor_percentual(v) * 100))
+
+
+def _inteiro(v) -> int | None:
+    """Percentual já gravado em `assessores` (inteiro, às vezes vindo como float/texto)."""
+    if _valor(v) is None:
+        return None
+    try:
+        return int(round(float(str(v).strip().replace(",", "."))))
+    except ValueError:
+        return None
+
+
+def normalizar_destino(coluna: str, v):
+    """Valor lido do destino, no mesmo tipo que `mapear_lote` produz para a coluna."""
+    return _inteiro(v) if coluna in COLUNAS_PERCENTUAIS else _valor(v)
+
+
+def mapear_lote(df: pd.DataFrame, mapa: dict[str, str]) -> pd.DataFrame:
+    """
+    Renomeia para as colunas de `assessores`, normaliza valores e mantém a última versão por SIGLA.
+    Percentuais viram inteiros (unidade do app); o resto, texto aparado.
+    """
+    origem = [c for c in mapa if c in df.columns]
+    out = df[origem].rename(columns=mapa)
+    out = pd.DataFrame({
+        c: pd.Series(
+            [(_percentual if c in COLUNAS_PERCENTUAIS else _valor)(v) for v in out[c]],
+            index=out.index, dtype=object,
+        )
+        for c in out.columns
+    })
+    out = out[out[CHAVE].notna()]
+    out[CHAVE] = out[CHAVE].str.upper()
+    # lote vem ordenado por dt_atz: a última ocorrência é a mais recente
+    return out.drop_duplicates(subset=[CHAVE], keep="last")
+
+
+def hash_linha(valores: dict, colunas: list[str]) -> str:
+    payload = json.dumps([valores.get(c) for c in colunas], ensure_ascii=False, default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+# ------------------------------------------------------------------ destinos
+class DestinoSQL:
+    """Tabela `assessores` num banco SQLAlchemy (Postgres/SQLite locais para teste)."""
+
+    def __init__(self, engine: sa.Engine, tabela: str = "assessores"):
+        self.engine = engine
+        self.tabela = sa.Table(tabela, sa.MetaData(), autoload_with=engine)
+
+    def colunas(self) -> list[str]:
+        return [c.name for c in self.tabela.columns]
+
+    def snapshot(self, colunas: list[str]) -> dict[str, dict]:
+        cols = [self.tabela.c[c] for c in colunas if c in self.tabela.c]
+        with self.engine.connect() as cn:
+            rows = cn.execute(sa.select(*cols)).mappings().all()
+        return {
+            str(r[CHAVE]).strip().upper(): {k: normalizar_destino(k, v) for k, v in r.items()}
+            for r in rows if r[CHAVE] is not None
+        }
+
+    def _existentes(self, cn, chaves: list[str], chunk_size: int = 500) -> set[str]:
+        chave_norm = sa.func.upper(sa.func.trim(self.tabela.c[CHAVE]))
+        achadas: set[str] = set()
+        for i in range(0, len(chaves), chunk_size):
+            rows = cn.execute(sa.select(chave_norm).where(chave_norm.in_(chaves[i:i + chunk_size])))
+            achadas.update(r[0] for r in rows)
+        return achadas
+
+    def aplicar(self, novos: list[dict], alterados: list[dict]) -> None:
+        """
+        `alterados` vem dos hashes do checkpoint: a SIGLA pode ter sido apagada do
+        destino desde então. Essas linhas são inseridas em vez de um UPDATE que não
+        acharia nada (e o checkpoint marcaria como gravadas).
+        """
+        t = self.tabela
+        with self.engine.begin() as cn:
+            if alterados:
+                existentes = self._existentes(cn, [r[CHAVE] for r in alterados])
+                novos = [*novos, *(r for r in alterados if r[CHAVE] not in existentes)]
+                alterados = [r for r in alterados if r[CHAVE] in existentes]
+            if novos:
+                cn.execute(sa.insert(t), novos)
+            if alterados:
+                cols = [c for c in alterados[0] if c != CHAVE]
+                stmt = (
+                    sa.update(t)
+                    .where(sa.func.upper(sa.func.trim(t.c[CHAVE])) == sa.bindparam("_chave"))
+                    .values({c: sa.bindparam(f"_v_{i}") for i, c in enumerate(cols)})
+                )
+                cn.execute(stmt, [
+                    {"_chave": r[CHAVE], **{f"_v_{i}": r.get(c) for i, c in enumerate(cols)}}
+                    for r in alterados
+                ])
+
+
+class DestinoSupabase:
+    """
+    Tabela `assessores` no Supabase. Upsert em lote pela PK `ID`:
+    linhas existentes reaproveitam o ID atual, novas recebem IDs sequenciais
+    (mesma regra de `inserir_alteracao_log`).
+    """
+
+    def __init__(self, client, tabela: str = "assessores", tamanho_lote: int = 500):
+        self.client       = client
+        self.tabela       = tabela
+        self.tamanho_lote = tamanho_lote
+        self._ids: dict[str, int] = {}
+        self._colunas: list[str] = []
+        self._maior_id = 0
+
+    def _ler(self, select_expr: str) -> list[dict]:
+        todos, start, chunk = [], 0, 1000
+        while True:
+            resp = self.client.table(self.tabela).select(select_expr).range(start, start + chunk - 1).execute()
+            data = resp.data or []
+            todos.extend(data)
+            if len(data) < chunk:
+                return todos
+            start += chunk
+
+    def colunas(self) -> list[str]:
+        if not self._colunas:
+            resp = self.client.table(self.tabela).select("*").limit(1).execute()
+            self._colunas = list((resp.data or [{}])[0].keys())
+        return self._colunas
+
+    def snapshot(self, colunas: list[str]) -> dict[str, dict]:
+        rows = self._ler("*")
+        snap = {}
+        for r in rows:
+            if r.get(CHAVE) is None:
+                continue
+            chave = str(r[CHAVE]).strip().upper()
+            self._ids[chave] = int(r["ID"])
+            snap[chave] = {c: normalizar_destino(c, r.get(c)) for c in colunas}
+        self._maior_id = max(self._ids.values(), default=0)
+        return snap
+
+    def _carregar_ids(self) -> None:
+        for r in self._ler(f"ID,{CHAVE}"):
+            if r.get(CHAVE) is not None:
+                self._ids[str(r[CHAVE]).strip().upper()] = int(r["ID"])
+        self._maior_id = max(self._ids.values(), default=0)
+
+    def aplicar(self, novos: list[dict], alterados: list[dict]) -> None:
+        if not self._ids:
+            self._carregar_ids()   # snapshot não foi lido (hashes vieram de um checkpoint)
+        registros = []
+        for r in alterados:
+            if r[CHAVE] not in self._ids:
+                novos = [*novos, r]   # apagada do destino desde o checkpoint: volta como nova
+                continue
+            registros.append({**r, "ID": self._ids[r[CHAVE]]})
+        for r in novos:
+            self._maior_id += 1
+            self._ids[r[CHAVE]] = self._maior_id
+            registros.append({**r, "ID": self._maior_id})
+        for i in range(0, len(registros), self.tamanho_lote):
+            self.client.table(self.tabela).upsert(registros[i:i + self.tamanho_lote]).execute()
+
+
+# ------------------------------------------------------------------ sincronização
+@dataclass
+class ResultadoSync:
+    lidas:      int = 0
+    novas:      int = 0
+    alteradas:  int = 0
+    iguais:     int = 0
+    ultimo_dt_atz: datetime | None = None
+    ignoradas:  list[str] = field(default_factory=list)   # colunas mapeadas que o destino não tem
+
+
+class SyncPessoas:
+    """
+    Sincroniza `query_pessoas` (SQL Server) → `assessores`:
+    1. lê a origem em lotes, só a janela de dt_atz pedida
+    2. mapeia as colunas e calcula o hash de cada linha
+    3. compara com o hash da versão atual no destino
+    4. grava em lote só as linhas novas/alteradas
+    """
+
+    def __init__(self, origem: sa.Engine, destino, mapa: dict[str, str] | None = None,
+                 chunksize: int = 5000, dry_run: bool = False, modo_consulta: str = "legado"):
+        self.origem    = origem
+        self.destino   = destino
+        self.mapa      = mapa or dict(MAPA_PADRAO)
+        self.chunksize = chunksize
+        self.dry_run   = dry_run
+        self.modo_consulta = modo_consulta
+
+    def _mapa_efetivo(self, resultado: ResultadoSync) -> dict[str, str]:
+        existentes = set(self.destino.colunas())
+        if not existentes:
+            return self.mapa
+        mapa = {o: d for o, d in self.mapa.items() if d in existentes}
+        resultado.ignoradas = [d for d in self.mapa.values() if d not in existentes]
+        if resultado.ignoradas:
+            logger.warning("Colunas sem correspondente em assessores (ignoradas): %s", resultado.ignoradas)
+        return mapa
+
+    def colunas_destino(self) -> list[str]:
+        return list(dict.fromkeys(self._mapa_efetivo(ResultadoSync()).values()))
+
+    def hashes_do_destino(self) -> dict[str, str]:
+        """SIGLA → hash da versão atual no destino (uma leitura completa do destino)."""
+        colunas = self.colunas_destino()
+        return {
+            chave: hash_linha(valores, colunas)
+            for chave, valores in self.destino.snapshot(colunas).items()
+        }
+
+    def executar(self, inicio: datetime, fim: datetime, hashes_destino: dict[str, str] | None = None,
+                 ao_gravar_lote=None, sql: sa.TextClause | None = None) -> ResultadoSync:
+        """
+        `hashes_destino`: hashes já conhecidos (SIGLA → hash); se None, lê o destino uma vez.
+        `ao_gravar_lote(hashes, ultimo_dt_atz)` é chamado após cada lote gravado (checkpoint).
+        """
+        resultado = ResultadoSync()
+        mapa = self._mapa_efetivo(resultado)
+        colunas = list(dict.fromkeys(mapa.values()))
+
+        if hashes_destino is None:
+            hashes_destino = self.hashes_do_destino()
+
+        for chunk in ler_origem_em_lotes(self.origem, list(mapa), inicio, fim, self.chunksize,
+                                         sql=sql, modo=self.modo_consulta):
+            resultado.lidas += len(chunk)
+            lote = mapear_lote(chunk, mapa)
+
+            novos, alterados, hashes_lote = [], [], {}
+            for rec in lote.to_dict(orient="records"):
+                chave = rec[CHAVE]
+                h = hash_linha(rec, colunas)
+                anterior = hashes_destino.get(chave)
+                if anterior == h:
+                    resultado.iguais += 1
+                    continue
+                (alterados if anterior is not None else novos).append(rec)
+                hashes_lote[chave] = h
+
+            if not self.dry_run and (novos or alterados):
+                self.destino.aplicar(novos, alterados)
+            hashes_destino.update(hashes_lote)
+            resultado.novas     += len(novos)
+            resultado.alteradas += len(alterados)
+            if not chunk.empty and "dt_atz" in chunk.columns:
+                resultado.ultimo_dt_atz = pd.to_datetime(chunk["dt_atz"]).max().to_pydatetime()
+
+            if ao_gravar_lote is not None and not self.dry_run:
+                ao_gravar_lote(hashes_lote, resultado.ultimo_dt_atz)
+            logger.info("Lote: %s lidas, %s novas, %s alteradas", len(chunk), len(novos), len(alterados))
+
+        return resultado
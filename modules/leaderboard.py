@@ -0,0 +1,130 @@
+# modules/leaderboard.py
+import heapq
+import threading
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+from operator import itemgetter
+
+from modules.rollup_alteracoes import get_rollup_alteracoes, ORDEM_STATUS
+
+# dimensão do placar → atributos da LinhaAlteracao que formam a chave
+DIMENSOES = {
+    "assessor": ("assessor", "filial"),
+    "usuario":  ("usuario", "filial"),
+}
+
+
+def _fim_do_mes(d: date) -> date:
+    proximo = (d.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return proximo - timedelta(days=1)
+
+
+def _fatias_periodo(inicio: date, fim: date):
+    """
+    Quebra [inicio, fim] em ("mes", "AAAA-MM") para meses inteiros
+    e ("dia", "AAAA-MM-DD") para os dias das pontas que cobrem só parte do mês.
+    """
+    atual = inicio.replace(day=1)
+    while atual <= fim:
+        ultimo = _fim_do_mes(atual)
+        if inicio <= atual and ultimo <= fim:
+            yield "mes", atual.strftime("%Y-%m")
+        else:
+            d = max(inicio, atual)
+            while d <= min(fim, ultimo):
+                yield "dia", d.isoformat()
+                d += timedelta(days=1)
+        atual = ultimo + timedelta(days=1)
+
+
+class PlacarTopK:
+    """
+    Contadores incrementais por (dimensão, tipo, status) para os rankings do Dashboard Admin.
+    - cada contador é dividido em baldes mensais e diários (dia só é usado nas pontas
+      do período que não cobrem o mês inteiro)
+    - é alimentado pelos deltas do `RollupAlteracoes` (linha nova, status alterado)
+    - consulta soma só os baldes do período e escolhe o top-K com heapq.nlargest,
+      sem groupby/pivot/sort do período inteiro
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (dim, tipo, status) → "AAAA-MM" / "AAAA-MM-DD" → Counter(chave)
+        self._mensal: dict = defaultdict(lambda: defaultdict(Counter))
+        self._diario: dict = defaultdict(lambda: defaultdict(Counter))
+
+    # ------------------------------------------------------------------ atualização
+    def _somar(self, linha, qtd: int) -> None:
+        if not linha.dia:
+            return
+        mes = linha.dia[:7]
+        for dim, attrs in DIMENSOES.items():
+            chave = tuple(getattr(linha, a) for a in attrs)
+            grupo = (dim, linha.tipo, linha.status)
+            for baldes, periodo in ((self._mensal, mes), (self._diario, linha.dia)):
+                cont = baldes[grupo][periodo]
+                cont[chave] += qtd
+                if cont[chave] <= 0:
+                    del cont[chave]
+
+    def aplicar(self, deltas) -> None:
+        """Aplica deltas (antiga, nova) vindos do rollup; None = linha inexistente."""
+        with self._lock:
+            for antiga, nova in deltas:
+                if antiga is not None:
+                    self._somar(antiga, -1)
+                if nova is not None:
+                    self._somar(nova, +1)
+
+    # ------------------------------------------------------------------ consultas
+    def _contar(self, dim: str, tipo: str | None, status: str | None, inicio: date, fim: date) -> Counter:
+        """Soma dos baldes do período para os grupos que casam com tipo/status (None = todos)."""
+        total: Counter = Counter()
+        fatias = list(_fatias_periodo(inicio, fim))
+        with self._lock:
+            for (g_dim, g_tipo, g_status), mensal in self._mensal.items():
+                if g_dim != dim or (tipo is not None and g_tipo != tipo) \
+                        or (status is not None and g_status != status):
+                    continue
+                diario = self._diario.get((g_dim, g_tipo, g_status), {})
+                for granularidade, periodo in fatias:
+                    baldes = mensal if granularidade == "mes" else diario
+                    if periodo in baldes:
+                        total.update(baldes[periodo])
+        return total
+
+    def top(self, dim: str, inicio: date, fim: date, k: int = 10,
+            tipo: str | None = None, status: str | None = None) -> list[tuple[tuple, int]]:
+        """Os `k` maiores (chave, qtd) da dimensão no período."""
+        return heapq.nlargest(k, self._contar(dim, tipo, status, inicio, fim).items(), key=itemgetter(1))
+
+    def top_por_status(self, dim: str, tipo: str, inicio: date, fim: date, k: int = 20,
+                       status_no_total=tuple(ORDEM_STATUS)) -> list[dict]:
+        """
+        Top-K de um tipo com a quebra por status; o ranking usa a soma de `status_no_total`.
+        Retorna dicts {"chave": (...), "total": n, <status>: n, ...}.
+        """
+        por_status = {s: self._contar(dim, tipo, s, inicio, fim) for s in ORDEM_STATUS}
+        totais: Counter = Counter()
+        for s in status_no_total:
+            totais.update(por_status[s])
+        return [
+            {"chave": chave, "total": qtd, **{s: por_status[s].get(chave, 0) for s in ORDEM_STATUS}}
+            for chave, qtd in heapq.nlargest(k, totais.items(), key=itemgetter(1))
+        ]
+
+
+_placar: PlacarTopK | None = None
+_placar_lock = threading.Lock()
+
+
+def get_placar() -> PlacarTopK:
+    """Placar compartilhado pelo processo, semeado do rollup local e inscrito nos seus deltas."""
+    global _placar
+    if _placar is None:
+        with _placar_lock:
+            if _placar is None:
+                placar = PlacarTopK()
+                get_rollup_alteracoes().inscrever(placar.aplicar)
+                _placar = placar
+    return _placar
@@ -0,0 +1,210 @@
+# modules/login_directory.py
+import hashlib
+import hmac
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+
+import pandas as pd
+import streamlit as st
+
+from modules.db import carregar_filial
+from modules.email_service import gerar_senha_personalizada
+from modules.resiliencia import desatualizado_desde
+
+# ordem = precedência do login (o 1º grupo que contém o nome decide)
+GRUPOS_SECRETS = [
+    # role,            nível, seção de senhas,     seção de e-mails
+    ("admin",          1,     "admins",            "admin_emails"),
+    ("rh",             6,     "rh",                "rh_emails"),
+    ("comissoes",      6,     "comissoes",         "comissoes_emails"),
+    ("director",       3,     "directors",         "director_emails"),
+    ("rm",             5,     "rms",               "rm_emails"),
+    ("superintendent", 4,     "superintendents",   "superintendent_emails"),
+]
+
+# colunas da filial usadas para autenticar líderes
+COLS_LOGIN_FILIAL = ["FILIAL", "LIDER", "CPF", "EMAIL", "LIDER2", "CPF_LIDER2", "EMAIL_LIDER2"]
+
+TTL_SNAPSHOT_S = 600
+
+
+# chave aleatória por processo: os digests nunca saem da memória e não servem fora dela
+_PEPPER = os.urandom(32)
+
+
+def normalizar_usuario(nome) -> str:
+    return str(nome or "").strip().upper()
+
+
+def _texto(valor) -> str | None:
+    """NaN/None viram None (comparáveis entre snapshots); o resto vira str."""
+    if valor is None or (isinstance(valor, float) and pd.isna(valor)):
+        return None
+    return str(valor)
+
+
+def digest_senha(senha: str) -> bytes:
+    return hmac.new(_PEPPER, (senha or "").encode(), hashlib.sha256).digest()
+
+
+@dataclass
+class CredencialSecrets:
+    """Usuário cadastrado no secrets (admin, rh, comissões, diretor, RM, superintendente)."""
+    nome:  str          # chave original no secrets
+    role:  str
+    level: int
+    senha: str
+    email: str | None
+    fonte: str          # seção do secrets de onde veio
+
+
+@dataclass
+class CandidatoLider:
+    """Uma linha da tabela filial em que o usuário aparece como LIDER ou LIDER2."""
+    role:   str         # "leader" | "leader2"
+    filial: str
+    lider:  str
+    cpf:    str | None
+    email:  str | None
+
+
+@dataclass
+class EntradaLogin:
+    secrets: CredencialSecrets | None = None
+    # digest da senha esperada → linha da filial (Líder 1 antes de Líder 2)
+    lideres: dict[bytes, CandidatoLider] = field(default_factory=dict)
+
+    def verificar_lider(self, senha: str) -> CandidatoLider | None:
+        return self.lideres.get(digest_senha(senha))
+
+
+class DiretorioLogin:
+    """
+    Índice usuário normalizado → credenciais, montado uma vez a partir do secrets
+    e do snapshot da filial. Cada tentativa de login vira um lookup em dict.
+    Para líderes, guarda o HMAC das senhas esperadas (FILIAL+LIDER+CPF), então
+    verificar a senha é só checar se o digest está no conjunto.
+    """
+
+    def __init__(self):
+        self._secrets: dict[str, CredencialSecrets] = {}
+        self._lideres: dict[str, dict[bytes, CandidatoLider]] = {}
+        self._linhas: dict[tuple, CandidatoLider] = {}
+        self._versao_filial: float | None = None
+        self._lock = threading.Lock()
+
+    def carregar_secrets(self, secrets) -> None:
+        indice: dict[str, CredencialSecrets] = {}
+        for role, level, secao_senha, secao_email in GRUPOS_SECRETS:
+            senhas = secrets.get(secao_senha, {}) or {}
+            emails = secrets.get(secao_email, {}) or {}
+            for nome, senha in senhas.items():
+                chave = normalizar_usuario(nome)
+                if chave in indice:
+                    continue  # grupo anterior tem precedência
+                indice[chave] = CredencialSecrets(
+                    nome=nome, role=role, level=level, senha=str(senha),
+                    email=emails.get(nome), fonte=secao_senha
+                )
+        self._secrets = indice
+
+    @staticmethod
+    def _linhas_lider(df_filial: pd.DataFrame) -> dict[tuple, CandidatoLider]:
+        """(role, filial) → candidato, na ordem Líder 1 e depois Líder 2."""
+        linhas: dict[tuple, CandidatoLider] = {}
+        if df_filial.empty:
+            return linhas
+        registros = df_filial.to_dict(orient="records")
+        for role, col_nome, col_cpf, col_email in (
+            ("leader",  "LIDER",  "CPF",        "EMAIL"),
+            ("leader2", "LIDER2", "CPF_LIDER2", "EMAIL_LIDER2"),
+        ):
+            if col_nome not in df_filial.columns:
+                continue
+            for rec in registros:
+                nome = rec.get(col_nome)
+                if not isinstance(nome, str) or not nome.strip():
+                    continue
+                linhas[(role, rec.get("FILIAL"))] = CandidatoLider(
+                    role=role,
+                    filial=rec.get("FILIAL"),
+                    lider=nome,
+                    cpf=_texto(rec.get(col_cpf)),
+                    email=_texto(rec.get(col_email)),
+                )
+        return linhas
+
+    def carregar_filial(self, df_filial: pd.DataFrame, versao: float | None = None) -> None:
+        """
+        Atualiza a tabela de credenciais derivadas dos líderes de forma incremental:
+        só os líderes com linhas novas/alteradas/removidas têm as senhas
+        esperadas recalculadas e re-hasheadas.
+        """
+        novas = self._linhas_lider(df_filial)
+        with self._lock:
+            antigas = self._linhas
+            afetados = {
+                normalizar_usuario(cand.lider)
+                for chave in antigas.keys() | novas.keys()
+                for cand in (antigas.get(chave), novas.get(chave))
+                if cand is not None and antigas.get(chave) != novas.get(chave)
+            }
+            por_nome: dict[str, list[CandidatoLider]] = {}
+            for cand in novas.values():
+                chave = normalizar_usuario(cand.lider)
+                if chave in afetados:
+                    por_nome.setdefault(chave, []).append(cand)
+
+            for chave in afetados:
+                digests: dict[bytes, CandidatoLider] = {}
+                for cand in por_nome.get(chave, []):
+                    senha = gerar_senha_personalizada(cand.filial, cand.lider, cand.cpf)
+                    digests.setdefault(digest_senha(senha), cand)
+                if digests:
+                    self._lideres[chave] = digests
+                else:
+                    self._lideres.pop(chave, None)
+
+            self._linhas = novas
+            self._versao_filial = versao
+
+    def desatualizado(self, versao: float) -> bool:
+        return self._versao_filial != versao
+
+    def buscar(self, usuario: str) -> EntradaLogin | None:
+        chave = normalizar_usuario(usuario)
+        cred = self._secrets.get(chave)
+        if cred is not None:
+            return EntradaLogin(secrets=cred)
+        lideres = self._lideres.get(chave)
+        if lideres:
+            return EntradaLogin(lideres=dict(lideres))
+        return None
+
+
+@st.cache_data(ttl=TTL_SNAPSHOT_S, show_spinner=False)
+def _snapshot_filial_login() -> tuple[pd.DataFrame, float]:
+    """Snapshot da filial para login (com carimbo de versão para detectar recarga)."""
+    return carregar_filial(COLS_LOGIN_FILIAL), time.time()
+
+
+_diretorio: DiretorioLogin | None = None
+_diretorio_lock = threading.Lock()
+
+
+def get_diretorio() -> DiretorioLogin:
+    """Diretório compartilhado pelo processo; reindexa os líderes quando a filial é recarregada."""
+    global _diretorio
+    with _diretorio_lock:
+        if _diretorio is None:
+            _diretorio = DiretorioLogin()
+            _diretorio.carregar_secrets(st.secrets)
+    df_filial, versao = _snapshot_filial_login()
+    if desatualizado_desde(df_filial):
+        # snapshot antigo (banco fora): serve agora, mas o próximo login relê a filial
+        _snapshot_filial_login.clear()
+    if _diretorio.desatualizado(versao):
+        _diretorio.carregar_filial(df_filial, versao)
+    return _diretorio
@@ -0,0 +1,257 @@
+# modules/mail_transport.py
+import smtplib
+import threading
+import time
+from email.message import EmailMessage
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from modules.email_templates import anexo_logo_inline, usa_logo_inline, LOGO_CID, LOGO_PATH
+
+GRAPH_URL     = "https://graph.microsoft.com/v1.0"
+AUTHORITY_URL = "https://login.microsoftonline.com"
+GRAPH_SCOPE   = ["https://graph.microsoft.com/.default"]
+
+# renova o token um pouco antes de expirar (evita 401 em envios longos)
+MARGEM_EXPIRACAO_S = 120
+
+
+class ErroEnvioEmail(Exception):
+    """Falha ao obter token ou ao enviar e-mail pelo Microsoft Graph."""
+
+    def __init__(
+        self,
+        mensagem: str,
+        status_code: int | None = None,
+        retry_after: float | None = None
+    ):
+        super().__init__(mensagem)
+        self.status_code = status_code
+        self.retry_after = retry_after   # segundos sugeridos pelo Graph (429/503)
+
+
+class GraphMailTransport:
+    """
+    Transporte de e-mail via Microsoft Graph reaproveitado entre envios:
+    - token client-credentials em cache até perto do `expires_in`
+    - `requests.Session` com pool de conexões (keep-alive / sem novo TLS a cada envio)
+    Seguro para uso concorrente (threads do Streamlit e workers de envio).
+
+    `obter_token_fn` substitui o MSAL (ex.: Graph falso local em testes).
+    """
+
+    def __init__(
+        self,
+        tenant_id: str,
+        client_id: str,
+        client_secret: str,
+        remetente: str,
+        graph_url: str = GRAPH_URL,
+        authority_url: str = AUTHORITY_URL,
+        pool_size: int = 10,
+        timeout: float = 20.0,
+        obter_token_fn=None,
+    ):
+        self.remetente     = remetente
+        self.graph_url     = graph_url.rstrip("/")
+        self.timeout       = timeout
+        self._tenant_id    = tenant_id
+        self._client_id    = client_id
+        self._secret       = client_secret
+        self._authority    = f"{authority_url.rstrip('/')}/{tenant_id}"
+        self._obter_token_fn = obter_token_fn
+
+        self._lock_token   = threading.Lock()
+        self._msal_app     = None
+        self._token: str | None = None
+        self._expira_em    = 0.0   # time.monotonic()
+
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+
+    # ------------------------------------------------------------------ token
+    def _get_msal_app(self):
+        if self._msal_app is None:
+            import msal  # só quando o 1º token é pedido (fora do caminho do login)
+            self._msal_app = msal.ConfidentialClientApplication(
+                self._client_id,
+                authority=self._authority,
+                client_credential=self._secret,
+                http_client=self._session,
+            )
+        return self._msal_app
+
+    def obter_token(self, forcar: bool = False) -> str:
+        """Retorna o token em cache ou executa o client-credentials flow."""
+        with self._lock_token:
+            agora = time.monotonic()
+            if not forcar and self._token and agora < self._expira_em - MARGEM_EXPIRACAO_S:
+                return self._token
+
+            if self._obter_token_fn is not None:
+                token_resp = self._obter_token_fn()
+            else:
+                token_resp = self._get_msal_app().acquire_token_for_client(scopes=GRAPH_SCOPE)
+            if "access_token" not in token_resp:
+                raise ErroEnvioEmail(
+                    f"Erro ao obter token para envio de e-mail: {token_resp.get('error_description')}"
+                )
+            self._token     = token_resp["access_token"]
+            self._expira_em = agora + int(token_resp.get("expires_in", 3599))
+            return self._token
+
+    def invalidar_token(self) -> None:
+        with self._lock_token:
+            self._token     = None
+            self._expira_em = 0.0
+
+    # ------------------------------------------------------------------ envio
+    def montar_payload(
+        self,
+        destinatarios: list[str],
+        assunto: str,
+        corpo: str,
+        content_type: str = "Text",
+    ) -> dict:
+        mail = {
+            "message": {
+                "subject": assunto,
+                "body": {
+                    "contentType": content_type,
+                    "content": corpo
+                },
+                "toRecipients": [
+                    {"emailAddress": {"address": email}} for email in destinatarios
+                ],
+                "from": {"emailAddress": {"address": self.remetente}}
+            },
+            "saveToSentItems": "true"
+        }
+        # logo referenciado por CID vai como anexo inline (em vez de data URI no corpo)
+        if content_type.upper() == "HTML" and usa_logo_inline(corpo):
+            mail["message"]["attachments"] = [anexo_logo_inline()]
+        return mail
+
+    def enviar(
+        self,
+        destinatarios: list[str],
+        assunto: str,
+        corpo: str,
+        content_type: str = "Text",
+    ) -> None:
+        """Envia o e-mail; levanta ErroEnvioEmail em caso de falha."""
+        mail     = self.montar_payload(destinatarios, assunto, corpo, content_type)
+        endpoint = f"{self.graph_url}/users/{self.remetente}/sendMail"
+
+        # até 2 tentativas: a 2ª só acontece se o token em cache foi revogado (401)
+        for tentativa in range(2):
+            headers = {
+                "Authorization": f"Bearer {self.obter_token(forcar=tentativa > 0)}",
+                "Content-Type": "application/json"
+            }
+            try:
+                resp = self._session.post(endpoint, headers=headers, json=mail, timeout=self.timeout)
+            except requests.RequestException as e:
+                raise ErroEnvioEmail(f"Falha ao enviar e-mail: {e}")
+
+            if resp.status_code == 202:
+                return
+            if resp.status_code == 401 and tentativa == 0:
+                self.invalidar_token()
+                continue
+            retry_after = resp.headers.get("Retry-After")
+            raise ErroEnvioEmail(
+                f"Falha ao enviar e-mail: {resp.status_code} – {resp.text}",
+                status_code=resp.status_code,
+                retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None
+            )
+
+    def aquecer(self) -> None:
+        """Obtém o token e abre a conexão TLS com o Graph antes do primeiro envio."""
+        self.obter_token()
+        try:
+            self._session.head(self.graph_url, timeout=self.timeout)
+        except requests.RequestException:
+            pass  # só pré-aquecimento; o envio real trata erros
+
+    def fechar(self) -> None:
+        self._session.close()
+
+
+class SmtpMailTransport:
+    """
+    Mesmo contrato de `GraphMailTransport.enviar`, mas via SMTP.
+    Útil para rodar envios contra um servidor SMTP local (ex.: `python -m aiosmtpd -n`).
+    """
+
+    def __init__(
+        self,
+        remetente: str,
+        host: str = "localhost",
+        port: int = 1025,
+        usuario: str | None = None,
+        senha: str | None = None,
+        starttls: bool = False,
+        timeout: float = 20.0,
+    ):
+        self.remetente = remetente
+        self.host      = host
+        self.port      = port
+        self.usuario   = usuario
+        self.senha     = senha
+        self.starttls  = starttls
+        self.timeout   = timeout
+
+    def enviar(
+        self,
+        destinatarios: list[str],
+        assunto: str,
+        corpo: str,
+        content_type: str = "Text",
+    ) -> None:
+        msg = EmailMessage()
+        msg["From"]    = self.remetente
+        msg["To"]      = ", ".join(destinatarios)
+        msg["Subject"] = assunto
+        if content_type.upper() == "HTML":
+            msg.set_content(corpo, subtype="html")
+            if usa_logo_inline(corpo):
+                msg.add_related(LOGO_PATH.read_bytes(), maintype="image", subtype="png",
+                                cid=f"<{LOGO_CID}>")
+        else:
+            msg.set_content(corpo)
+
+        try:
+            with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+                if self.starttls:
+                    smtp.starttls()
+                if self.usuario:
+                    smtp.login(self.usuario, self.senha or "")
+                smtp.send_message(msg)
+        except (smtplib.SMTPException, OSError) as e:
+            raise ErroEnvioEmail(f"Falha ao enviar e-mail (SMTP): {e}")
+
+
+_transport: GraphMailTransport | None = None
+_transport_lock = threading.Lock()
+
+
+def get_transport() -> GraphMailTransport:
+    """Transporte compartilhado pelo processo (todas as sessões do Streamlit)."""
+    global _transport
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                from config import TENANT_ID, CLIENT_ID, CLIENT_SECRET, EMAIL_USER
+                _transport = GraphMailTransport(TENANT_ID, CLIENT_ID, CLIENT_SECRET, EMAIL_USER)
+    return _transport
+
+
+def definir_transport(transport: GraphMailTransport | None) -> None:
+    """Substitui o transporte compartilhado (ex.: apontar para um Graph local em testes)."""
+    global _transport
+    with _transport_lock:
+        _transport = transport
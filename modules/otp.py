@@ -0,0 +1,54 @@
+# modules/otp.py
+import logging
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from modules.email_service import montar_email_codigo
+from modules.mail_transport import get_transport
+
+logger = logging.getLogger(__name__)
+
+# re-aquece se o último aquecimento tiver mais de 30 min (token dura ~60 min)
+INTERVALO_AQUECIMENTO_S = 30 * 60
+
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="otp")
+_aquecido_em = 0.0
+_aquecer_lock = threading.Lock()
+
+
+def gerar_codigo() -> str:
+    return f"{random.randint(0, 999999):06d}"
+
+
+def aquecer_transporte() -> None:
+    """
+    Dispara (no máximo 1x a cada 30 min) o token + handshake TLS com o Graph em
+    segundo plano, para que o envio do OTP já encontre o transporte pronto.
+    """
+    global _aquecido_em
+    with _aquecer_lock:
+        agora = time.monotonic()
+        if _aquecido_em and agora - _aquecido_em < INTERVALO_AQUECIMENTO_S:
+            return
+        _aquecido_em = agora
+
+    def _aquecer():
+        try:
+            get_transport().aquecer()
+        except Exception:
+            logger.warning("Falha ao pré-aquecer o transporte de e-mail", exc_info=True)
+
+    _executor.submit(_aquecer)
+
+
+def emitir_codigo(destino: str, nome: str) -> tuple[str, Future]:
+    """
+    Gera o código e envia o e-mail em segundo plano pelo transporte compartilhado.
+    Retorna o código e o Future do envio (result() levanta ErroEnvioEmail em falha).
+    """
+    codigo = gerar_codigo()
+    assunto, html = montar_email_codigo(nome, codigo)
+    fut = _executor.submit(get_transport().enviar, [destino], assunto, html, "HTML")
+    return codigo, fut
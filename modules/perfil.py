@@ -0,0 +1,206 @@
+# modules/perfil.py
+import cProfile
+import io
+import json
+import os
+import pstats
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+import streamlit as st
+
+PERFIL_DB = os.environ.get("SMARTC_PERFIL_DB", ".smartc_perfil.db")
+
+# quantas execuções (as mais lentas) ficam guardadas para análise
+MAX_GUARDADAS = 50
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reruns (
+    id       INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts       REAL    NOT NULL,
+    usuario  TEXT,
+    pagina   TEXT,
+    total_ms REAL    NOT NULL,
+    secoes   TEXT    NOT NULL,
+    perfil   TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_reruns_total ON reruns (total_ms);
+"""
+
+
+class PerfilRerun:
+    """
+    Cronômetro de uma execução do script:
+    - `marcar(nome)` fecha a etapa anterior e abre a próxima (carga, hierarquia, sidebar, página...)
+    - `medir(nome)` mede um bloco dentro da etapa atual (ex.: cada seção da página)
+    - opcionalmente amostra a execução inteira com cProfile ou pyinstrument
+    """
+
+    def __init__(self, amostrador: str | None = None):
+        self.inicio    = time.perf_counter()
+        self.etapas:   list[tuple[str, float]] = []
+        self.blocos:   list[tuple[str, str, float]] = []   # (etapa, bloco, ms)
+        self._etapa    = "tema/login"
+        self._t_etapa  = self.inicio
+        self.total_ms  = 0.0
+        self.texto_perfil: str | None = None
+        self._cprof = self._pyinst = None
+        if amostrador == "pyinstrument":
+            try:
+                from pyinstrument import Profiler
+                self._pyinst = Profiler()
+                self._pyinst.start()
+            except ImportError:
+                amostrador = "cprofile"
+        if amostrador == "cprofile":
+            self._cprof = cProfile.Profile()
+            self._cprof.enable()
+
+    def marcar(self, etapa: str) -> None:
+        agora = time.perf_counter()
+        self.etapas.append((self._etapa, (agora - self._t_etapa) * 1000))
+        self._etapa, self._t_etapa = etapa, agora
+
+    @contextmanager
+    def medir(self, bloco: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.blocos.append((self._etapa, bloco, (time.perf_counter() - t0) * 1000))
+
+    def encerrar(self) -> None:
+        self.marcar("fim")
+        self.etapas.pop()   # "fim" não tem duração
+        self.total_ms = (time.perf_counter() - self.inicio) * 1000
+        if self._cprof is not None:
+            self._cprof.disable()
+            buf = io.StringIO()
+            pstats.Stats(self._cprof, stream=buf).sort_stats("cumulative").print_stats(30)
+            self.texto_perfil = buf.getvalue()
+        elif self._pyinst is not None:
+            self._pyinst.stop()
+            self.texto_perfil = self._pyinst.output_text(unicode=True, color=False)
+
+    def tabela(self) -> pd.DataFrame:
+        linhas = []
+        total = self.total_ms or 1.0
+        for etapa, ms in self.etapas:
+            linhas.append({"Etapa": etapa, "ms": round(ms, 1), "% do total": round(100 * ms / total, 1)})
+            for b_etapa, bloco, b_ms in self.blocos:
+                if b_etapa == etapa:
+                    linhas.append({"Etapa": f"   ↳ {bloco}", "ms": round(b_ms, 1),
+                                   "% do total": round(100 * b_ms / total, 1)})
+        return pd.DataFrame(linhas)
+
+
+class ArquivoPerfis:
+    """As `MAX_GUARDADAS` execuções mais lentas, em SQLite local."""
+
+    def __init__(self, caminho_db: str = PERFIL_DB, max_guardadas: int = MAX_GUARDADAS):
+        self.max_guardadas = max_guardadas
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(caminho_db, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def guardar(self, perfil: PerfilRerun, usuario: str | None, pagina: str | None) -> None:
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute(
+                    "INSERT INTO reruns (ts, usuario, pagina, total_ms, secoes, perfil) VALUES (?, ?, ?, ?, ?, ?)",
+                    (time.time(), usuario, pagina, perfil.total_ms,
+                     json.dumps({"etapas": perfil.etapas, "blocos": perfil.blocos}, ensure_ascii=False),
+                     perfil.texto_perfil)
+                )
+                self._conn.execute(
+                    "DELETE FROM reruns WHERE id NOT IN "
+                    "(SELECT id FROM reruns ORDER BY total_ms DESC LIMIT ?)",
+                    (self.max_guardadas,)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def mais_lentas(self, n: int = 10) -> pd.DataFrame:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT ts, usuario, pagina, total_ms FROM reruns ORDER BY total_ms DESC LIMIT ?", (n,)
+            ).fetchall()
+        df = pd.DataFrame(rows, columns=["Quando", "Usuário", "Página", "ms"])
+        df["Quando"] = pd.to_datetime(df["Quando"], unit="s")
+        df["ms"] = df["ms"].round(1)
+        return df
+
+
+_arquivo: ArquivoPerfis | None = None
+_arquivo_lock = threading.Lock()
+
+
+def get_arquivo_perfis() -> ArquivoPerfis:
+    global _arquivo
+    if _arquivo is None:
+        with _arquivo_lock:
+            if _arquivo is None:
+                _arquivo = ArquivoPerfis()
+    return _arquivo
+
+
+# ------------------------------------------------------------------ uso no app
+def iniciar() -> PerfilRerun | None:
+    """Começa o perfil desta execução, se o Admin ligou o modo (senão, None e custo zero)."""
+    ss = st.session_state
+    if not ss.get("perfil_ativo") or ss.get("level") != 1:
+        ss.pop("_perfil", None)
+        return None
+    perfil = PerfilRerun(ss.get("perfil_amostrador"))
+    ss["_perfil"] = perfil
+    return perfil
+
+
+def marcar(etapa: str) -> None:
+    perfil = st.session_state.get("_perfil")
+    if perfil is not None:
+        perfil.marcar(etapa)
+
+
+@contextmanager
+def medir(bloco: str):
+    perfil = st.session_state.get("_perfil")
+    if perfil is None:
+        yield
+        return
+    with perfil.medir(bloco):
+        yield
+
+
+def finalizar(perfil: PerfilRerun | None, exibir: bool = True) -> None:
+    """Encerra, guarda (se estiver entre as mais lentas) e desenha o resumo no fim da página."""
+    if perfil is None:
+        return
+    perfil.encerrar()
+    ss = st.session_state
+    get_arquivo_perfis().guardar(perfil, (ss.get("dados_lider") or {}).get("LIDER"), ss.get("pagina"))
+    if not exibir:
+        return
+    with st.expander(f"⏱️ Perfil desta execução — {perfil.total_ms:,.0f} ms", expanded=False):
+        st.dataframe(perfil.tabela(), hide_index=True, use_container_width=True)
+        if perfil.texto_perfil:
+            st.code(perfil.texto_perfil, language=None)
+        st.caption("Execuções mais lentas guardadas")
+        st.dataframe(get_arquivo_perfis().mais_lentas(), hide_index=True, use_container_width=True)
+
+
+def exibir_controle_perfil() -> None:
+    """Liga/desliga o perfil por execução (sidebar do Admin)."""
+    st.toggle("Perfil por execução", key="perfil_ativo")
+    if st.session_state.get("perfil_ativo"):
+        st.selectbox(
+            "Amostragem", [None, "cprofile", "pyinstrument"], key="perfil_amostrador",
+            format_func=lambda x: "Só cronômetros" if x is None else x
+        )
@@ -0,0 +1,191 @@
+# modules/resiliencia.py
+import os
+import random
+import threading
+import time
+
+import httpx
+from postgrest import APIError
+
+TENTATIVAS   = int(os.environ.get("SMARTC_RETRY_TENTATIVAS", "4"))
+ESPERA_BASE  = float(os.environ.get("SMARTC_RETRY_BASE_S", "0.2"))
+ESPERA_TETO  = float(os.environ.get("SMARTC_RETRY_TETO_S", "3"))
+# tempo total (tentativas + esperas) de uma chamada antes de desistir
+ORCAMENTO_S  = float(os.environ.get("SMARTC_RETRY_ORCAMENTO_S", "12"))
+
+# disjuntor por tabela: abre após N falhas seguidas e fica aberto por X segundos
+FALHAS_PARA_ABRIR = int(os.environ.get("SMARTC_DISJUNTOR_FALHAS", "5"))
+ABERTO_POR_S      = float(os.environ.get("SMARTC_DISJUNTOR_ABERTO_S", "30"))
+
+# códigos que indicam problema passageiro (gateway, conexões, timeout de statement)
+_HTTP_TRANSITORIOS = {408, 429, 500, 502, 503, 504, 520, 521, 522, 523, 524}
+_SQL_TRANSITORIOS  = {"57014", "53300", "40001", "40P01", "PGRST000", "PGRST001", "PGRST002"}
+_SQL_DUPLICADO     = "23505"
+
+
+class SupabaseIndisponivel(Exception):
+    """O banco não respondeu (após as repetições) ou o disjuntor da tabela está aberto."""
+
+
+def _transitorio(exc: Exception) -> bool:
+    if isinstance(exc, httpx.TransportError):
+        return True
+    if isinstance(exc, APIError):
+        codigo = exc.code
+        if isinstance(codigo, int) or (isinstance(codigo, str) and codigo.isdigit() and len(codigo) == 3):
+            return int(codigo) in _HTTP_TRANSITORIOS
+        return codigo in _SQL_TRANSITORIOS
+    return False
+
+
+class Disjuntor:
+    """
+    Circuit breaker de uma tabela:
+    - fechado: tudo passa; conta falhas seguidas
+    - aberto:  recusa na hora (sem esperar timeout) até `ABERTO_POR_S` passar
+    - meio-aberto: deixa UMA chamada testar; sucesso fecha, falha reabre
+    """
+
+    def __init__(self, falhas_para_abrir: int = FALHAS_PARA_ABRIR, aberto_por_s: float = ABERTO_POR_S):
+        self.falhas_para_abrir = falhas_para_abrir
+        self.aberto_por_s = aberto_por_s
+        self._lock = threading.Lock()
+        self.falhas = 0
+        self.aberto_ate = 0.0
+        self._testando = False
+
+    def permitir(self) -> bool | str:
+        """False = recusar; "teste" = esta é a chamada de teste do meio-aberto; True = fechado."""
+        with self._lock:
+            if self.falhas < self.falhas_para_abrir:
+                return True
+            if time.monotonic() < self.aberto_ate or self._testando:
+                return False
+            self._testando = True   # meio-aberto
+            return "teste"
+
+    def sucesso(self) -> None:
+        with self._lock:
+            self.falhas = 0
+            self._testando = False
+
+    def liberar(self) -> None:
+        """Fim da chamada de teste, qualquer que tenha sido o desfecho (inclusive exceção inesperada)."""
+        with self._lock:
+            self._testando = False
+
+    def abrir(self) -> None:
+        """Abre na hora (ex.: já há snapshot para servir; não vale esperar mais timeouts)."""
+        with self._lock:
+            self.falhas = max(self.falhas, self.falhas_para_abrir)
+            self.aberto_ate = time.monotonic() + self.aberto_por_s
+
+    def falha(self) -> None:
+        with self._lock:
+            self.falhas += 1
+            self._testando = False
+            if self.falhas >= self.falhas_para_abrir:
+                self.aberto_ate = time.monotonic() + self.aberto_por_s
+
+    @property
+    def aberto(self) -> bool:
+        return self.falhas >= self.falhas_para_abrir and time.monotonic() < self.aberto_ate
+
+
+_disjuntores: dict[str, Disjuntor] = {}
+_disjuntores_lock = threading.Lock()
+
+
+def disjuntor(tabela: str) -> Disjuntor:
+    with _disjuntores_lock:
+        if tabela not in _disjuntores:
+            _disjuntores[tabela] = Disjuntor()
+        return _disjuntores[tabela]
+
+
+def executar(tabela: str, chamada, repetir: bool = True, conferir=None):
+    """
+    Executa `chamada()` (um `.execute()` do postgrest) com:
+    - disjuntor da tabela (aberto → SupabaseIndisponivel na hora)
+    - até TENTATIVAS repetições em erro passageiro, com backoff exponencial e
+      jitter completo (espera aleatória entre 0 e base·2ⁿ, limitada ao teto),
+      sem passar de ORCAMENTO_S no total
+    `repetir=False` para inserts sem chave explícita (repetir poderia duplicar).
+    Em insert com ID explícito, "chave duplicada" numa repetição só conta como
+    sucesso se `conferir()` confirmar que a linha gravada é a nossa (outro usuário
+    pode ter pegado o mesmo ID); sem `conferir`, o erro sobe.
+    """
+    dj = disjuntor(tabela)
+    permissao = dj.permitir()
+    if not permissao:
+        raise SupabaseIndisponivel(f"'{tabela}' indisponível (disjuntor aberto)")
+
+    tentativas = TENTATIVAS if repetir else 1
+    inicio = time.monotonic()
+    try:
+        for n in range(tentativas):
+            try:
+                resultado = chamada()
+            except APIError as e:
+                if n > 0 and e.code == _SQL_DUPLICADO and conferir is not None and conferir():
+                    dj.sucesso()
+                    return None
+                if not _transitorio(e):
+                    dj.sucesso()   # o banco respondeu; o erro é da requisição
+                    raise
+                erro = e
+            except httpx.TransportError as e:
+                erro = e
+            else:
+                dj.sucesso()
+                return resultado
+
+            espera = random.uniform(0, min(ESPERA_TETO, ESPERA_BASE * 2 ** n))
+            if n + 1 >= tentativas or time.monotonic() - inicio + espera >= ORCAMENTO_S:
+                break
+            time.sleep(espera)
+
+        dj.falha()
+        raise SupabaseIndisponivel(f"'{tabela}' não respondeu após {n + 1} tentativa(s): {erro}") from erro
+    finally:
+        if permissao == "teste":
+            dj.liberar()   # exceção inesperada no teste não pode deixar a tabela travada
+
+
+# ------------------------------------------------------------------ último snapshot bom
+# um só snapshot por tabela (o da última projeção lida com sucesso): limita a
+# memória extra a uma cópia de cada tabela, além do que já está no st.cache_data
+_snapshots: dict[str, tuple[tuple, float, object]] = {}
+_snapshots_lock = threading.Lock()
+
+
+def ler_com_fallback(chave: tuple, ler):
+    """
+    Stale-while-revalidate para leituras de tabela inteira (`chave[0]` = tabela):
+    - sucesso → guarda o resultado como último snapshot bom da tabela
+    - SupabaseIndisponivel → devolve uma cópia do snapshot da mesma `chave`,
+      marcada em `df.attrs["desatualizado_desde"]` (epoch), e abre o disjuntor
+      da tabela: os próximos reruns vão direto ao snapshot, sem esperar timeouts.
+      Sem snapshot, propaga o erro.
+    Quem recebe um snapshot não deve cachear o resultado: o próximo rerun revalida.
+    """
+    tabela = chave[0]
+    try:
+        df = ler()
+    except SupabaseIndisponivel:
+        with _snapshots_lock:
+            guardado = _snapshots.get(tabela)
+        if guardado is None or guardado[0] != chave:
+            raise
+        disjuntor(tabela).abrir()
+        _, quando, df_bom = guardado
+        df = df_bom.copy()
+        df.attrs["desatualizado_desde"] = quando
+        return df
+    with _snapshots_lock:
+        _snapshots[tabela] = (chave, time.time(), df)
+    return df
+
+
+def desatualizado_desde(df) -> float | None:
+    return getattr(df, "attrs", {}).get("desatualizado_desde")
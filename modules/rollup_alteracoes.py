@@ -0,0 +1,370 @@
+# modules/rollup_alteracoes.py
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date
+
+import pandas as pd
+
+from config import supabase
+from modules.db import expr_select
+from modules.resiliencia import SupabaseIndisponivel, executar
+from modules.tracing import medir
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_DB = os.environ.get("SMARTC_ROLLUP_DB", ".smartc_rollup.db")
+
+# intervalo mínimo entre duas sincronizações com o Supabase (por processo)
+INTERVALO_SYNC_S = 30.0
+
+# IDs abaixo do maior já visto que ainda são relidos a cada sincronização: o ID sai
+# da sequência no INSERT, mas a linha só aparece no COMMIT — transações concorrentes
+# podem ficar visíveis fora de ordem, abaixo do maior ID local
+JANELA_IDS = int(os.environ.get("SMARTC_ROLLUP_JANELA_IDS", "200"))
+
+ORDEM_STATUS = ["Aprovado", "Pendente", "Recusado", "Não necessário"]
+
+# colunas de `alteracoes` que entram em LinhaAlteracao (percentuais e comentário ficam de fora)
+COLS_ROLLUP = [
+    "ID", "TIMESTAMP", "FILIAL", "ASSESSOR", "PRODUTO", "TIPO", "USUARIO",
+    "VALIDACAO NECESSARIA", "ALTERACAO APROVADA",
+]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS linhas (
+    id       INTEGER PRIMARY KEY,
+    dia      TEXT NOT NULL,
+    filial   TEXT NOT NULL,
+    assessor TEXT NOT NULL,
+    produto  TEXT NOT NULL,
+    tipo     TEXT NOT NULL,
+    status   TEXT NOT NULL,
+    usuario  TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_linhas_status ON linhas (status);
+CREATE INDEX IF NOT EXISTS ix_linhas_dia    ON linhas (dia);
+
+CREATE TABLE IF NOT EXISTS rollup_diario (
+    dia     TEXT    NOT NULL,
+    filial  TEXT    NOT NULL,
+    produto TEXT    NOT NULL,
+    tipo    TEXT    NOT NULL,
+    status  TEXT    NOT NULL,
+    usuario TEXT    NOT NULL,
+    qtd     INTEGER NOT NULL,
+    PRIMARY KEY (dia, filial, produto, tipo, status, usuario)
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    chave TEXT PRIMARY KEY,
+    valor TEXT NOT NULL
+);
+"""
+
+def status_aprovacao(valnec, aprov, tipo, seg) -> str:
+    """Status de aprovação de uma linha de `alteracoes` (mesma regra do Dashboard Admin)."""
+    valnec = str(valnec or "").upper().strip()
+    aprov  = str(aprov or "").upper().strip()
+    tipo   = str(tipo or "").upper().strip()
+    seg    = str(seg or "").upper().strip()
+
+    if valnec == "SIM":
+        return "Pendente"
+    if valnec == "NAO" and aprov == "SIM":
+        return "Aprovado"
+    if valnec == "NAO" and aprov == "NAO":
+        if tipo == "REDUCAO":
+            return "Recusado"
+        if tipo == "AUMENTO" and seg == "B2C":
+            return "Recusado"
+    return "Não necessário"
+
+
+def _txt(valor) -> str:
+    if valor is None or (isinstance(valor, float) and pd.isna(valor)):
+        return ""
+    return str(valor).strip()
+
+
+def _dia(timestamp) -> str:
+    ts = pd.to_datetime(timestamp, errors="coerce", utc=True)
+    return "" if pd.isna(ts) else ts.tz_localize(None).strftime("%Y-%m-%d")
+
+
+def hash_segmentos(seg_por_filial: dict) -> str:
+    """Impressão digital do mapa filial → segmento usado para calcular os status."""
+    itens = sorted((str(k).upper().strip(), str(v).upper().strip()) for k, v in seg_por_filial.items())
+    return hashlib.sha1(json.dumps(itens).encode("utf-8")).hexdigest()
+
+
+@dataclass(frozen=True)
+class LinhaAlteracao:
+    """Forma reduzida de uma linha de `alteracoes`: só o que os agregados usam."""
+    id:       int
+    dia:      str
+    filial:   str
+    assessor: str
+    produto:  str
+    tipo:     str
+    status:   str
+    usuario:  str
+
+    @classmethod
+    def de_registro(cls, rec: dict, seg_por_filial: dict) -> "LinhaAlteracao":
+        filial = _txt(rec.get("FILIAL"))
+        return cls(
+            id=int(rec["ID"]),
+            dia=_dia(rec.get("TIMESTAMP")),
+            filial=filial,
+            assessor=_txt(rec.get("ASSESSOR")),
+            produto=_txt(rec.get("PRODUTO")),
+            tipo=_txt(rec.get("TIPO")),
+            status=status_aprovacao(
+                rec.get("VALIDACAO NECESSARIA"), rec.get("ALTERACAO APROVADA"),
+                rec.get("TIPO"), seg_por_filial.get(filial.upper(), "")
+            ),
+            usuario=_txt(rec.get("USUARIO")),
+        )
+
+    def chave_rollup(self) -> tuple:
+        return (self.dia, self.filial, self.produto, self.tipo, self.status, self.usuario)
+
+
+class RollupAlteracoes:
+    """
+    Cubo diário de `alteracoes` em SQLite local, chave (dia, filial, produto, tipo, status, usuario).
+    - `sincronizar` busca só as linhas novas (ID > maior ID local − JANELA_IDS, para
+      pegar commits fora de ordem) e relê as pendentes, que são as únicas cujo status
+      ainda muda (aprovação/recusa do diretor)
+    - o status de recusa depende do segmento da filial: o cubo guarda o hash do mapa
+      de segmentos com que foi calculado e, se ele mudar, relê tudo e recalcula
+    - mudanças viram deltas (-1 na chave antiga, +1 na nova), sem recalcular o cubo
+    - o Dashboard soma linhas do cubo no período em vez de reler o log inteiro
+    Guarda também um espelho reduzido por ID (`linhas`), necessário para aplicar os deltas.
+    """
+
+    def __init__(self, caminho_db: str = ROLLUP_DB, intervalo_sync_s: float = INTERVALO_SYNC_S):
+        self.caminho_db       = caminho_db
+        self.intervalo_sync_s = intervalo_sync_s
+        self._lock            = threading.Lock()
+        self._ultimo_sync     = 0.0
+        self._ouvintes: list  = []   # recebem os deltas de cada sincronização
+        self.versao           = 0    # muda a cada alteração do cubo (chave de cache das telas)
+
+        self._conn = sqlite3.connect(caminho_db, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    # ------------------------------------------------------------------ leitura do Supabase
+    @staticmethod
+    def _buscar_novos(maior_id: int, chunk_size: int = 1000) -> list[dict]:
+        todos: list[dict] = []
+        start = 0
+        with medir("alteracoes", "select_rollup") as m:
+            while True:
+                resp = executar("alteracoes", lambda: (
+                    supabase.table("alteracoes")
+                    .select(expr_select(COLS_ROLLUP))
+                    .gt("ID", maior_id)
+                    .order("ID")
+                    .range(start, start + chunk_size - 1)
+                    .execute()
+                ))
+                m.resposta(resp)
+                data = resp.data or []
+                todos.extend(data)
+                if len(data) < chunk_size:
+                    return todos
+                start += chunk_size
+
+    @staticmethod
+    def _buscar_por_ids(ids: list[int], chunk_size: int = 200) -> list[dict]:
+        todos: list[dict] = []
+        if not ids:
+            return todos
+        with medir("alteracoes", "select_rollup_ids") as m:
+            for i in range(0, len(ids), chunk_size):
+                resp = executar("alteracoes", lambda: (
+                    supabase.table("alteracoes")
+                    .select(expr_select(COLS_ROLLUP))
+                    .in_("ID", ids[i:i + chunk_size])
+                    .execute()
+                ))
+                m.resposta(resp)
+                todos.extend(resp.data or [])
+        return todos
+
+    # ------------------------------------------------------------------ escrita local
+    def _linha_local(self, row_id: int) -> LinhaAlteracao | None:
+        row = self._conn.execute(
+            "SELECT id, dia, filial, assessor, produto, tipo, status, usuario FROM linhas WHERE id = ?",
+            (row_id,)
+        ).fetchone()
+        return LinhaAlteracao(*row) if row else None
+
+    def _somar(self, linha: LinhaAlteracao, qtd: int) -> None:
+        self._conn.execute(
+            "INSERT INTO rollup_diario (dia, filial, produto, tipo, status, usuario, qtd) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (dia, filial, produto, tipo, status, usuario) DO UPDATE SET qtd = qtd + excluded.qtd",
+            (*linha.chave_rollup(), qtd)
+        )
+
+    def _aplicar(self, novas: list[LinhaAlteracao], removidas: list[int]) -> list[tuple]:
+        """Aplica as mudanças numa transação; retorna os deltas (antiga, nova) efetivos."""
+        deltas: list[tuple] = []
+        self._conn.execute("BEGIN")
+        try:
+            for nova in novas:
+                antiga = self._linha_local(nova.id)
+                if antiga == nova:
+                    continue
+                if antiga is not None:
+                    self._somar(antiga, -1)
+                self._somar(nova, +1)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO linhas (id, dia, filial, assessor, produto, tipo, status, usuario) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (nova.id, nova.dia, nova.filial, nova.assessor, nova.produto,
+                     nova.tipo, nova.status, nova.usuario)
+                )
+                deltas.append((antiga, nova))
+            for row_id in removidas:
+                antiga = self._linha_local(row_id)
+                if antiga is None:
+                    continue
+                self._somar(antiga, -1)
+                self._conn.execute("DELETE FROM linhas WHERE id = ?", (row_id,))
+                deltas.append((antiga, None))
+            self._conn.execute("DELETE FROM rollup_diario WHERE qtd <= 0")
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        return deltas
+
+    def _meta(self, chave: str) -> str | None:
+        row = self._conn.execute("SELECT valor FROM meta WHERE chave = ?", (chave,)).fetchone()
+        return row[0] if row else None
+
+    def _gravar_meta(self, chave: str, valor: str) -> None:
+        self._conn.execute(
+            "INSERT INTO meta (chave, valor) VALUES (?, ?) "
+            "ON CONFLICT (chave) DO UPDATE SET valor = excluded.valor",
+            (chave, valor)
+        )
+
+    def sincronizar(self, seg_por_filial: dict | None = None, forcar: bool = False) -> list[tuple]:
+        """
+        Traz para o cubo o que mudou no Supabase desde a última sincronização.
+        Respeita `intervalo_sync_s` (a não ser com `forcar=True` ou mapa de segmentos novo).
+        Com o Supabase fora do ar, não altera nada e devolve []: as telas seguem com o cubo local.
+        """
+        seg_por_filial = seg_por_filial or {}
+        hash_seg = hash_segmentos(seg_por_filial)
+        with self._lock:
+            seg_mudou = self._meta("hash_segmentos") != hash_seg
+            if not forcar and not seg_mudou and time.monotonic() - self._ultimo_sync < self.intervalo_sync_s:
+                return []
+
+            maior_id = self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM linhas").fetchone()[0]
+            if seg_mudou:
+                # status antigos foram calculados com outro segmento: relê tudo
+                desde = 0
+                conferir = [r[0] for r in self._conn.execute("SELECT id FROM linhas")]
+                pendentes = []
+            else:
+                desde = max(0, maior_id - JANELA_IDS)
+                conferir = [r[0] for r in self._conn.execute("SELECT id FROM linhas WHERE id > ?", (desde,))]
+                pendentes = [
+                    r[0] for r in self._conn.execute(
+                        "SELECT id FROM linhas WHERE status = 'Pendente' AND id <= ?", (desde,)
+                    )
+                ]
+
+            try:
+                registros = self._buscar_novos(desde) + self._buscar_por_ids(pendentes)
+            except SupabaseIndisponivel as e:
+                logger.warning("Rollup de alterações não sincronizado (usando o cubo local): %s", e)
+                return []
+            novas = [LinhaAlteracao.de_registro(rec, seg_por_filial) for rec in registros]
+            vistos = {linha.id for linha in novas}
+            removidas = [row_id for row_id in (*conferir, *pendentes) if row_id not in vistos]
+
+            deltas = self._aplicar(novas, removidas)
+            self._gravar_meta("hash_segmentos", hash_seg)
+            self._ultimo_sync = time.monotonic()
+            if deltas:
+                self.versao += 1
+                for ouvinte in self._ouvintes:
+                    ouvinte(deltas)
+        if deltas:
+            logger.info("Rollup de alterações: %s linha(s) nova(s)/alterada(s)", len(deltas))
+        return deltas
+
+    def inscrever(self, ouvinte) -> None:
+        """
+        Registra `ouvinte(deltas)` para as próximas sincronizações, depois de entregar
+        o estado atual como deltas (None, linha). Tudo sob o lock: nada se perde no meio.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, dia, filial, assessor, produto, tipo, status, usuario FROM linhas"
+            ).fetchall()
+            ouvinte([(None, LinhaAlteracao(*r)) for r in rows])
+            self._ouvintes.append(ouvinte)
+
+    def reconstruir(self, seg_por_filial: dict | None = None) -> None:
+        """Descarta o cubo local e recarrega tudo (mudança de segmento já é tratada em `sincronizar`)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, dia, filial, assessor, produto, tipo, status, usuario FROM linhas"
+            ).fetchall()
+            self._conn.execute("DELETE FROM rollup_diario")
+            self._conn.execute("DELETE FROM linhas")
+            self._conn.execute("DELETE FROM meta")
+            self.versao += 1
+            if rows:
+                for ouvinte in self._ouvintes:
+                    ouvinte([(LinhaAlteracao(*r), None) for r in rows])
+        self.sincronizar(seg_por_filial, forcar=True)
+
+    # ------------------------------------------------------------------ consultas
+    def intervalo(self) -> tuple[pd.Timestamp | None, pd.Timestamp | None]:
+        with self._lock:
+            mn, mx = self._conn.execute(
+                "SELECT MIN(dia), MAX(dia) FROM rollup_diario WHERE dia <> ''"
+            ).fetchone()
+        return (pd.to_datetime(mn) if mn else None, pd.to_datetime(mx) if mx else None)
+
+    def consultar(self, inicio: date, fim: date) -> pd.DataFrame:
+        """Linhas do cubo no período: TS (dia), FILIAL, PRODUTO, TIPO, STATUS, USUARIO, QTD."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT dia, filial, produto, tipo, status, usuario, qtd FROM rollup_diario "
+                "WHERE dia BETWEEN ? AND ?",
+                (inicio.isoformat(), fim.isoformat())
+            ).fetchall()
+        df = pd.DataFrame(rows, columns=["TS", "FILIAL", "PRODUTO", "TIPO", "STATUS", "USUARIO", "QTD"])
+        df["TS"] = pd.to_datetime(df["TS"])
+        return df
+
+
+_rollup: RollupAlteracoes | None = None
+_rollup_lock = threading.Lock()
+
+
+def get_rollup_alteracoes() -> RollupAlteracoes:
+    """Cubo compartilhado pelo processo (todas as sessões do Streamlit)."""
+    global _rollup
+    if _rollup is None:
+        with _rollup_lock:
+            if _rollup is None:
+                _rollup = RollupAlteracoes()
+    return _rollup
@@ -0,0 +1,65 @@
+# modules/secoes.py
+from collections import OrderedDict
+
+import pandas as pd
+import streamlit as st
+
+from modules.esquema import ATTR_VERSAO
+from modules.perfil import medir
+
+# quantas combinações de entradas cada seção guarda por sessão (ex.: período atual e o anterior)
+MAX_ENTRADAS_POR_SECAO = 3
+
+
+def assinatura_df(df: pd.DataFrame, colunas: list[str] | None = None) -> int:
+    """
+    Impressão digital do conteúdo de um DataFrame, usada como entrada das seções:
+    se os dados mudarem, a assinatura muda.
+    - DataFrame de uma carga do banco (attrs[ATTR_VERSAO], ver `marcar_versao`):
+      versão da carga + índice (distingue recortes por filial/filtro) — não relê
+      as colunas a cada rerun
+    - sem versão: hash vetorizado das colunas
+    """
+    if df is None or df.empty:
+        return 0
+    cols = [c for c in colunas if c in df.columns] if colunas is not None else list(df.columns)
+    versao = df.attrs.get(ATTR_VERSAO)
+    if versao is not None:
+        idx = int(pd.util.hash_pandas_object(df.index).sum())
+        return hash((versao, tuple(cols), idx, len(df)))
+    return int(pd.util.hash_pandas_object(df[cols], index=False).sum()) ^ len(df)
+
+
+def memo(nome: str, calcular, *entradas):
+    """
+    Resultado de `calcular()` guardado na sessão e indexado pelas `entradas`
+    (filial, período, filtros, assinatura dos dados...). Trocar um filtro só
+    recalcula as seções que recebem esse filtro como entrada.
+    """
+    cache = st.session_state.setdefault("_secoes_memo", {})
+    por_secao: OrderedDict = cache.setdefault(nome, OrderedDict())
+    if entradas in por_secao:
+        por_secao.move_to_end(entradas)
+        return por_secao[entradas]
+
+    valor = calcular()
+    por_secao[entradas] = valor
+    while len(por_secao) > MAX_ENTRADAS_POR_SECAO:
+        por_secao.popitem(last=False)
+    return valor
+
+
+def secao(titulo: str, chave: str, render, aberta: bool = True, divisor: bool = True) -> None:
+    """
+    Bloco de página renderizado sob demanda:
+    - um toggle com o título; fechada, a seção não calcula nem desenha nada
+    - aberta, `render()` roda dentro de um st.fragment (widgets internos só
+      reexecutam a própria seção)
+    O estado aberto/fechado fica na sessão (`secao_<chave>`).
+    """
+    if divisor:
+        st.markdown("---")
+    if not st.toggle(f"**{titulo}**", value=aberta, key=f"secao_{chave}"):
+        return
+    with medir(f"seção {chave}"):
+        st.fragment(render)()
@@ -0,0 +1,109 @@
+# modules/supabase_http.py
+import importlib.util
+import os
+import threading
+import time
+
+import httpx
+
+# pool compartilhado por todas as sessões/threads do processo
+MAX_CONEXOES   = int(os.environ.get("SMARTC_HTTP_MAX_CONEXOES", "20"))
+MAX_KEEPALIVE  = int(os.environ.get("SMARTC_HTTP_MAX_KEEPALIVE", "10"))
+KEEPALIVE_S    = float(os.environ.get("SMARTC_HTTP_KEEPALIVE_S", "30"))
+TENTATIVAS     = int(os.environ.get("SMARTC_HTTP_TENTATIVAS", "3"))
+
+# HTTP/2 só se pedido e se o pacote `h2` estiver instalado (httpx[http2])
+HTTP2 = (
+    os.environ.get("SMARTC_HTTP2", "1").strip().lower() in ("1", "true", "sim")
+    and importlib.util.find_spec("h2") is not None
+)
+
+LIMITES = httpx.Limits(
+    max_connections=MAX_CONEXOES,
+    max_keepalive_connections=MAX_KEEPALIVE,
+    keepalive_expiry=KEEPALIVE_S,
+)
+# leitura curta: com o banco travado, melhor cair rápido no snapshot (resiliencia.py)
+# do que prender a página; o orçamento total da chamada fica em SMARTC_RETRY_ORCAMENTO_S
+LEITURA_S = float(os.environ.get("SMARTC_HTTP_LEITURA_S", "8"))
+TIMEOUTS  = httpx.Timeout(connect=3.0, read=LEITURA_S, write=10.0, pool=5.0)
+
+# repetir estes é seguro: o PostgREST não duplica nada se a 1ª tentativa tiver chegado
+METODOS_IDEMPOTENTES = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+# conexão caiu/foi fechada pelo servidor (keep-alive vencido, GOAWAY do HTTP/2, reset)
+ERROS_CONEXAO = (httpx.RemoteProtocolError, httpx.ConnectError, httpx.ReadError, httpx.WriteError)
+
+
+class TransporteComReconexao(httpx.BaseTransport):
+    """
+    Transporte httpx que sobrevive a conexões derrubadas:
+    - repete a requisição (métodos idempotentes) após erro de protocolo/conexão
+    - a partir da 2ª falha seguida, descarta o pool inteiro e abre conexões novas
+    Assim o `RemoteProtocolError` não chega ao app na imensa maioria dos casos.
+    """
+
+    def __init__(self, tentativas: int = TENTATIVAS, http2: bool = HTTP2, limites: httpx.Limits = LIMITES):
+        self.tentativas = max(1, tentativas)
+        self._http2 = http2
+        self._limites = limites
+        self._lock = threading.Lock()
+        self._interno = self._novo_pool()
+        self.reconexoes = 0
+        self.repeticoes = 0
+
+    def _novo_pool(self) -> httpx.HTTPTransport:
+        # retries=1: o httpcore já repete falhas de *connect* uma vez por conta própria
+        return httpx.HTTPTransport(http2=self._http2, limits=self._limites, retries=1)
+
+    def _recriar(self, antigo: httpx.HTTPTransport) -> None:
+        with self._lock:
+            if self._interno is not antigo:
+                return  # outra thread já reconectou
+            self._interno = self._novo_pool()
+            self.reconexoes += 1
+        try:
+            antigo.close()
+        except Exception:
+            pass
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        repetivel = request.method in METODOS_IDEMPOTENTES
+        for tentativa in range(1, self.tentativas + 1):
+            pool = self._interno
+            try:
+                return pool.handle_request(request)
+            except ERROS_CONEXAO:
+                if not repetivel or tentativa == self.tentativas:
+                    raise
+                self.repeticoes += 1
+                if tentativa >= 2:
+                    self._recriar(pool)
+                time.sleep(0.05 * tentativa)
+
+    def close(self) -> None:
+        self._interno.close()
+
+
+def criar_cliente_supabase(url: str, key: str):
+    """
+    Cliente Supabase com o PostgREST (todas as leituras/gravações do app) num
+    httpx.Client ajustado: pool limitado, keep-alive, HTTP/2 e reconexão.
+    """
+    from supabase import create_client
+
+    cliente = create_client(url, key)
+    # troca a sessão do postgrest mantendo base_url e headers (apikey/Authorization);
+    # funciona em todas as versões do postgrest-py, que usam sempre `.session`
+    rest = cliente.postgrest
+    antiga = rest.session
+    rest.session = httpx.Client(
+        base_url=antiga.base_url,
+        headers=antiga.headers,
+        timeout=TIMEOUTS,
+        transport=TransporteComReconexao(),
+        follow_redirects=True,
+    )
+    antiga.close()
+    return cliente
+
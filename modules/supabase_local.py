@@ -0,0 +1,404 @@
+# modules/supabase_local.py
+import copy
+import json
+import random
+import sys
+import threading
+import time
+import types
+from collections import Counter
+from datetime import datetime, timedelta
+
+from postgrest import APIError
+
+
+class _Resposta:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+def _igual(a, b) -> bool:
+    return a == b or (a is not None and b is not None and str(a) == str(b))
+
+
+def _comparar(a, b, op) -> bool:
+    if a is None or b is None:
+        return False
+    try:
+        return op(a, b)
+    except TypeError:
+        return op(str(a), str(b))
+
+
+def _colunas_select(expr: str) -> list[str] | None:
+    """'*' → None; 'A,"B C",D' → ['A', 'B C', 'D'] (aceita nomes com e sem aspas)."""
+    expr = (expr or "*").strip()
+    if expr == "*":
+        return None
+    return [c.strip().strip('"') for c in expr.split(",") if c.strip()]
+
+
+class _Consulta:
+    """Construtor de consulta com a mesma API encadeada do postgrest-py (subconjunto usado no app)."""
+
+    def __init__(self, cliente: "ClienteLocal", tabela: str):
+        self._cliente  = cliente
+        self._tabela   = tabela
+        self._acao     = "select"
+        self._colunas  = None
+        self._filtros  = []
+        self._ordem    = []
+        self._inicio   = 0
+        self._limite   = None
+        self._single   = False
+        self._count    = None
+        self._payload  = None
+        self._conflito = "ID"
+
+    # ------------------------------------------------------------------ ações
+    def select(self, colunas: str = "*", count: str | None = None):
+        self._acao, self._colunas, self._count = "select", _colunas_select(colunas), count
+        return self
+
+    def insert(self, registros):
+        self._acao, self._payload = "insert", registros
+        return self
+
+    def upsert(self, registros, on_conflict: str = "ID"):
+        self._acao, self._payload, self._conflito = "upsert", registros, on_conflict
+        return self
+
+    def update(self, valores: dict):
+        self._acao, self._payload = "update", valores
+        return self
+
+    def delete(self):
+        self._acao = "delete"
+        return self
+
+    # ------------------------------------------------------------------ filtros
+    def _filtro(self, coluna, teste):
+        self._filtros.append((coluna.strip('"'), teste))
+        return self
+
+    def eq(self, coluna, valor):
+        return self._filtro(coluna, lambda v: _igual(v, valor))
+
+    def neq(self, coluna, valor):
+        return self._filtro(coluna, lambda v: not _igual(v, valor))
+
+    def gt(self, coluna, valor):
+        return self._filtro(coluna, lambda v: _comparar(v, valor, lambda a, b: a > b))
+
+    def gte(self, coluna, valor):
+        return self._filtro(coluna, lambda v: _comparar(v, valor, lambda a, b: a >= b))
+
+    def lt(self, coluna, valor):
+        return self._filtro(coluna, lambda v: _comparar(v, valor, lambda a, b: a < b))
+
+    def lte(self, coluna, valor):
+        return self._filtro(coluna, lambda v: _comparar(v, valor, lambda a, b: a <= b))
+
+    def in_(self, coluna, valores):
+        valores = list(valores)
+        return self._filtro(coluna, lambda v: any(_igual(v, x) for x in valores))
+
+    def is_(self, coluna, valor):
+        alvo = None if valor in (None, "null") else valor
+        return self._filtro(coluna, lambda v: v is alvo or _igual(v, alvo))
+
+    # ------------------------------------------------------------------ modificadores
+    def order(self, coluna, desc: bool = False):
+        self._ordem.append((coluna.strip('"'), desc))
+        return self
+
+    def limit(self, n: int):
+        self._limite = n
+        return self
+
+    def range(self, inicio: int, fim: int):
+        self._inicio, self._limite = inicio, fim - inicio + 1
+        return self
+
+    def single(self):
+        self._single = True
+        return self
+
+    def execute(self) -> _Resposta:
+        return self._cliente._executar(self)
+
+
+class ClienteLocal:
+    """
+    Substituto em memória do cliente Supabase/PostgREST, para benchmarks e testes offline.
+    - mesma API encadeada (`table().select().eq()...execute()`), respostas com `.data`
+    - cada `execute()` é uma requisição: soma `latencia_ms` e serializa o payload em JSON,
+      como o cliente real faria
+    - `estatisticas` conta requisições (total e por tabela), linhas lidas/gravadas
+      e o tempo gasto nas requisições (`tempo_s`)
+    """
+
+    def __init__(self, latencia_ms: float = 0.0):
+        self.latencia_ms = latencia_ms
+        self.tabelas: dict[str, list[dict]] = {}
+        self.estatisticas: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def table(self, nome: str) -> _Consulta:
+        return _Consulta(self, nome)
+
+    def carregar(self, tabela: str, registros: list[dict]) -> None:
+        with self._lock:
+            self.tabelas[tabela] = [dict(r) for r in registros]
+
+    def zerar_estatisticas(self) -> None:
+        with self._lock:
+            self.estatisticas = Counter()
+
+    # ------------------------------------------------------------------ execução
+    @staticmethod
+    def _transportar(dados):
+        """Ida e volta em JSON: custo de serialização e cópia independente do armazenado."""
+        return json.loads(json.dumps(dados, default=str))
+
+    def _executar(self, q: _Consulta) -> _Resposta:
+        t0 = time.perf_counter()
+        try:
+            return self._executar_sem_medir(q)
+        finally:
+            with self._lock:
+                self.estatisticas["tempo_s"] += time.perf_counter() - t0
+
+    def _executar_sem_medir(self, q: _Consulta) -> _Resposta:
+        if self.latencia_ms:
+            time.sleep(self.latencia_ms / 1000)
+        with self._lock:
+            self.estatisticas["requisicoes"] += 1
+            self.estatisticas[f"requisicoes:{q._tabela}"] += 1
+            linhas = self.tabelas.setdefault(q._tabela, [])
+            alvo = [r for r in linhas if all(teste(r.get(col)) for col, teste in q._filtros)]
+
+            if q._acao == "select":
+                for col, desc in reversed(q._ordem):
+                    alvo.sort(key=lambda r: (r.get(col) is None, r.get(col) if r.get(col) is not None else 0),
+                              reverse=desc)
+                total = len(alvo)
+                fim = None if q._limite is None else q._inicio + q._limite
+                alvo = alvo[q._inicio:fim]
+                if q._colunas is not None:
+                    alvo = [{c: r.get(c) for c in q._colunas} for r in alvo]
+                if q._single:
+                    if len(alvo) != 1:
+                        raise APIError({"message": "JSON object requested, multiple (or no) rows returned",
+                                        "code": "PGRST116"})
+                    alvo = alvo[0]
+                dados = self._transportar(alvo)
+                self.estatisticas["linhas_lidas"] += 1 if q._single else len(dados)
+                return _Resposta(dados, total if q._count else None)
+
+            if q._acao in ("insert", "upsert"):
+                novos = self._transportar(q._payload if isinstance(q._payload, list) else [q._payload])
+                if q._acao == "upsert":
+                    por_chave = {r.get(q._conflito): r for r in linhas}
+                    for rec in novos:
+                        if rec.get(q._conflito) in por_chave:
+                            por_chave[rec[q._conflito]].update(rec)
+                        else:
+                            linhas.append(rec)
+                else:
+                    linhas.extend(novos)
+                self.estatisticas["linhas_gravadas"] += len(novos)
+                return _Resposta(novos)
+
+            if q._acao == "update":
+                valores = self._transportar(q._payload)
+                for r in alvo:
+                    r.update(valores)
+                self.estatisticas["linhas_gravadas"] += len(alvo)
+                return _Resposta(copy.deepcopy(alvo))
+
+            ids = {id(r) for r in alvo}
+            self.tabelas[q._tabela] = [r for r in linhas if id(r) not in ids]
+            self.estatisticas["linhas_gravadas"] += len(alvo)
+            return _Resposta(alvo)
+
+
+# ------------------------------------------------------------------ dados sintéticos
+# tamanho de cada tabela na escala 1× (aprox. o volume atual de produção)
+TAMANHOS_BASE = {
+    "filial":             60,
+    "assessores":         1200,
+    "alteracoes":         6000,
+    "acessos":            20000,
+    "sugestoes":          40,
+    "votos":              300,
+    "comissoes_origem":   30000,
+    "comissoes_ajuste":   3000,
+    "recebiveis_futuros": 5000,
+}
+
+# colunas de percentual da tabela assessores
+PRODUTOS = ["XP", "MESA", "MESA PRÓPRIA", "BULL COTIZADOR", "GLOBAL", "CÂMBIO", "CORRETORA",
+            "XP SEGUROS", "XP BANCOS", "ASSET", "CRÉDITO", "JURIDICO", "IMÓVEIS", "OUTROS"]
+
+_NOMES = ["ANA", "BRUNO", "CARLA", "DIEGO", "ELISA", "FABIO", "GABRIELA", "HUGO", "ISABEL", "JOAO",
+          "KARINA", "LUCAS", "MARIANA", "NICOLAS", "OLIVIA", "PAULO", "RAFAELA", "SERGIO", "TATIANA", "VITOR"]
+_SOBRENOMES = ["SILVA", "SOUZA", "COSTA", "SANTOS", "OLIVEIRA", "PEREIRA", "LIMA", "CARVALHO", "RIBEIRO", "ALVES"]
+
+
+def _nome(rnd: random.Random, i: int) -> str:
+    return f"{rnd.choice(_NOMES)} {rnd.choice(_SOBRENOMES)} {i}"
+
+
+def _cpf(rnd: random.Random) -> str:
+    return "".join(str(rnd.randrange(10)) for _ in range(11))
+
+
+def gerar_dados(escala: float = 1, seed: int = 42, hoje: datetime | None = None) -> dict[str, list[dict]]:
+    """
+    Tabelas sintéticas com o mesmo esquema do Supabase, em `escala` × TAMANHOS_BASE.
+    Determinístico para a mesma seed (relatórios comparáveis entre execuções).
+    """
+    rnd  = random.Random(seed)
+    hoje = hoje or datetime.now().replace(microsecond=0)
+    n    = {t: max(1, int(qtd * escala)) for t, qtd in TAMANHOS_BASE.items()}
+
+    def momento(dias: int = 365) -> datetime:
+        return hoje - timedelta(seconds=rnd.randrange(dias * 86400))
+
+    filiais = []
+    for i in range(n["filial"]):
+        filiais.append({
+            "FILIAL":          f"FILIAL {i:03d}",
+            "SEGMENTO":        rnd.choice(["B2B", "B2C"]),
+            "DIRETOR":         f"DIRETOR {i % 8}",
+            "SUPERINTENDENTE": f"SUPERINTENDENTE {i % 5}",
+            "RM":              f"RM {i % 12}",
+            "LIDER":           f"LIDER {i}",
+            "CPF":             _cpf(rnd),
+            "EMAIL":           f"lider{i}@exemplo.com",
+            "LIDER2":          f"LIDER2 {i}" if i % 3 == 0 else None,
+            "CPF_LIDER2":      _cpf(rnd) if i % 3 == 0 else None,
+            "EMAIL_LIDER2":    f"lider2_{i}@exemplo.com" if i % 3 == 0 else None,
+            "EMAIL_DIRETOR":   f"diretor{i % 8}@exemplo.com",
+        })
+
+    produtos = PRODUTOS
+    assessores = []
+    for i in range(n["assessores"]):
+        rec = {
+            "ID":          i + 1,
+            "SIGLA":       f"A{i:05d}",
+            "CPF":         _cpf(rnd),
+            "NOME":        _nome(rnd, i),
+            "EMAIL":       f"assessor{i}@exemplo.com",
+            "FILIAL":      filiais[i % len(filiais)]["FILIAL"],
+            "FUNCAO":      rnd.choice(["ASSESSOR", "BANKER", "ESPECIALISTA"]),
+            "LAST_UPDATE": momento(90).strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        rec.update({p: rnd.choice([0, 25, 30, 35, 40, 45, 50]) for p in produtos})
+        assessores.append(rec)
+
+    alteracoes = []
+    for i in range(n["alteracoes"]):
+        ass = rnd.choice(assessores)
+        antes, depois = rnd.choice([25, 30, 35, 40, 45, 50]), rnd.choice([25, 30, 35, 40, 45, 50])
+        tipo = "REDUCAO" if depois < antes else "AUMENTO"
+        pendente = tipo == "REDUCAO" and rnd.random() < 0.15
+        alteracoes.append({
+            "ID":                   i + 1,
+            "TIMESTAMP":            momento().isoformat() + "+00:00",
+            "USUARIO":              f"LIDER {rnd.randrange(n['filial'])}",
+            "FILIAL":               ass["FILIAL"],
+            "ASSESSOR":             ass["NOME"],
+            "PRODUTO":              rnd.choice(produtos),
+            "PERCENTUAL ANTES":     str(antes),
+            "PERCENTUAL DEPOIS":    str(depois),
+            "VALIDACAO NECESSARIA": "SIM" if pendente else "NAO",
+            "ALTERACAO APROVADA":   "NAO" if pendente else rnd.choice(["SIM", "NAO"]),
+            "TIPO":                 tipo,
+            "COMENTARIO DIRETOR":   None if pendente or rnd.random() < 0.8 else "ok",
+        })
+
+    acessos = [{
+        "TIMESTAMP": momento().strftime("%Y-%m-%d %H:%M:%S"),
+        "USUARIO":   f"LIDER {rnd.randrange(n['filial'])}",
+        "ROLE":      "leader",
+        "NIVEL":     4,
+    } for _ in range(n["acessos"])]
+
+    sugestoes = [{
+        "ID":        i + 1,
+        "SUGESTAO":  f"Sugestão {i + 1}",
+        "AUTOR":     f"LIDER {rnd.randrange(n['filial'])}",
+        "TIMESTAMP": momento(60).strftime("%Y-%m-%d %H:%M:%S"),
+    } for i in range(n["sugestoes"])]
+
+    votos = [{
+        "ID":        rnd.randrange(1, n["sugestoes"] + 1),
+        "USUARIO":   f"LIDER {rnd.randrange(n['filial'])}",
+        "TIMESTAMP": momento(60).strftime("%Y-%m-%d %H:%M:%S"),
+    } for _ in range(n["votos"])]
+
+    def comissoes(qtd: int, id_inicial: int) -> list[dict]:
+        linhas = []
+        for i in range(qtd):
+            ass = rnd.choice(assessores)
+            bruta = round(rnd.uniform(10, 5000), 2)
+            linhas.append({
+                "ID":                   id_inicial + i,
+                "DT_REF":               momento(540).strftime("%Y-%m-01"),
+                "NOME_FILIAL":          ass["FILIAL"],
+                "QUEM_RECEBE":          rnd.choice(["ASSESSOR", "ASSESSOR", "EQUIPE", "EXTERNO", "ESCRITORIO"]),
+                "SIGLA_RECEBEDOR":      ass["SIGLA"],
+                "VLR_COMISSAO_BRUTA":   bruta,
+                "VLR_COMISSAO_LIQUIDA": round(bruta * rnd.uniform(0.3, 0.8), 2),
+            })
+        return linhas
+
+    recebiveis = [{
+        "data_de_credito":    (hoje + timedelta(days=rnd.randrange(1, 180))).strftime("%Y-%m-%d"),
+        "cliente":            f"CLIENTE {rnd.randrange(100000)}",
+        "nome":               rnd.choice(assessores)["NOME"],
+        "duracao_com":        rnd.randrange(1, 60),
+        "comissao_bruto":     round(rnd.uniform(50, 3000), 2),
+        "produto":            rnd.choice(["VIDA", "AUTO", "PREVIDENCIA", "SAUDE"]),
+        "seguradora":         rnd.choice(["SEGURADORA A", "SEGURADORA B", "SEGURADORA C"]),
+        "nome_filial_equipe": rnd.choice(filiais)["FILIAL"],
+    } for _ in range(n["recebiveis_futuros"])]
+
+    return {
+        "filial":             filiais,
+        "assessores":         assessores,
+        "alteracoes":         alteracoes,
+        "acessos":            acessos,
+        "sugestoes":          sugestoes,
+        "votos":              votos,
+        "comissoes_origem":   comissoes(n["comissoes_origem"], 1),
+        "comissoes_ajuste":   comissoes(n["comissoes_ajuste"], n["comissoes_origem"] + 1),
+        "recebiveis_futuros": recebiveis,
+    }
+
+
+def cliente_semeado(escala: float = 1, seed: int = 42, latencia_ms: float = 0.0) -> ClienteLocal:
+    """ClienteLocal já carregado com `gerar_dados(escala, seed)`."""
+    cliente = ClienteLocal(latencia_ms=latencia_ms)
+    for tabela, registros in gerar_dados(escala, seed).items():
+        cliente.carregar(tabela, registros)
+    return cliente
+
+
+def instalar_config_local(cliente: ClienteLocal) -> types.ModuleType:
+    """
+    Registra um módulo `config` com `supabase = cliente` (e credenciais vazias) em
+    sys.modules. Precisa rodar antes de importar app.py/modules.*, que leem o
+    cliente de `config` na importação.
+    """
+    config = types.ModuleType("config")
+    config.supabase = cliente
+    config.get_supabase = lambda: cliente
+    config.SUPABASE_URL = config.SUPABASE_KEY = ""
+    config.TENANT_ID = config.CLIENT_ID = config.CLIENT_SECRET = config.EMAIL_USER = ""
+    sys.modules["config"] = config
+    return config
@@ -0,0 +1,184 @@
+# modules/tracing.py
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, asdict
+
+import pandas as pd
+import streamlit as st
+
+# quantos eventos o buffer circular guarda (os mais antigos são descartados)
+TAMANHO_BUFFER = 5000
+
+_ativo = os.environ.get("SMARTC_TRACE", "").strip().lower() in ("1", "true", "sim")
+_buffer: deque = deque(maxlen=TAMANHO_BUFFER)
+_lock = threading.Lock()
+
+
+@dataclass
+class Evento:
+    """Uma chamada ao Supabase: tabela, operação, volume e latência."""
+    ts:         float
+    tabela:     str
+    operacao:   str
+    linhas:     int = 0
+    bytes:      int = 0
+    paginas:    int = 0   # respostas recebidas (páginas/requisições)
+    latencia_ms: float = 0.0
+    erro:       str | None = None
+
+
+class _Medicao:
+    """Contexto ativo: o chamador preenche linhas/bytes/páginas antes de sair."""
+    __slots__ = ("evento", "_t0")
+
+    def __init__(self, tabela: str, operacao: str):
+        self.evento = Evento(ts=time.time(), tabela=tabela, operacao=operacao)
+
+    def resposta(self, resp) -> None:
+        """Soma uma página/requisição, com as linhas e os bytes (JSON) da resposta do postgrest."""
+        dados = getattr(resp, "data", None) or []
+        self.pagina(len(dados) if isinstance(dados, list) else 1, len(json.dumps(dados, default=str)))
+
+    def pagina(self, linhas: int, n_bytes: int) -> None:
+        """Soma uma página já decodificada fora do postgrest (ex.: CSV)."""
+        self.evento.linhas += linhas
+        self.evento.bytes += n_bytes
+        self.evento.paginas += 1
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, exc, tb):
+        self.evento.latencia_ms = (time.perf_counter() - self._t0) * 1000
+        if exc is not None:
+            self.evento.erro = f"{tipo.__name__}: {exc}"[:300]
+        with _lock:
+            _buffer.append(self.evento)
+        return False
+
+
+class _MedicaoNula:
+    """Tracing desligado: contexto sem custo (mesma interface)."""
+    __slots__ = ()
+
+    def resposta(self, resp) -> None:
+        pass
+
+    def pagina(self, linhas: int, n_bytes: int) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULA = _MedicaoNula()
+
+
+def medir(tabela: str, operacao: str):
+    """
+    Context manager em volta de uma chamada ao Supabase:
+        with medir("alteracoes", "update") as m:
+            resp = supabase.table("alteracoes").update(...).execute()
+            m.resposta(resp)
+    Desligado, devolve sempre o mesmo objeto nulo.
+    """
+    if not _ativo:
+        return _NULA
+    return _Medicao(tabela, operacao)
+
+
+def rastrear(tabela: str, operacao: str):
+    """Decorador: mede a função inteira; linhas = len() do retorno, quando houver."""
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _ativo:
+                return fn(*args, **kwargs)
+            with _Medicao(tabela, operacao) as m:
+                resultado = fn(*args, **kwargs)
+                try:
+                    m.evento.linhas = len(resultado)
+                except TypeError:
+                    pass
+                return resultado
+        return wrapper
+    return deco
+
+
+# ------------------------------------------------------------------ controle / consulta
+def ativo() -> bool:
+    return _ativo
+
+
+def ativar(ligado: bool = True) -> None:
+    """Liga/desliga o tracing para o processo inteiro (todas as sessões)."""
+    global _ativo
+    _ativo = bool(ligado)
+
+
+def limpar() -> None:
+    with _lock:
+        _buffer.clear()
+
+
+def eventos() -> list[Evento]:
+    with _lock:
+        return list(_buffer)
+
+
+def resumo() -> pd.DataFrame:
+    """p50/p95/máx de latência e volume médio por (tabela, operação)."""
+    df = pd.DataFrame([asdict(e) for e in eventos()])
+    if df.empty:
+        return df
+    g = df.groupby(["tabela", "operacao"])
+    out = pd.DataFrame({
+        "chamadas": g.size(),
+        "p50_ms":   g["latencia_ms"].quantile(0.50),
+        "p95_ms":   g["latencia_ms"].quantile(0.95),
+        "max_ms":   g["latencia_ms"].max(),
+        "linhas":   g["linhas"].mean(),
+        "kb":       g["bytes"].mean() / 1024,
+        "paginas":  g["paginas"].mean(),
+        "erros":    g["erro"].count(),
+    }).round(1)
+    return out.sort_values("p95_ms", ascending=False).reset_index()
+
+
+def exportar_jsonl() -> str:
+    """Eventos do buffer em JSON lines (um evento por linha)."""
+    return "\n".join(json.dumps(asdict(e), ensure_ascii=False) for e in eventos())
+
+
+# ------------------------------------------------------------------ painel (Admin)
+def exibir_painel_performance() -> None:
+    """Painel "Performance" da sidebar — só é chamado para nível 1."""
+    with st.expander("Performance", expanded=False):
+        st.toggle(
+            "Medir chamadas ao Supabase", value=ativo(), key="perf_tracing",
+            on_change=lambda: ativar(st.session_state.perf_tracing)
+        )
+
+        df = resumo()
+        if df.empty:
+            st.caption("Nenhuma chamada registrada.")
+            return
+        st.caption(f"{len(eventos())} chamada(s) no buffer (máx. {TAMANHO_BUFFER}).")
+        st.dataframe(df, hide_index=True, use_container_width=True)
+
+        col_a, col_b = st.columns(2)
+        col_a.download_button(
+            "Exportar JSONL", exportar_jsonl(), file_name="smartc_trace.jsonl",
+            mime="application/jsonl", key="perf_exportar"
+        )
+        if col_b.button("Limpar", key="perf_limpar"):
+            limpar()
+            st.rerun()
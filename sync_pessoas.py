@@ -0,0 +1,142 @@
+# sync_pessoas.py
+"""
+Sincroniza `query_pessoas` (SQL Server do RP) → `assessores`.
+
+Exemplos:
+  # mês atual, direto no Supabase
+  python sync_pessoas.py --destino supabase
+
+  # contra bancos locais de teste (SQLite/Postgres), sem gravar
+  python sync_pessoas.py --origem sqlite:///rp_teste.db --destino sqlite:///assessores_teste.db --dry-run
+
+  # relê tudo desde o início do mês, ignorando o checkpoint salvo
+  python sync_pessoas.py --reiniciar
+
+O checkpoint (watermark de dt_atz + hashes por SIGLA) fica em .smartc_etl.db
+(ou em SMARTC_ETL_DB / --estado): execuções seguintes leem só o que mudou
+desde a última e, se uma cair no meio, a próxima retoma do último lote gravado.
+
+Conexão padrão com o SQL Server vem das variáveis de ambiente
+SMARTC_RP_SERVER, SMARTC_RP_DATABASE, SMARTC_RP_USER e SMARTC_RP_PASSWORD.
+
+Dependências (fora do deploy do app): pip install -r requirements-etl.txt,
+mais o driver ODBC do SQL Server (msodbcsql18 + unixODBC) na máquina do ETL.
+"""
+import argparse
+import logging
+import os
+from datetime import date, datetime, timedelta
+from urllib.parse import quote_plus
+
+import sqlalchemy as sa
+
+from modules.etl_estado import EstadoETL, ESTADO_DB
+from modules.etl_pessoas import (
+    SyncPessoas, DestinoSQL, DestinoSupabase, carregar_mapa, preparar_engine,
+    TABELA_ORIGEM, MODOS_CONSULTA,
+)
+
+
+def engine_sql_server() -> sa.Engine:
+    import pyodbc
+
+    drivers = pyodbc.drivers()
+    drv_name = next((d for d in drivers if "ODBC Driver 18 for SQL Server" in d), None) \
+            or next((d for d in drivers if "ODBC Driver 17 for SQL Server" in d), None) \
+            or "SQL Server"
+    drv_name = drv_name if drv_name.startswith("{") else f"{{{drv_name}}}"
+
+    odbc_str = (
+        f"DRIVER={drv_name};"
+        f"SERVER={os.environ['SMARTC_RP_SERVER']};"
+        f"DATABASE={os.environ.get('SMARTC_RP_DATABASE', 'DB_Bank')};"
+        f"UID={os.environ['SMARTC_RP_USER']};"
+        f"PWD={os.environ['SMARTC_RP_PASSWORD']};"
+        "Encrypt=yes;"
+        "TrustServerCertificate=yes;"
+        "Connection Timeout=8;"
+    )
+    return sa.create_engine(f"mssql+pyodbc:///?odbc_connect={quote_plus(odbc_str)}",
+                            pool_pre_ping=True, future=True)
+
+
+def janela_mes_atual() -> tuple[datetime, datetime]:
+    hoje = date.today()
+    ini  = date(hoje.year, hoje.month, 1)
+    # 1º dia do mês seguinte (limite superior exclusivo)
+    prox_mes = (ini.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return datetime.combine(ini, datetime.min.time()), datetime.combine(prox_mes, datetime.min.time())
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Sincroniza query_pessoas → assessores (só deltas).")
+    ap.add_argument("--origem", help="URL SQLAlchemy da origem (padrão: SQL Server via variáveis de ambiente)")
+    ap.add_argument("--destino", default="supabase", help="'supabase' ou URL SQLAlchemy")
+    ap.add_argument("--tabela-destino", default="assessores")
+    ap.add_argument("--inicio", type=datetime.fromisoformat,
+                    help="dt_atz inicial (padrão: watermark salva ou 1º dia do mês)")
+    ap.add_argument("--fim", type=datetime.fromisoformat,
+                    help="dt_atz final, exclusivo (padrão: amanhã com watermark; senão 1º dia do mês seguinte)")
+    ap.add_argument("--estado", default=ESTADO_DB, help="SQLite com watermark/hashes")
+    ap.add_argument("--reiniciar", action="store_true", help="ignora e limpa o checkpoint salvo")
+    ap.add_argument("--chunksize", type=int, default=5000)
+    ap.add_argument("--mapa", help="JSON com o mapa de colunas origem → assessores")
+    ap.add_argument("--modo-consulta", choices=MODOS_CONSULTA, default="legado",
+                    help="'sargavel' filtra pela coluna DT_ATZ persistida/indexada (ver bench_rp_query.py)")
+    ap.add_argument("--dry-run", action="store_true", help="só calcula os deltas, não grava")
+    args = ap.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
+    origem = preparar_engine(sa.create_engine(args.origem, future=True)) if args.origem else engine_sql_server()
+    if args.destino == "supabase":
+        from config import supabase
+        destino = DestinoSupabase(supabase, args.tabela_destino)
+    else:
+        destino = DestinoSQL(sa.create_engine(args.destino, future=True), args.tabela_destino)
+
+    estado = EstadoETL(args.estado)
+    fonte  = f"{TABELA_ORIGEM}->{args.tabela_destino}"
+    if args.reiniciar and not args.dry_run:
+        estado.reiniciar(fonte)
+
+    job = SyncPessoas(origem, destino, carregar_mapa(args.mapa), args.chunksize, args.dry_run,
+                      modo_consulta=args.modo_consulta)
+
+    # janela: da watermark (inclusiva; hashes descartam o que já foi gravado) até agora
+    watermark, _ = (None, None) if args.reiniciar else estado.watermark(fonte)
+    ini_padrao, fim_padrao = janela_mes_atual()
+    if watermark is not None:
+        ini_padrao, fim_padrao = watermark, datetime.now() + timedelta(days=1)
+    inicio = args.inicio or ini_padrao
+    fim    = args.fim or fim_padrao
+
+    # hashes do checkpoint; na 1ª execução, semeia a partir do destino
+    hashes = {} if args.reiniciar else estado.hashes(fonte)
+    if not hashes:
+        hashes = job.hashes_do_destino()
+        if not args.dry_run:
+            estado.checkpoint(fonte, hashes)
+
+    execucao = estado.iniciar_execucao(fonte)
+    try:
+        r = job.executar(
+            inicio, fim, hashes_destino=hashes,
+            ao_gravar_lote=lambda hashes_lote, ultimo: estado.checkpoint(fonte, hashes_lote, ultimo),
+        )
+    except Exception as e:
+        estado.finalizar_execucao(execucao, ok=False, detalhe=str(e))
+        raise
+    estado.finalizar_execucao(
+        execucao, ok=True,
+        detalhe=f"lidas={r.lidas} novas={r.novas} alteradas={r.alteradas} iguais={r.iguais}"
+    )
+
+    print(f"Período: {inicio} a {fim} (exclusivo)")
+    print(f"Linhas lidas: {r.lidas} | novas: {r.novas} | alteradas: {r.alteradas} | sem mudança: {r.iguais}")
+    if args.dry_run:
+        print("(dry-run: nada foi gravado)")
+
+
+if __name__ == "__main__":
+    main()
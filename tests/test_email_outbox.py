@@ -0,0 +1,122 @@
+# tests/test_email_outbox.py
+import time
+
+import pytest
+
+from modules.email_outbox import EmailOutbox
+from modules.mail_transport import ErroEnvioEmail
+
+
+class TransporteFalso:
+    def __init__(self, erros: list[Exception] | None = None):
+        self.erros = list(erros or [])
+        self.enviados: list[tuple] = []
+
+    def enviar(self, destinatarios, assunto, corpo, content_type):
+        if self.erros:
+            raise self.erros.pop(0)
+        self.enviados.append((tuple(destinatarios), assunto))
+
+
+@pytest.fixture
+def caminho(tmp_path):
+    return str(tmp_path / "outbox.db")
+
+
+def _outbox(caminho, transporte, **kw) -> EmailOutbox:
+    kw.setdefault("taxa_por_s", 0)   # sem throttling nos testes
+    kw.setdefault("backoff_base_s", 60.0)
+    return EmailOutbox(caminho, transport_factory=lambda: transporte, **kw)
+
+
+def _linha(ob: EmailOutbox, msg_id: int) -> dict:
+    cur = ob._conn.execute("SELECT * FROM outbox WHERE id = ?", (msg_id,))
+    return dict(zip([c[0] for c in cur.description], cur.fetchone()))
+
+
+def test_reserva_nao_entrega_a_mesma_mensagem_a_dois_processos(caminho):
+    a = _outbox(caminho, TransporteFalso())
+    b = _outbox(caminho, TransporteFalso())
+    msg_id = a.enfileirar(["x@ex.com"], "assunto", "corpo")
+
+    assert [m["id"] for m in a._reservar_lote(10)] == [msg_id]
+    assert b._reservar_lote(10) == []
+    assert _linha(a, msg_id)["dono"] == a.dono
+
+
+def test_envio_marca_enviado(caminho):
+    transporte = TransporteFalso()
+    ob = _outbox(caminho, transporte)
+    msg_id = ob.enfileirar(["x@ex.com", ""], "assunto", "corpo")
+
+    assert ob.processar_pendentes() == 1
+    assert transporte.enviados == [(("x@ex.com",), "assunto")]
+    assert _linha(ob, msg_id)["status"] == "enviado"
+    assert ob.resumo() == {"enviado": 1}
+    ob.parar()
+
+
+def test_falha_transitoria_volta_para_fila_com_backoff(caminho):
+    transporte = TransporteFalso([ErroEnvioEmail("limite", status_code=429, retry_after=120)])
+    ob = _outbox(caminho, transporte)
+    msg_id = ob.enfileirar(["x@ex.com"], "assunto", "corpo")
+
+    antes = time.time()
+    assert ob.processar_pendentes() == 0
+    linha = _linha(ob, msg_id)
+    assert (linha["status"], linha["tentativas"]) == ("pendente", 1)
+    assert linha["proxima_tentativa"] >= antes + 120
+    assert ob.processar_pendentes() == 0   # ainda não venceu
+    assert transporte.enviados == []
+    ob.parar()
+
+
+def test_backoff_exponencial_e_erro_definitivo(caminho):
+    transporte = TransporteFalso([ErroEnvioEmail("falha"), ErroEnvioEmail("inválido", status_code=400)])
+    ob = _outbox(caminho, transporte, backoff_base_s=10.0)
+    msg_id = ob.enfileirar(["x@ex.com"], "assunto", "corpo")
+
+    antes = time.time()
+    ob.processar_pendentes()
+    espera = _linha(ob, msg_id)["proxima_tentativa"] - antes
+    assert 5.0 <= espera <= 15.0 + 1   # base · 2⁰ com jitter de 0,5x a 1,5x
+
+    ob._conn.execute("UPDATE outbox SET proxima_tentativa = 0 WHERE id = ?", (msg_id,))
+    ob.processar_pendentes()
+    linha = _linha(ob, msg_id)
+    assert (linha["status"], linha["tentativas"]) == ("falhou", 2)   # 400 não é repetido
+    ob.parar()
+
+
+def test_recuperacao_so_retoma_reservas_vencidas(caminho):
+    morto = _outbox(caminho, TransporteFalso(), reserva_s=60)
+    msg_id = morto.enfileirar(["x@ex.com"], "assunto", "corpo")
+    morto._reservar_lote(10)   # reservou e "caiu" sem enviar
+
+    transporte = TransporteFalso()
+    novo = _outbox(caminho, transporte)
+    assert _linha(novo, msg_id)["status"] == "enviando"   # abrir a outbox não rouba a reserva
+    assert novo.processar_pendentes() == 0
+
+    novo._conn.execute("UPDATE outbox SET reservado_ate = ? WHERE id = ?", (time.time() - 1, msg_id))
+    assert novo.processar_pendentes() == 1
+    assert transporte.enviados == [(("x@ex.com",), "assunto")]
+
+    # o processo antigo não sobrescreve o resultado de quem assumiu a mensagem
+    morto._marcar_falha({"id": msg_id, "tentativas": 0}, ErroEnvioEmail("tarde demais"))
+    assert _linha(novo, msg_id)["status"] == "enviado"
+    novo.parar()
+
+
+def test_retencao_apaga_so_enviados_antigos(caminho):
+    ob = _outbox(caminho, TransporteFalso(), retencao_s=3600)
+    velho = ob.enfileirar(["x@ex.com"], "velho", "corpo")
+    novo = ob.enfileirar(["x@ex.com"], "novo", "corpo")
+    pendente = ob.enfileirar(["x@ex.com"], "pendente", "corpo")
+    ob._conn.execute("UPDATE outbox SET status = 'enviado', enviado_em = ? WHERE id = ?", (time.time() - 7200, velho))
+    ob._conn.execute("UPDATE outbox SET status = 'enviado', enviado_em = ? WHERE id = ?", (time.time(), novo))
+    ob._conn.execute("UPDATE outbox SET proxima_tentativa = ? WHERE id = ?", (time.time() + 999, pendente))
+
+    assert ob.limpar_enviados() == 1
+    ids = {r[0] for r in ob._conn.execute("SELECT id FROM outbox")}
+    assert ids == {novo, pendente}
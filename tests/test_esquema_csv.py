@@ -0,0 +1,56 @@
+# tests/test_esquema_csv.py
+import json
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from modules.esquema import alinhar_tipos_json, aplicar_esquema, decodificar_csv
+
+REGISTROS = [
+    {"ID": 1, "TIMESTAMP": "2025-07-04T11:28:16+00:00", "USUARIO": "ana", "ASSESSOR": "João, Jr.",
+     "COMENTARIO DIRETOR": "", "SIGLA": "00123", "VALOR": 10.5, "ATIVO": True},
+    {"ID": 2, "TIMESTAMP": "2025-07-05T09:00:00+00:00", "USUARIO": "caio", "ASSESSOR": 'Ele disse "ok"',
+     "COMENTARIO DIRETOR": None, "SIGLA": "A\\B", "VALOR": None, "ATIVO": False},
+    {"ID": 3, "TIMESTAMP": None, "USUARIO": None, "ASSESSOR": "linha\nquebrada",
+     "COMENTARIO DIRETOR": "( ok )", "SIGLA": "", "VALOR": 3, "ATIVO": None},
+]
+
+
+def _campo_postgrest(v) -> str:
+    """Como o PostgREST escreve um valor no CSV (saída de texto de registro do Postgres)."""
+    if v is None:
+        return ""
+    if isinstance(v, bool):
+        return "t" if v else "f"
+    texto = str(v)
+    if texto == "" or any(c in texto for c in ',"\\()\n '):
+        return '"' + texto.replace("\\", "\\\\").replace('"', '""') + '"'
+    return texto
+
+
+def _csv_postgrest(registros: list[dict]) -> bytes:
+    cab = ",".join(registros[0])
+    linhas = [",".join(_campo_postgrest(v) for v in r.values()) for r in registros]
+    return ("\n".join([cab, *linhas])).encode("utf-8")
+
+
+def test_csv_distingue_null_de_texto_vazio():
+    df = decodificar_csv(_csv_postgrest(REGISTROS))
+
+    assert df.loc[0, "COMENTARIO DIRETOR"] == ""
+    assert pd.isna(df.loc[1, "COMENTARIO DIRETOR"])
+    assert df.loc[2, "SIGLA"] == ""
+    assert df["ASSESSOR"].tolist() == ["João, Jr.", 'Ele disse "ok"', "linha\nquebrada"]
+    assert df.loc[1, "SIGLA"] == "A\\B"
+
+
+def test_csv_e_json_decodificam_igual():
+    pelo_json = pd.DataFrame(json.loads(json.dumps(REGISTROS)))
+    pelo_csv = alinhar_tipos_json(decodificar_csv(_csv_postgrest(REGISTROS)), REGISTROS[0])
+
+    pd.testing.assert_frame_equal(
+        aplicar_esquema("alteracoes", pelo_csv), aplicar_esquema("alteracoes", pelo_json)
+    )
+    assert pelo_csv.loc[0, "SIGLA"] == "00123"   # texto com cara de número continua texto
@@ -0,0 +1,193 @@
+# tests/test_etl_pessoas.py
+from datetime import datetime
+
+import pytest
+import sqlalchemy as sa
+from sqlalchemy.pool import StaticPool
+
+from modules.etl_pessoas import (
+    CHAVE, DestinoSQL, DestinoSupabase, SyncPessoas, ddl_dt_atz_persistida,
+    montar_sql_origem, normalizar_destino, preparar_engine,
+)
+
+MAPA = {"SIGLA": "SIGLA", "NOME": "NOME", "% XP": "XP", "MESA": "MESA", "CÓDIGO XP": "CODIGO XP"}
+
+
+class DestinoFalso:
+    """Destino em memória: guarda o que o sync mandaria gravar em `assessores`."""
+
+    def __init__(self, linhas: dict[str, dict] | None = None):
+        self.linhas = linhas or {}
+        self.chamadas: list[tuple[list, list]] = []
+
+    def colunas(self) -> list[str]:
+        return ["ID", "SIGLA", "NOME", "XP", "MESA", "CODIGO XP"]
+
+    def snapshot(self, colunas):
+        return {
+            k: {c: normalizar_destino(c, r.get(c)) for c in colunas}
+            for k, r in self.linhas.items()
+        }
+
+    def aplicar(self, novos, alterados):
+        self.chamadas.append((novos, alterados))
+        for r in [*novos, *alterados]:
+            self.linhas[r[CHAVE]] = dict(r)
+
+
+def _origem(linhas: list[tuple]) -> sa.Engine:
+    engine = preparar_engine(sa.create_engine("sqlite://", poolclass=StaticPool))
+    with engine.begin() as cn:
+        cn.exec_driver_sql(
+            'CREATE TABLE query_pessoas ("SIGLA" TEXT, "NOME" TEXT, "% XP" TEXT, "MESA" REAL, '
+            '"CÓDIGO XP" REAL, "DATA/HORA ATUALIZAÇÃO" TEXT)'
+        )
+        cn.exec_driver_sql("INSERT INTO query_pessoas VALUES (?, ?, ?, ?, ?, ?)", linhas)
+    return engine
+
+
+def _executar(engine, destino, hashes_destino=None, **kw):
+    sync = SyncPessoas(engine, destino, mapa=MAPA, **kw)
+    return sync.executar(datetime(2025, 1, 1), datetime(2025, 2, 1), hashes_destino=hashes_destino)
+
+
+def test_percentuais_gravados_como_inteiros_na_unidade_do_app():
+    engine = _origem([
+        ("ab1", " Ana ", "35%", 0.5, 12345.0, "10/01/2025 09:00:00"),
+        ("cd2", "Caio", "35,5", 40.0, None, "2025-01-11T08:00:00"),
+    ])
+    destino = DestinoFalso()
+
+    res = _executar(engine, destino)
+
+    assert (res.lidas, res.novas, res.alteradas) == (2, 2, 0)
+    assert destino.linhas["AB1"] == {"SIGLA": "AB1", "NOME": "Ana", "XP": 35, "MESA": 50, "CODIGO XP": "12345"}
+    assert destino.linhas["CD2"]["XP"] == 36
+    assert destino.linhas["CD2"]["MESA"] == 40
+    assert destino.linhas["CD2"]["CODIGO XP"] is None
+
+
+def test_linhas_iguais_ao_destino_nao_sao_regravadas():
+    engine = _origem([
+        ("AB1", "Ana", "35%", 50.0, 12345.0, "10/01/2025 09:00:00"),
+        ("CD2", "Caio", "20%", 40.0, None, "11/01/2025 09:00:00"),
+    ])
+    # destino como o Supabase devolve: percentuais inteiros, código como texto
+    destino = DestinoFalso({
+        "AB1": {"ID": 1, "SIGLA": "AB1", "NOME": "Ana", "XP": 35, "MESA": 50, "CODIGO XP": "12345"},
+        "CD2": {"ID": 2, "SIGLA": "CD2", "NOME": "Caio", "XP": 25, "MESA": 40, "CODIGO XP": None},
+    })
+
+    res = _executar(engine, destino)
+
+    assert (res.novas, res.alteradas, res.iguais) == (0, 1, 1)
+    assert destino.chamadas == [([], [{"SIGLA": "CD2", "NOME": "Caio", "XP": 20, "MESA": 40, "CODIGO XP": None}])]
+
+
+def test_janela_e_ultima_versao_por_sigla():
+    engine = _origem([
+        ("AB1", "Ana", "10%", None, None, "10/01/2025 09:00:00"),
+        ("AB1", "Ana", "15%", None, None, "12/01/2025 09:00:00"),
+        ("EF3", "Eva", "30%", None, None, "05/02/2025 09:00:00"),   # fora da janela
+        ("GH4", "Gil", "30%", None, None, "data inválida"),
+    ])
+    destino = DestinoFalso()
+
+    res = _executar(engine, destino)
+
+    assert set(destino.linhas) == {"AB1"}
+    assert destino.linhas["AB1"]["XP"] == 15
+    assert res.ultimo_dt_atz == datetime(2025, 1, 12, 9, 0)
+
+
+def test_dry_run_nao_grava():
+    engine = _origem([("AB1", "Ana", "10%", None, None, "10/01/2025 09:00:00")])
+    destino = DestinoFalso()
+
+    res = _executar(engine, destino, dry_run=True)
+
+    assert res.novas == 1
+    assert destino.chamadas == []
+
+
+def test_dialeto_sem_coluna_persistida_recusa_com_valueerror():
+    engine = sa.create_mock_engine("postgresql://", executor=None)   # só o dialeto importa
+    with pytest.raises(ValueError, match="mssql, sqlite"):
+        ddl_dt_atz_persistida(engine)
+    with pytest.raises(ValueError, match="legado"):
+        montar_sql_origem(engine, ["SIGLA"], modo="sargavel")
+    assert "dt_atz" in str(montar_sql_origem(engine, ["SIGLA"], modo="legado"))
+
+
+class _Resposta:
+    def __init__(self, data):
+        self.data = data
+
+
+class ClienteSupabaseFalso:
+    """Só o que o DestinoSupabase usa: select paginado e upsert por ID."""
+
+    def __init__(self, linhas: list[dict]):
+        self.linhas = {r["ID"]: dict(r) for r in linhas}
+        self._op = None
+
+    def table(self, _nome):
+        return self
+
+    def select(self, _expr):
+        self._op = "select"
+        return self
+
+    def range(self, inicio, fim):
+        self._fatia = (inicio, fim + 1)
+        return self
+
+    def upsert(self, registros):
+        self._op, self._registros = "upsert", registros
+        return self
+
+    def execute(self):
+        if self._op == "upsert":
+            for r in self._registros:
+                self.linhas[r["ID"]] = dict(r)
+            return _Resposta(self._registros)
+        return _Resposta(sorted(self.linhas.values(), key=lambda r: r["ID"])[slice(*self._fatia)])
+
+
+def _hashes_checkpoint(*siglas):
+    # hashes de uma execução anterior: as SIGLAs constam como gravadas, com outro conteúdo
+    return {s: "hash-antigo" for s in siglas}
+
+
+def test_sigla_do_checkpoint_apagada_do_destino_sql_e_inserida():
+    engine = _origem([("AB1", "Ana", "35%", None, None, "10/01/2025 09:00:00")])
+    destino_engine = sa.create_engine("sqlite://", poolclass=StaticPool)
+    with destino_engine.begin() as cn:
+        cn.exec_driver_sql(
+            'CREATE TABLE assessores ("ID" INTEGER PRIMARY KEY, "SIGLA" TEXT, "NOME" TEXT, '
+            '"XP" INTEGER, "MESA" INTEGER, "CODIGO XP" TEXT)'
+        )
+    destino = DestinoSQL(destino_engine)
+
+    res = _executar(engine, destino, hashes_destino=_hashes_checkpoint("AB1"))
+
+    assert res.alteradas == 1
+    with destino_engine.connect() as cn:
+        linhas = cn.exec_driver_sql('SELECT "SIGLA", "NOME", "XP" FROM assessores').all()
+    assert linhas == [("AB1", "Ana", 35)]
+
+
+def test_sigla_do_checkpoint_apagada_do_destino_supabase_e_inserida():
+    engine = _origem([
+        ("AB1", "Ana", "35%", None, None, "10/01/2025 09:00:00"),
+        ("CD2", "Caio", "20%", None, None, "11/01/2025 09:00:00"),
+    ])
+    cliente = ClienteSupabaseFalso([{"ID": 7, "SIGLA": "CD2", "NOME": "Caio", "XP": 10}])
+    destino = DestinoSupabase(cliente)
+    destino._colunas = ["ID", "SIGLA", "NOME", "XP", "MESA", "CODIGO XP"]
+
+    _executar(engine, destino, hashes_destino=_hashes_checkpoint("AB1", "CD2"))
+
+    por_sigla = {r["SIGLA"]: r for r in cliente.linhas.values()}
+    assert por_sigla["CD2"]["ID"] == 7 and por_sigla["CD2"]["XP"] == 20
+    assert por_sigla["AB1"]["ID"] == 8 and por_sigla["AB1"]["XP"] == 35